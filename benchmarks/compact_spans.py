@@ -0,0 +1,120 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compares queued ReadableSpan objects with compact encoded spans
+
+Measures the Python heap used by a full queue of each representation and the
+throughput of turning the queue into a serialized export request.
+
+    python benchmarks/compact_spans.py
+"""
+
+from gc import collect
+from time import perf_counter
+from tracemalloc import get_traced_memory, start, stop
+
+from opentelemetry.exporter.otlp.proto.common.trace_encoder import (
+    encode_spans,
+)
+from opentelemetry.launcher._encoding import _EncodedSpan, _encode_request
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+
+_SPANS = 2048
+_ROUNDS = 20
+
+
+def _spans():
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider(
+        resource=Resource({"service.name": "benchmark"}),
+        shutdown_on_exit=False,
+    )
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    tracer = provider.get_tracer("benchmark")
+
+    for index in range(_SPANS):
+        with tracer.start_as_current_span(
+            "GET /users/{id}",
+            attributes={
+                "http.method": "GET",
+                "http.route": "/users/{id}",
+                "http.status_code": 200,
+                "http.target": f"/users/{index}",
+            },
+        ) as span:
+            span.add_event("cache.miss", {"key": f"user:{index}"})
+
+    return exporter.get_finished_spans()
+
+
+def _heap(factory):
+    collect()
+    start()
+    queue = factory()
+    size = get_traced_memory()[0]
+    stop()
+    del queue
+    return size
+
+
+def _throughput(function, queue):
+    started = perf_counter()
+
+    for _ in range(_ROUNDS):
+        function(queue)
+
+    return _SPANS * _ROUNDS / (perf_counter() - started)
+
+
+def main():
+    spans = _spans()
+    encoded = [_EncodedSpan(span) for span in spans]
+
+    readable_heap = _heap(_spans)
+    encoded_heap = _heap(lambda: [_EncodedSpan(span) for span in spans])
+
+    print(f"Queue of {_SPANS} spans")
+    print(f"  ReadableSpan heap:  {readable_heap / _SPANS:8.0f} B/span")
+    print(f"  _EncodedSpan heap:  {encoded_heap / _SPANS:8.0f} B/span")
+
+    print("Export request serialization")
+    print(
+        "  encode_spans:       {:8.0f} spans/s".format(
+            _throughput(
+                lambda queue: encode_spans(queue).SerializeToString(), spans
+            )
+        )
+    )
+    print(
+        "  _encode_request:    {:8.0f} spans/s".format(
+            _throughput(_encode_request, encoded)
+        )
+    )
+    print(
+        "  encode on end:      {:8.0f} spans/s".format(
+            _throughput(
+                lambda queue: [_EncodedSpan(span) for span in queue], spans
+            )
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compares request latency in a gevent process with and without the
+cooperative mode
+
+Runs a child process monkey patched by gevent for each mode. Concurrent
+greenlets simulate requests that create spans and wait on I/O, while the
+spans are exported to a local satellite stand-in with some latency: over
+gRPC by a BatchSpanProcessor without the cooperative mode, over HTTP from
+the shared scheduler greenlet with it. Reports the request latency and the
+number of requests that took longer than a second, which shows the hub
+being blocked. Needs gevent to be installed.
+
+    python benchmarks/cooperative.py
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps, loads
+from os.path import dirname, join
+from statistics import quantiles
+from subprocess import DEVNULL, check_output
+from sys import argv, executable, path
+from threading import Thread
+from time import sleep
+
+path.insert(0, join(dirname(__file__), "..", "tests"))
+
+# pylint: disable=wrong-import-position
+from receiver import Receiver  # noqa: E402
+
+_SATELLITE_LATENCY_SECONDS = 0.05
+_CLIENTS = 50
+_REQUESTS_PER_CLIENT = 200
+_SPANS_PER_REQUEST = 10
+_IO_SECONDS = 0.002
+
+
+class _HTTPReceiver(ThreadingHTTPServer):
+    # An OTLP/HTTP stand-in for a satellite that only acknowledges requests.
+    def __init__(self, latency):
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers["Content-Length"]))
+                sleep(latency)
+                self.send_response(200)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        super().__init__(("localhost", 0), Handler)
+        self.endpoint = f"http://localhost:{self.server_address[1]}"
+
+    def __enter__(self):
+        Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+
+def _child(endpoint, cooperative):
+    # pylint: disable=import-outside-toplevel
+    from gevent import monkey
+
+    monkey.patch_all()
+
+    from time import perf_counter_ns
+
+    from gevent import joinall, spawn
+    from gevent import sleep as gevent_sleep
+
+    from opentelemetry.launcher import configure_opentelemetry
+    from opentelemetry.trace import get_tracer, get_tracer_provider
+
+    configure_opentelemetry(
+        service_name="benchmark",
+        access_token="a" * 32,
+        span_exporter_endpoint=endpoint,
+        cooperative=cooperative,
+    )
+    tracer = get_tracer("benchmark")
+    latencies = []
+
+    def client():
+        for _ in range(_REQUESTS_PER_CLIENT):
+            start = perf_counter_ns()
+
+            with tracer.start_as_current_span("GET /users/{id}"):
+                for _ in range(_SPANS_PER_REQUEST - 1):
+                    with tracer.start_as_current_span("SELECT users"):
+                        pass
+
+                gevent_sleep(_IO_SECONDS)
+
+            latencies.append(perf_counter_ns() - start)
+
+    joinall([spawn(client) for _ in range(_CLIENTS)])
+    get_tracer_provider().shutdown()
+
+    percentiles = quantiles(latencies, n=100)
+
+    print(
+        dumps(
+            {
+                "p50": percentiles[49] / 1e6,
+                "p99": percentiles[98] / 1e6,
+                "max": max(latencies) / 1e6,
+                "stalls": sum(latency > 1e9 for latency in latencies),
+            }
+        )
+    )
+
+
+def _measure(endpoint, cooperative):
+    output = check_output(
+        [executable, __file__, "child", endpoint, str(cooperative)],
+        stderr=DEVNULL,
+    )
+
+    return loads(output.decode().splitlines()[-1])
+
+
+def main():
+    receiver = Receiver(latency=_SATELLITE_LATENCY_SECONDS)
+    http_receiver = _HTTPReceiver(_SATELLITE_LATENCY_SECONDS)
+
+    with receiver, http_receiver:
+        results = {
+            "gRPC, threads": _measure(receiver.endpoint, False),
+            "cooperative": _measure(http_receiver.endpoint, True),
+        }
+
+    print(
+        f"{_CLIENTS} greenlets making {_REQUESTS_PER_CLIENT} requests of "
+        f"{_SPANS_PER_REQUEST} spans"
+    )
+
+    for name, result in results.items():
+        print(
+            f"  {name:14} p50 {result['p50']:8.2f}ms  "
+            f"p99 {result['p99']:8.2f}ms  max {result['max']:8.2f}ms  "
+            f"{result['stalls']} requests over 1s"
+        )
+
+
+if __name__ == "__main__":
+    if argv[1:2] == ["child"]:
+        _child(argv[2], argv[3] == "True")
+    else:
+        main()
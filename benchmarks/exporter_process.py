@@ -0,0 +1,116 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compares request latency with in-process and out-of-process span export
+
+Simulates CPU-bound requests that create spans, separated by a short pause
+that stands for I/O, while the spans are exported to a local receiver either
+by a BatchSpanProcessor in this process or by the exporter helper process.
+Reports the request latency and the CPU time used by this process, the CPU
+time of the helper process is not included. The helper process only lowers
+the latency when it can run on a spare CPU core.
+
+    python benchmarks/exporter_process.py
+"""
+
+from os.path import dirname, join
+from statistics import quantiles
+from sys import path
+from time import perf_counter_ns, process_time, sleep
+
+from opentelemetry.launcher.exporter_process import (
+    ExporterProcessSpanProcessor,
+)
+from opentelemetry.launcher.tracer import LightstepOTLPSpanExporter
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+path.insert(0, join(dirname(__file__), "..", "tests"))
+
+# pylint: disable=wrong-import-position
+from receiver import Receiver  # noqa: E402
+
+_REQUESTS = 5000
+_SPANS_PER_REQUEST = 10
+_PAUSE_SECONDS = 0.001
+
+
+def _request(tracer):
+    with tracer.start_as_current_span(
+        "GET /users/{id}", attributes={"http.method": "GET"}
+    ):
+        for index in range(_SPANS_PER_REQUEST - 1):
+            with tracer.start_as_current_span(
+                "SELECT users", attributes={"db.statement": "SELECT ..."}
+            ) as span:
+                span.add_event("rows", {"count": index})
+                # Application work holding the GIL
+                sum(value * value for value in range(300))
+
+
+def _measure(span_processor):
+    provider = TracerProvider(
+        resource=Resource({"service.name": "benchmark"}),
+        shutdown_on_exit=False,
+    )
+    provider.add_span_processor(span_processor)
+    tracer = provider.get_tracer("benchmark")
+    latencies = []
+    cpu_start = process_time()
+
+    for _ in range(_REQUESTS):
+        start = perf_counter_ns()
+        _request(tracer)
+        latencies.append(perf_counter_ns() - start)
+        sleep(_PAUSE_SECONDS)
+
+    provider.shutdown()
+
+    percentiles = quantiles(latencies, n=100)
+
+    return (
+        percentiles[49] / 1e3,
+        percentiles[98] / 1e3,
+        process_time() - cpu_start,
+    )
+
+
+def main():
+    with Receiver() as receiver:
+        results = {
+            "in-process": _measure(
+                BatchSpanProcessor(
+                    LightstepOTLPSpanExporter(
+                        endpoint=receiver.endpoint, insecure=True
+                    )
+                )
+            ),
+            "exporter process": _measure(
+                ExporterProcessSpanProcessor(receiver.endpoint, insecure=True)
+            ),
+        }
+
+    print(f"{_REQUESTS} requests of {_SPANS_PER_REQUEST} spans")
+
+    for name, (p50, p99, cpu) in results.items():
+        print(
+            f"  {name:17} p50 {p50:8.1f}us  p99 {p99:8.1f}us  "
+            f"CPU {cpu:6.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
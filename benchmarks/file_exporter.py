@@ -0,0 +1,102 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compares the throughput of the debug span exporters
+
+ConsoleSpanExporter pretty prints and flushes every span, FileSpanExporter
+writes one compact OTLP JSON line per batch. Both write to a temporary file.
+
+    python benchmarks/file_exporter.py
+"""
+
+from os.path import join
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from opentelemetry.launcher.file_exporter import FileSpanExporter
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import (
+    ConsoleSpanExporter,
+    SimpleSpanProcessor,
+)
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+
+_SPANS = 512
+_ROUNDS = 20
+
+
+def _spans():
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider(
+        resource=Resource({"service.name": "benchmark"}),
+        shutdown_on_exit=False,
+    )
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    tracer = provider.get_tracer("benchmark")
+
+    for index in range(_SPANS):
+        with tracer.start_as_current_span(
+            "GET /users/{id}",
+            attributes={
+                "http.method": "GET",
+                "http.route": "/users/{id}",
+                "http.status_code": 200,
+                "http.target": f"/users/{index}",
+            },
+        ) as span:
+            span.add_event("cache.miss", {"key": f"user:{index}"})
+
+    return exporter.get_finished_spans()
+
+
+def _throughput(exporter, spans):
+    started = perf_counter()
+
+    for _ in range(_ROUNDS):
+        exporter.export(spans)
+
+    exporter.force_flush()
+
+    return _SPANS * _ROUNDS / (perf_counter() - started)
+
+
+def main():
+    spans = _spans()
+
+    with TemporaryDirectory() as directory:
+        with open(join(directory, "console.txt"), "w") as out:
+            console = _throughput(ConsoleSpanExporter(out=out), spans)
+
+        file_exporter = FileSpanExporter(join(directory, "spans.jsonl"))
+        file = _throughput(file_exporter, spans)
+        file_exporter.shutdown()
+
+        file_exporter = FileSpanExporter(
+            join(directory, "sampled.jsonl"), sample_ratio=0.1
+        )
+        sampled = _throughput(file_exporter, spans)
+        file_exporter.shutdown()
+
+    print(f"Batches of {_SPANS} spans")
+    print(f"  ConsoleSpanExporter:            {console:8.0f} spans/s")
+    print(f"  FileSpanExporter:               {file:8.0f} spans/s")
+    print(f"  FileSpanExporter, ratio 0.1:    {sampled:8.0f} spans/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Measures the overhead of every installed instrumentation on the example
+Flask server
+
+For every instrumentor entry point, only that instrumentor is loaded through
+LightstepLauncherDistro, as LS_INSTRUMENTATIONS_ENABLED would do, and the
+latency of the /hello route of examples/server.py is measured with the Flask
+test client. Spans are recorded but not exported.
+
+    python benchmarks/instrumentation_overhead.py
+"""
+
+from statistics import median
+from time import perf_counter_ns
+from unittest.mock import patch
+
+from flask import Flask
+from pkg_resources import iter_entry_points
+
+from opentelemetry.instrumentation.dependencies import (
+    get_dist_dependency_conflicts,
+)
+from opentelemetry.launcher.configuration import LightstepLauncherDistro
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.trace import set_tracer_provider
+
+_REQUESTS = 2000
+
+
+def _latency():
+    # Created after instrumenting, FlaskInstrumentor replaces the Flask class.
+    app = Flask(__name__)
+
+    @app.route("/hello")
+    def hello():
+        return "hello"
+
+    client = app.test_client()
+    latencies = []
+
+    for _ in range(_REQUESTS):
+        start = perf_counter_ns()
+        client.get("/hello")
+        latencies.append(perf_counter_ns() - start)
+
+    return median(latencies) / 1e3
+
+
+def main():
+    set_tracer_provider(TracerProvider(shutdown_on_exit=False))
+
+    baseline = _latency()
+
+    print(f"/hello median latency over {_REQUESTS} requests")
+    print(f"  {'none':12} {baseline:8.1f}us")
+
+    for entry_point in iter_entry_points("opentelemetry_instrumentor"):
+        # opentelemetry-instrument skips instrumentors whose library version
+        # is not supported before asking the distro to load them.
+        conflict = get_dist_dependency_conflicts(entry_point.dist)
+
+        if conflict:
+            print(f"  {entry_point.name:12} skipped: {conflict}")
+            continue
+
+        distro = LightstepLauncherDistro()
+        distro.instrumentation_report = None
+
+        with patch(
+            "opentelemetry.launcher.configuration."
+            "_LS_INSTRUMENTATIONS_ENABLED",
+            [entry_point.name],
+        ):
+            try:
+                distro.load_instrumentor(entry_point, skip_dep_check=True)
+            # pylint: disable=broad-except
+            except Exception as error:
+                print(f"  {entry_point.name:12} not loaded: {error}")
+                continue
+
+        latency = _latency()
+        (report,) = distro.instrumentation_report
+
+        print(
+            f"  {entry_point.name:12} {latency:8.1f}us "
+            f"(+{latency - baseline:.1f}us), "
+            f"import {report['import_ns'] / 1e6:.1f}ms, "
+            f"instrument {report['instrument_ns'] / 1e6:.1f}ms"
+        )
+
+        entry_point.load()().uninstrument()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compares the heap used by queued spans with and without string interning
+
+Runs a child process for each mode. Like the examples, a Flask server and a
+requests client instrumented by their OpenTelemetry instrumentations run in
+the child, the client calls the server and the spans of both sides are kept
+in memory as if they were waiting in an export queue. Reports the Python
+heap retained per span and the time spent interning per span.
+
+    python benchmarks/interning.py
+"""
+
+from gc import collect
+from json import dumps, loads
+from subprocess import DEVNULL, check_output
+from sys import argv, executable
+from threading import Thread
+from time import perf_counter_ns
+from tracemalloc import get_traced_memory, start, stop
+
+_WARMUP_REQUESTS = 500
+_REQUESTS = 2000
+
+
+def _child(intern_strings):
+    # pylint: disable=import-outside-toplevel
+    from flask import Flask
+    from requests import Session
+    from werkzeug.serving import make_server
+
+    from opentelemetry.instrumentation.flask import FlaskInstrumentor
+    from opentelemetry.instrumentation.requests import RequestsInstrumentor
+    from opentelemetry.launcher.span_processor import InterningSpanProcessor
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+        InMemorySpanExporter,
+    )
+
+    provider = TracerProvider(
+        resource=Resource({"service.name": "benchmark"}),
+        shutdown_on_exit=False,
+    )
+
+    if intern_strings:
+        provider.add_span_processor(InterningSpanProcessor())
+
+    exporter = InMemorySpanExporter()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+
+    app = Flask(__name__)
+    FlaskInstrumentor().instrument_app(app, tracer_provider=provider)
+    RequestsInstrumentor().instrument(tracer_provider=provider)
+
+    @app.route("/hello")
+    def hello():
+        return "hello"
+
+    @app.route("/users/<int:user_id>")
+    def user(user_id):
+        return {"id": user_id}
+
+    server = make_server("localhost", 0, app, threaded=True)
+    Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://localhost:{server.server_port}"
+    session = Session()
+
+    def send_requests(count):
+        for index in range(count):
+            session.get(f"{url}/hello")
+            session.get(f"{url}/users/{index}")
+
+    # Caches of Flask, requests and the instrumentations are filled before
+    # measuring.
+    send_requests(_WARMUP_REQUESTS)
+    exporter.clear()
+
+    collect()
+    start()
+    send_requests(_REQUESTS)
+    collect()
+    heap = get_traced_memory()[0]
+    stop()
+
+    spans = exporter.get_finished_spans()
+    server.shutdown()
+
+    # The spans that were not interned yet are interned in a single loop,
+    # timing every call would cost more than interning.
+    interning_span_processor = InterningSpanProcessor()
+    started = perf_counter_ns()
+
+    for span in spans:
+        interning_span_processor.on_start(span)
+        interning_span_processor.on_end(span)
+
+    interning = (perf_counter_ns() - started) / len(spans)
+
+    print(
+        dumps(
+            {
+                "spans": len(spans),
+                "heap": heap / len(spans),
+                "interning": interning,
+            }
+        )
+    )
+
+
+def _measure(intern_strings):
+    output = check_output(
+        [executable, __file__, "child", str(intern_strings)], stderr=DEVNULL
+    )
+
+    return loads(output.decode().splitlines()[-1])
+
+
+def main():
+    not_interned = _measure(False)
+    interned = _measure(True)
+
+    print(
+        f"{not_interned['spans']} Flask server and requests client spans "
+        "kept in memory"
+    )
+    print(f"  not interned heap: {not_interned['heap']:8.0f} B/span")
+    print(f"  interned heap:     {interned['heap']:8.0f} B/span")
+    print(
+        f"  interning:         {not_interned['interning'] / 1e3:8.2f} "
+        "us/span"
+    )
+
+
+if __name__ == "__main__":
+    if argv[1:2] == ["child"]:
+        _child(argv[2] == "True")
+    else:
+        main()
@@ -0,0 +1,159 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Measures the CPU overhead of the span correlated profiler
+
+Runs a child process with and without the profiler, alternately. Threads
+run a CPU bound workload in nested spans, with recursion so that stacks are
+a few dozen frames deep, and profiles are exported every second. Reports the
+CPU time of the process for the same work, which is noisy on a busy machine,
+and the CPU time of the profiler thread itself as a ratio of the wall time,
+which the profiler keeps under 1%. The rest of the overhead is the tracking
+of started spans, a couple of microseconds per span. Exits with a non-zero
+status when the profiler thread is above the 1% target.
+
+    python benchmarks/profiler.py
+"""
+
+from json import dumps, loads
+from statistics import median
+from subprocess import check_output
+from sys import argv, executable
+
+from opentelemetry.launcher.profiler import _DEFAULT_MAX_OVERHEAD
+
+_RUNS = 7
+_THREADS = 4
+_REQUESTS_PER_THREAD = 500
+_DEPTH = 30
+_ITERATIONS = 5000
+
+
+def _child(profiler_enabled):
+    # pylint: disable=import-outside-toplevel
+    from threading import Thread
+    from time import (
+        clock_gettime,
+        perf_counter,
+        process_time,
+        pthread_getcpuclockid,
+    )
+
+    from opentelemetry.launcher.profiler import ProfilerSpanProcessor
+    from opentelemetry.sdk.trace import TracerProvider
+
+    tracer_provider = TracerProvider(shutdown_on_exit=False)
+    profiler = None
+
+    if profiler_enabled:
+        profiler = ProfilerSpanProcessor(tracer_provider, export_interval=1)
+        tracer_provider.add_span_processor(profiler)
+
+    tracer = tracer_provider.get_tracer("benchmark")
+
+    def compute(depth):
+        if depth:
+            return compute(depth - 1)
+
+        total = 0
+
+        for index in range(_ITERATIONS):
+            total += index * index
+
+        return total
+
+    def client():
+        for _ in range(_REQUESTS_PER_THREAD):
+            with tracer.start_as_current_span("GET /users/{id}"):
+                with tracer.start_as_current_span("render"):
+                    compute(_DEPTH)
+
+    threads = [Thread(target=client) for _ in range(_THREADS)]
+    wall_start = perf_counter()
+    cpu_start = process_time()
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    cpu = process_time() - cpu_start
+    wall = perf_counter() - wall_start
+    profiler_cpu = 0
+
+    if profiler is not None:
+        # pylint: disable=protected-access
+        profiler_cpu = clock_gettime(
+            pthread_getcpuclockid(profiler._thread.ident)
+        )
+
+    tracer_provider.shutdown()
+
+    print(
+        dumps(
+            {
+                "cpu": cpu,
+                "wall": wall,
+                "profiler_cpu": profiler_cpu,
+            }
+        )
+    )
+
+
+def _measure(profiler_enabled):
+    output = check_output(
+        [executable, __file__, "child", str(profiler_enabled)]
+    )
+
+    return loads(output.decode().splitlines()[-1])
+
+
+def main():
+    results = {False: [], True: []}
+
+    for _ in range(_RUNS):
+        for profiler_enabled in [False, True]:
+            results[profiler_enabled].append(_measure(profiler_enabled))
+
+    cpu = median(result["cpu"] for result in results[False])
+    profiled_cpu = median(result["cpu"] for result in results[True])
+    profiler_ratio = median(
+        result["profiler_cpu"] / result["wall"] for result in results[True]
+    )
+
+    print(
+        f"{_THREADS} threads making {_REQUESTS_PER_THREAD} requests, "
+        f"median of {_RUNS} runs"
+    )
+    print(f"  without profiler  {cpu:8.3f}s CPU")
+    print(
+        f"  with profiler     {profiled_cpu:8.3f}s CPU  "
+        f"{(profiled_cpu - cpu) / cpu:+8.2%}"
+    )
+    print(f"  profiler thread   {profiler_ratio:8.2%} of the wall time")
+
+    if profiler_ratio > _DEFAULT_MAX_OVERHEAD:
+        print(f"Above the {_DEFAULT_MAX_OVERHEAD:.0%} target")
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    if argv[1:2] == ["child"]:
+        _child(argv[2] == "True")
+    else:
+        raise SystemExit(main())
@@ -0,0 +1,161 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compares an idle process with a thread per pipeline and with the shared
+export scheduler
+
+Configures the launcher in a child process for each layout, with spans,
+metrics, the debug span processor and an additional span endpoint, all
+exporting to a local receiver. Once configured the process stays idle.
+Reports the thread wakeups per second, counted from the context switches of
+every thread in /proc, and the part of them in the Python threads the
+launcher started. The rest are mostly the gRPC event engine threads, the same
+in both layouts. Also reports the number of threads, including the ones of
+gRPC, and the resident memory. Only runs on Linux.
+
+    python benchmarks/scheduler.py [idle seconds]
+"""
+
+from json import dumps, loads
+from os import listdir
+from os.path import dirname, join
+from subprocess import DEVNULL, check_output
+from sys import argv, executable, path
+from threading import enumerate as enumerate_threads
+from threading import main_thread
+from time import sleep
+
+path.insert(0, join(dirname(__file__), "..", "tests"))
+
+# pylint: disable=wrong-import-position
+from receiver import Receiver  # noqa: E402
+
+_IDLE_SECONDS = 30
+_SETTLE_SECONDS = 2
+
+
+def _context_switches(tasks):
+    switches = 0
+
+    for task in tasks:
+        try:
+            with open(f"/proc/self/task/{task}/status") as status:
+                for line in status:
+                    if "ctxt_switches:" in line:
+                        switches += int(line.split(":")[1])
+        except OSError:
+            # The thread exited.
+            pass
+
+    return switches
+
+
+def _resident_bytes():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+
+    return 0
+
+
+def _child(endpoint, shared_scheduler, idle_seconds):
+    # pylint: disable=import-outside-toplevel
+    from opentelemetry.launcher import configure_opentelemetry
+
+    configure_opentelemetry(
+        service_name="benchmark",
+        access_token="a" * 104,
+        span_exporter_endpoint=endpoint,
+        span_exporter_insecure=True,
+        metrics_exporter_endpoint=endpoint,
+        metrics_enabled=True,
+        log_level="DEBUG",
+        additional_span_exporter_endpoints=[endpoint],
+        shared_scheduler=shared_scheduler,
+    )
+
+    sleep(_SETTLE_SECONDS)
+
+    tasks = listdir("/proc/self/task")
+    export_tasks = [
+        str(thread.native_id)
+        for thread in enumerate_threads()
+        if thread is not main_thread()
+    ]
+
+    switches = _context_switches(tasks)
+    export_switches = _context_switches(export_tasks)
+    sleep(idle_seconds)
+    switches = _context_switches(tasks) - switches
+    export_switches = _context_switches(export_tasks) - export_switches
+
+    print(
+        dumps(
+            {
+                "wakeups": switches / idle_seconds,
+                "export_wakeups": export_switches / idle_seconds,
+                "threads": len(listdir("/proc/self/task")),
+                "rss": _resident_bytes(),
+            }
+        )
+    )
+
+
+def _measure(endpoint, shared_scheduler, idle_seconds):
+    output = check_output(
+        [
+            executable,
+            __file__,
+            "child",
+            endpoint,
+            str(shared_scheduler),
+            str(idle_seconds),
+        ],
+        stderr=DEVNULL,
+    )
+
+    return loads(output.decode().splitlines()[-1])
+
+
+def main():
+    idle_seconds = float(argv[1]) if len(argv) > 1 else _IDLE_SECONDS
+
+    with Receiver() as receiver:
+        results = {
+            "thread per pipeline": _measure(
+                receiver.endpoint, False, idle_seconds
+            ),
+            "shared scheduler": _measure(
+                receiver.endpoint, True, idle_seconds
+            ),
+        }
+
+    print(f"Idle process for {idle_seconds:.0f}s")
+
+    for name, result in results.items():
+        print(
+            f"  {name:20} {result['wakeups']:6.2f} wakeups/s  "
+            f"({result['export_wakeups']:5.2f} in Python threads)  "
+            f"{result['threads']:3} threads  "
+            f"RSS {result['rss'] / 2 ** 20:6.1f}MiB"
+        )
+
+
+if __name__ == "__main__":
+    if argv[1:2] == ["child"]:
+        _child(argv[2], argv[3] == "True", float(argv[4]))
+    else:
+        main()
@@ -1,3 +1,5 @@
+from glob import glob
+
 from nox import session
 
 
@@ -9,7 +11,7 @@ def test(session):
     if session.posargs:
         session.run("pytest", *session.posargs)
     else:
-        session.run("pytest", "tests/test_configuration.py")
+        session.run("pytest", "tests", "--ignore", "tests/test_example.py")
 
 
 @session(python=["3.7"], reuse_venv=True)
@@ -44,3 +46,12 @@ def example(session):
     session.install("-r", "requirements-test.txt")
 
     session.run("pytest", "tests/test_example.py", "-s")
+
+
+@session(python=["3.9"], reuse_venv=True)
+def benchmark(session):
+    session.install(".")
+    session.install("-r", "requirements-test.txt")
+
+    for script in session.posargs or sorted(glob("benchmarks/*.py")):
+        session.run("python", script)
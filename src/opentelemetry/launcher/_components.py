@@ -0,0 +1,165 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Replacement of the components installed in the SDK providers
+
+The global providers can only be set once, and the SDK providers have no API
+to remove a span processor, a log record processor or a metric reader. These
+functions swap them in the providers so that `configure_opentelemetry` can
+be called again with a different configuration.
+"""
+
+# FIXME: Accessing private attributes of the SDK providers here since they
+# have no public API to remove their components.
+# pylint: disable=protected-access
+
+from typing import Optional
+
+from opentelemetry.sdk._logs import LoggerProvider, LogRecordProcessor
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics._internal.metric_reader_storage import (
+    MetricReaderStorage,
+)
+from opentelemetry.sdk.metrics.export import MetricReader
+from opentelemetry.sdk.trace import SpanProcessor, TracerProvider
+
+
+def _replace_span_processor(
+    tracer_provider: TracerProvider,
+    old: Optional[SpanProcessor],
+    new: Optional[SpanProcessor],
+    first: bool = False,
+) -> None:
+    """
+    Replaces `old` with `new` in the span processors of `tracer_provider`
+
+    Either of them can be `None` to only add or only remove a processor. The
+    old processor is shut down once it no longer receives spans, exporting
+    the spans it had queued and stopping its worker thread. The new
+    processor is added last, or first if `first` is set.
+    """
+    if old is None and not first:
+        if new is not None:
+            tracer_provider.add_span_processor(new)
+
+        return
+
+    active_span_processor = tracer_provider._active_span_processor
+
+    with active_span_processor._lock:
+        span_processors = tuple(
+            span_processor
+            for span_processor in active_span_processor._span_processors
+            if span_processor is not old
+        )
+
+        if new is not None and first:
+            span_processors = (new,) + span_processors
+        elif new is not None:
+            span_processors += (new,)
+
+        # Spans being started or ended keep iterating over the previous
+        # tuple.
+        active_span_processor._span_processors = span_processors
+
+    if old is not None:
+        old.shutdown()
+
+
+def _replace_log_record_processor(
+    logger_provider: LoggerProvider,
+    old: Optional[LogRecordProcessor],
+    new: Optional[LogRecordProcessor],
+) -> None:
+    """
+    Replaces `old` with `new` in the log record processors of
+    `logger_provider`, the same way `_replace_span_processor` does
+    """
+    if old is None:
+        if new is not None:
+            logger_provider.add_log_record_processor(new)
+
+        return
+
+    multi_log_record_processor = logger_provider._multi_log_record_processor
+
+    with multi_log_record_processor._lock:
+        log_record_processors = tuple(
+            log_record_processor
+            for log_record_processor in (
+                multi_log_record_processor._log_record_processors
+            )
+            if log_record_processor is not old
+        )
+
+        if new is not None:
+            log_record_processors += (new,)
+
+        multi_log_record_processor._log_record_processors = (
+            log_record_processors
+        )
+
+    old.shutdown()
+
+
+def _replace_metric_reader(
+    meter_provider: MeterProvider,
+    old: Optional[MetricReader],
+    new: Optional[MetricReader],
+) -> None:
+    """
+    Replaces `old` with `new` in the metric readers of `meter_provider`
+
+    The old reader is shut down, exporting what it collected, before it is
+    removed. The new reader starts with empty storage, cumulative metrics
+    start over from the time it is added.
+    """
+    sdk_config = meter_provider._sdk_config
+    measurement_consumer = meter_provider._measurement_consumer
+
+    if new is not None:
+        with MeterProvider._all_metric_readers_lock:
+            MeterProvider._all_metric_readers.add(new)
+
+        # The storages mapping is never mutated, measurements being consumed
+        # keep iterating over the previous one.
+        measurement_consumer._reader_storages = {
+            **measurement_consumer._reader_storages,
+            new: MetricReaderStorage(
+                sdk_config,
+                new._instrument_class_temporality,
+                new._instrument_class_aggregation,
+            ),
+        }
+        new._set_collect_callback(measurement_consumer.collect)
+
+    if old is not None:
+        # The last collection of the old reader needs its storage.
+        old.shutdown()
+
+        measurement_consumer._reader_storages = {
+            reader: storage
+            for reader, storage in (
+                measurement_consumer._reader_storages.items()
+            )
+            if reader is not old
+        }
+
+        with MeterProvider._all_metric_readers_lock:
+            MeterProvider._all_metric_readers.discard(old)
+
+    sdk_config.metric_readers = tuple(
+        reader for reader in sdk_config.metric_readers if reader is not old
+    ) + ((new,) if new is not None else ())
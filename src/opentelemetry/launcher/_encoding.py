@@ -0,0 +1,166 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Sequence, Union
+
+from opentelemetry.exporter.otlp.proto.common._internal import (
+    _encode_instrumentation_scope,
+    _encode_resource,
+)
+from opentelemetry.exporter.otlp.proto.common._internal.trace_encoder import (
+    _encode_span,
+)
+from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import (
+    ExportTraceServiceRequest,
+    ExportTraceServiceResponse,
+)
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.trace import SpanContext, TraceFlags
+
+# Field numbers of the OTLP messages, from
+# opentelemetry/proto/collector/trace/v1/trace_service.proto and
+# opentelemetry/proto/trace/v1/trace.proto
+_REQUEST_RESOURCE_SPANS = 1
+_RESOURCE_SPANS_RESOURCE = 1
+_RESOURCE_SPANS_SCOPE_SPANS = 2
+_SCOPE_SPANS_SCOPE = 1
+_SCOPE_SPANS_SPANS = 2
+
+_TRACE_SERVICE_EXPORT = (
+    "/opentelemetry.proto.collector.trace.v1.TraceService/Export"
+)
+
+# Only sampled spans are encoded, BatchSpanProcessor checks this flag again
+# when the encoded span is queued.
+_SAMPLED_CONTEXT = SpanContext(
+    0, 0, is_remote=False, trace_flags=TraceFlags(TraceFlags.SAMPLED)
+)
+
+
+class _EncodedSpan:
+    """
+    Compact representation of an ended span
+
+    Holds the span encoded as an OTLP protobuf `Span` message along with
+    references to its resource and instrumentation scope, which are shared by
+    every span of the same tracer.
+    """
+
+    __slots__ = ("data", "resource", "instrumentation_scope")
+
+    context = _SAMPLED_CONTEXT
+
+    def __init__(self, span: ReadableSpan):
+        self.data = _encode_span(span).SerializeToString()
+        self.resource = span.resource
+        self.instrumentation_scope = span.instrumentation_scope
+
+
+def _encode_varint(value: int) -> bytes:
+    encoded = bytearray()
+
+    while value > 0x7F:
+        encoded.append((value & 0x7F) | 0x80)
+        value >>= 7
+
+    encoded.append(value)
+
+    return bytes(encoded)
+
+
+def _length_delimited(field_number: int, payload: bytes) -> bytes:
+    return b"".join(
+        (
+            _encode_varint((field_number << 3) | 2),
+            _encode_varint(len(payload)),
+            payload,
+        )
+    )
+
+
+def _encode_request(encoded_spans: Sequence[_EncodedSpan]) -> bytes:
+    """
+    Concatenates encoded spans into a serialized `ExportTraceServiceRequest`
+
+    Spans are grouped by resource and instrumentation scope, which are
+    encoded once per request.
+    """
+    resources = {}
+
+    for encoded_span in encoded_spans:
+        resources.setdefault(encoded_span.resource, {}).setdefault(
+            encoded_span.instrumentation_scope, []
+        ).append(encoded_span.data)
+
+    resource_spans = []
+
+    for resource, scopes in resources.items():
+        scope_spans = []
+
+        for scope, spans in scopes.items():
+            scope_spans.append(
+                _length_delimited(
+                    _RESOURCE_SPANS_SCOPE_SPANS,
+                    b"".join(
+                        [
+                            _length_delimited(
+                                _SCOPE_SPANS_SCOPE,
+                                _encode_instrumentation_scope(
+                                    scope
+                                ).SerializeToString(),
+                            ),
+                            *[
+                                _length_delimited(_SCOPE_SPANS_SPANS, span)
+                                for span in spans
+                            ],
+                        ]
+                    ),
+                )
+            )
+
+        resource_spans.append(
+            _length_delimited(
+                _REQUEST_RESOURCE_SPANS,
+                b"".join(
+                    [
+                        _length_delimited(
+                            _RESOURCE_SPANS_RESOURCE,
+                            _encode_resource(resource).SerializeToString(),
+                        ),
+                        *scope_spans,
+                    ]
+                ),
+            )
+        )
+
+    return b"".join(resource_spans)
+
+
+def _serialize_request(request: Union[bytes, ExportTraceServiceRequest]):
+    if isinstance(request, bytes):
+        return request
+    return request.SerializeToString()
+
+
+class _TraceServiceStub:
+    """
+    Trace service stub that accepts already serialized requests
+    """
+
+    def __init__(self, channel):
+        self.Export = channel.unary_unary(  # pylint: disable=invalid-name
+            _TRACE_SERVICE_EXPORT,
+            request_serializer=_serialize_request,
+            response_deserializer=ExportTraceServiceResponse.FromString,
+        )
@@ -0,0 +1,220 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from logging import getLogger
+from time import perf_counter_ns, time_ns
+
+from grpc import FutureCancelledError, RpcError, channel_ready_future
+
+from opentelemetry.launcher._failover import _Failover
+from opentelemetry.launcher._failures import _FailureReport
+
+_logger = getLogger(__name__)
+
+
+class _LightstepExporterMixin:
+    """
+    Behavior shared by the Lightstep OTLP exporters
+
+    The OTLP exporters create their gRPC channel in their constructor without
+    keeping a reference to it, `_stub` is overridden here to keep it.
+
+    `endpoint` can also be a list of URLs. An exporter is then created for
+    every other endpoint, each request is sent to the healthiest of them
+    (see `_Failover`) instead of being retried on a single endpoint.
+
+    Export failures are reported by `_FailureReport` rather than logged one
+    by one.
+
+    With `retry` set to `False`, every export is a single attempt per
+    endpoint, whose timeout is also capped by `deadline_ns` if it is set, so
+    that an export never outlasts the deadline of a serverless flush.
+    """
+
+    _stub_class = None
+    # What the exported items are called in failure reports.
+    _unit = None
+    _channel = None
+    _channel_ready_future = None
+    _failover = None
+    # The time, in nanoseconds since the epoch, by which an export without
+    # retries must be done, set by the processors before they export.
+    deadline_ns = None
+
+    def __init__(self, *args, endpoint=None, retry=True, **kwargs):
+        self._retry = retry
+
+        if isinstance(endpoint, (list, tuple)):
+            endpoints = list(endpoint)
+
+            super().__init__(*args, endpoint=endpoints[0], **kwargs)
+
+            if len(endpoints) > 1:
+                self._failover = _Failover(
+                    [self]
+                    + [
+                        type(self)(
+                            *args, endpoint=other, retry=retry, **kwargs
+                        )
+                        for other in endpoints[1:]
+                    ],
+                    endpoints,
+                )
+        else:
+            super().__init__(*args, endpoint=endpoint, **kwargs)
+
+        self._failures = _FailureReport(_logger, self._exporting, self._unit)
+
+    def _count(self, data) -> int:
+        # The number of items in a batch, lost if it fails.
+        return len(data)
+
+    def _stub(self, channel):
+        self._channel = channel
+        return self._stub_class(channel)
+
+    def _attempt_timeout(self, deadline_ns) -> float:
+        # The timeout of an attempt in seconds, 0 once the deadline passed.
+        if deadline_ns is None:
+            return self._timeout
+
+        return max(0, min(self._timeout, (deadline_ns - time_ns()) / 1e9))
+
+    def _send(self, request, timeout=None):
+        # A single attempt, failures are handled by the caller.
+        with self._export_lock:
+            self._client.Export(
+                request=request,
+                metadata=self._headers,
+                timeout=self._timeout if timeout is None else timeout,
+            )
+
+    def _export(self, data):
+        try:
+            if self._failover is not None:
+                result = self._export_failover(data)
+                error_class = self._failover.last_error
+            elif self._retry:
+                result = super()._export(data)
+                error_class = "FAILURE"
+            else:
+                result, error_class = self._export_once(data)
+        except Exception as error:
+            self._failures.record(
+                type(error).__name__, self._count(data), error
+            )
+            raise
+
+        if result is self._result.FAILURE:
+            self._failures.record(error_class, self._count(data))
+        else:
+            self._failures.record_success()
+
+        return result
+
+    def _export_once(self, data):
+        if self._shutdown:
+            _logger.warning("Exporter already shutdown, ignoring batch")
+            return self._result.FAILURE, "FAILURE"
+
+        timeout = self._attempt_timeout(self.deadline_ns)
+
+        if not timeout:
+            return self._result.FAILURE, "DEADLINE_EXCEEDED"
+
+        try:
+            self._send(self._translate_data(data), timeout)
+        except RpcError as error:
+            return self._result.FAILURE, error.code().name
+
+        return self._result.SUCCESS, None
+
+    def _export_failover(self, data):
+        if self._shutdown:
+            _logger.warning("Exporter already shutdown, ignoring batch")
+            return self._result.FAILURE
+
+        deadline_ns = None if self._retry else self.deadline_ns
+
+        # The request is the same for every endpoint, it is only encoded
+        # once.
+        # pylint: disable=protected-access
+        endpoint = self._failover.send(
+            self._translate_data(data),
+            lambda exporter, request: exporter._send(
+                request, exporter._attempt_timeout(deadline_ns)
+            ),
+            retry=self._retry,
+        )
+
+        if endpoint is None:
+            return self._result.FAILURE
+
+        return self._result.SUCCESS
+
+    def prewarm(self):
+        """
+        Starts establishing the connection to the satellite in the background
+
+        DNS resolution, TCP connection and TLS handshake happen in gRPC's own
+        threads so that the first export finds a ready channel. The time it
+        took for the channel to become ready is logged at debug level.
+
+        Returns:
+            A future that matures when the channel is ready.
+        """
+
+        start = perf_counter_ns()
+
+        def _log_readiness(future):
+            try:
+                future.result()
+            except FutureCancelledError:
+                return
+
+            _logger.debug(
+                "%s channel to %s ready in %.3fms",
+                self._exporting,
+                self._endpoint,
+                (perf_counter_ns() - start) / 1e6,
+            )
+
+        self._channel_ready_future = channel_ready_future(self._channel)
+        self._channel_ready_future.add_done_callback(_log_readiness)
+
+        if self._failover is not None:
+            for exporter in self._failover.exporters[1:]:
+                exporter.prewarm()
+
+        return self._channel_ready_future
+
+    def shutdown(self, *args, **kwargs):
+        if self._channel_ready_future is not None:
+            self._channel_ready_future.cancel()
+
+        self._failures.log_summary()
+
+        if self._failover is not None:
+            # Stops the retries of an export in progress.
+            self._failover.shutdown()
+
+            for exporter in self._failover.exporters[1:]:
+                exporter.shutdown(*args, **kwargs)
+
+        super().shutdown(*args, **kwargs)
+
+        # The OTLP exporters leave their channel open, so that replacing an
+        # exporter would leak its connection.
+        if self._channel is not None:
+            self._channel.close()
@@ -0,0 +1,29 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Entry point of the exporter helper process launched by
+`opentelemetry.launcher.exporter_process.ExporterProcessSpanProcessor`
+
+    python -m opentelemetry.launcher._exporter_helper <file descriptor>
+"""
+
+from socket import socket
+from sys import argv
+
+from opentelemetry.launcher.exporter_process import _serve
+
+if __name__ == "__main__":
+    with socket(fileno=int(argv[1])) as connection:
+        _serve(connection)
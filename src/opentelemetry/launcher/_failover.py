@@ -0,0 +1,202 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Routing of export requests across several satellites
+
+Every endpoint keeps exponentially weighted moving averages of its latency
+and of its error rate. Each request goes to the healthiest endpoint, and to
+the next one when it fails, so that a slow or failed satellite only costs
+the processes pointing at it one failed attempt.
+"""
+
+from logging import getLogger
+from threading import Event, Lock
+from time import monotonic
+from typing import Callable, List, Optional
+
+from grpc import RpcError, StatusCode
+
+_logger = getLogger(__name__)
+
+# Weight of the latest attempt in the moving averages.
+_EWMA_ALPHA = 0.3
+# Endpoints whose error rate is above this are only tried after the others.
+_UNHEALTHY_ERROR_RATE = 0.5
+# An endpoint not tried for this long gets the next request, so that a failed
+# endpoint that recovered or a slow one that got faster is noticed.
+_PROBE_INTERVAL_SECONDS = 30
+# Same limit as the retries of the OTLP exporters.
+_MAX_BACKOFF_SECONDS = 64
+# Same codes as the retries of the OTLP exporters, other codes mean that the
+# request would fail on any endpoint.
+_RETRYABLE_CODES = frozenset(
+    [
+        StatusCode.CANCELLED,
+        StatusCode.DEADLINE_EXCEEDED,
+        StatusCode.RESOURCE_EXHAUSTED,
+        StatusCode.ABORTED,
+        StatusCode.OUT_OF_RANGE,
+        StatusCode.UNAVAILABLE,
+        StatusCode.DATA_LOSS,
+    ]
+)
+
+
+class _EndpointHealth:
+    """
+    Moving averages of the latency and error rate of one endpoint
+    """
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        # In seconds, `None` until the first successful attempt.
+        self.latency = None
+        self.error_rate = 0.0
+        self.last_attempt = None
+
+    def record(self, latency: float, error: bool) -> None:
+        self.last_attempt = monotonic()
+        self.error_rate += _EWMA_ALPHA * (error - self.error_rate)
+
+        if not error:
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency += _EWMA_ALPHA * (latency - self.latency)
+
+    @property
+    def healthy(self) -> bool:
+        return self.error_rate <= _UNHEALTHY_ERROR_RATE
+
+
+class _Failover:
+    """
+    Sends export requests through the healthiest of several exporters
+
+    `send` is called with an exporter and the request and raises `RpcError`
+    when the attempt fails. Endpoints that were never tried or not tried for
+    `probe_interval` seconds come first, the least recently tried first, then
+    the healthy ones from the lowest latency, then the unhealthy ones from
+    the lowest error rate. Healthy endpoints without a successful attempt
+    yet rank with the highest latency measured. When every endpoint failed,
+    they are all tried again after an exponential backoff like the OTLP
+    exporters do with their single endpoint, unless `retry` is `False`. A
+    status code the OTLP exporters don't retry, such as `UNAUTHENTICATED`,
+    fails the request at once.
+    """
+
+    def __init__(self, exporters: List, endpoints: List[str]):
+        self.exporters = exporters
+        self.health = [_EndpointHealth(endpoint) for endpoint in endpoints]
+        self.probe_interval = _PROBE_INTERVAL_SECONDS
+        self._lock = Lock()
+        self._shutdown = Event()
+        # The status code of the last failed attempt.
+        self.last_error = None
+
+    def _order(self) -> List[int]:
+        now = monotonic()
+
+        def key(index):
+            health = self.health[index]
+
+            if health.last_attempt is None:
+                return (0, 0)
+            if now - health.last_attempt > self.probe_interval:
+                return (0, health.last_attempt)
+            if health.healthy:
+                if health.latency is None:
+                    return (1, worst_latency)
+                return (1, health.latency)
+            return (2, health.error_rate)
+
+        with self._lock:
+            worst_latency = max(
+                (
+                    health.latency
+                    for health in self.health
+                    if health.latency is not None
+                ),
+                default=0,
+            )
+
+            return sorted(range(len(self.health)), key=key)
+
+    def send(
+        self,
+        request,
+        send: Callable[[object, object], None],
+        retry: bool = True,
+    ) -> Optional[str]:
+        """
+        Sends `request`, returns the endpoint that accepted it or `None` if
+        every attempt failed
+        """
+        delay = 1
+
+        while not self._shutdown.is_set():
+            for index in self._order():
+                health = self.health[index]
+                start = monotonic()
+
+                try:
+                    send(self.exporters[index], request)
+                except RpcError as error:
+                    self.last_error = error.code().name
+
+                    if error.code() not in _RETRYABLE_CODES:
+                        # The endpoint answered, the request is at fault.
+                        with self._lock:
+                            health.record(monotonic() - start, False)
+
+                        _logger.error(
+                            "Failed to export to %s, error code: %s, not "
+                            "retrying.",
+                            health.endpoint,
+                            error.code(),
+                        )
+                        return None
+
+                    with self._lock:
+                        health.record(monotonic() - start, True)
+
+                    _logger.debug(
+                        "Failed to export to %s, error code: %s",
+                        health.endpoint,
+                        error.code(),
+                    )
+                    continue
+
+                with self._lock:
+                    health.record(monotonic() - start, False)
+
+                return health.endpoint
+
+            if not retry or delay >= _MAX_BACKOFF_SECONDS:
+                break
+
+            _logger.debug(
+                "Export failed on every endpoint, retrying in %ss.", delay
+            )
+
+            if self._shutdown.wait(delay):
+                break
+
+            delay *= 2
+
+        return None
+
+    def shutdown(self) -> None:
+        self._shutdown.set()
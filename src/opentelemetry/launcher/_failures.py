@@ -0,0 +1,198 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Aggregated reports of export failures
+
+During an outage every batch fails the same way. Logging each failure with
+its traceback would flood the logs when they matter the most, failures are
+counted by error class instead and a summary is logged periodically.
+"""
+
+from datetime import datetime, timezone
+from logging import Filter, Logger, LogRecord
+from threading import Lock
+from time import monotonic, time
+from typing import Optional
+
+_SUMMARY_INTERVAL_SECONDS = 60
+
+
+def _format_time(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat(
+        timespec="seconds"
+    )
+
+
+class _FailureReport:
+    """
+    Export failures of one exporter, by error class
+
+    The first failure of each error class in a summary interval is logged
+    right away, with its traceback if it is an exception. The following ones
+    are only counted. Once the interval elapsed since the first failure
+    counted, the next failure or success logs a summary with the count, first
+    and last time seen of every error class and the number of items lost, the
+    summary is also set in the `export_failures` attribute of the log record.
+    """
+
+    def __init__(
+        self,
+        logger: Logger,
+        exporting: str,
+        unit: str,
+        interval: float = _SUMMARY_INTERVAL_SECONDS,
+    ):
+        self._logger = logger
+        self._exporting = exporting
+        self._unit = unit
+        self.interval = interval
+        self._lock = Lock()
+        # Set by the first failure counted.
+        self._window_start = None
+        # Error class to [count, items lost, first seen, last seen]
+        self._errors = {}
+
+    def record(
+        self,
+        error_class: str,
+        lost: int,
+        error: Optional[BaseException] = None,
+    ) -> None:
+        now = time()
+
+        with self._lock:
+            if not self._errors:
+                self._window_start = monotonic()
+
+            entry = self._errors.get(error_class)
+
+            if entry is None:
+                self._errors[error_class] = [1, lost, now, now]
+            else:
+                entry[0] += 1
+                entry[1] += lost
+                entry[3] = now
+
+        if entry is None:
+            self._logger.error(
+                "Unable to export %s to satellite: %s, further %s failures "
+                "are reported every %ss",
+                self._exporting,
+                error if error is not None else error_class,
+                error_class,
+                self.interval,
+                exc_info=error,
+            )
+
+        self.log_summary(force=False)
+
+    def record_success(self) -> None:
+        if self._errors:
+            self.log_summary(force=False)
+
+    def log_summary(self, force: bool = True) -> None:
+        """
+        Logs the failures since the last summary, if any
+
+        Unless `force` is set, nothing is logged before the summary interval
+        elapsed.
+        """
+        with self._lock:
+            if not self._errors:
+                return
+
+            now = monotonic()
+
+            if not force and now - self._window_start < self.interval:
+                return
+
+            errors = self._errors
+            window = now - self._window_start
+            self._errors = {}
+            self._window_start = None
+
+        lost = sum(entry[1] for entry in errors.values())
+        export_failures = {
+            "window_seconds": window,
+            "lost": lost,
+            "errors": {
+                error_class: {
+                    "count": count,
+                    "lost": error_lost,
+                    "first_seen": _format_time(first_seen),
+                    "last_seen": _format_time(last_seen),
+                }
+                for error_class, (
+                    count,
+                    error_lost,
+                    first_seen,
+                    last_seen,
+                ) in errors.items()
+            },
+        }
+
+        self._logger.error(
+            "Failed to export %s %s times in the last %.0fs, %s %s lost: %s",
+            self._exporting,
+            sum(entry[0] for entry in errors.values()),
+            window,
+            lost,
+            self._unit,
+            "; ".join(
+                f"{error_class} {failures['count']} times from "
+                f"{failures['first_seen']} to {failures['last_seen']}"
+                for error_class, failures in (
+                    export_failures["errors"].items()
+                )
+            ),
+            extra={"export_failures": export_failures},
+        )
+
+
+class _RepeatedRecordFilter(Filter):
+    """
+    Lets through only the first of identical log records in an interval
+
+    Records are identical if they have the same message template and
+    arguments, ignoring the arguments after the first `compared_args` ones
+    (a retry delay for instance).
+    """
+
+    def __init__(
+        self, compared_args: int = 3, interval=_SUMMARY_INTERVAL_SECONDS
+    ):
+        super().__init__()
+        self._compared_args = compared_args
+        self.interval = interval
+        self._lock = Lock()
+        self._last_seen = {}
+
+    def filter(self, record: LogRecord) -> bool:
+        args = record.args if isinstance(record.args, tuple) else ()
+        key = (record.msg, tuple(map(str, args[: self._compared_args])))
+        now = monotonic()
+
+        with self._lock:
+            last_seen = self._last_seen.get(key)
+
+            if last_seen is not None and now - last_seen < self.interval:
+                return False
+
+            if len(self._last_seen) > 1024:
+                self._last_seen.clear()
+
+            self._last_seen[key] = now
+
+        return True
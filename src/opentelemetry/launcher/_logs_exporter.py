@@ -0,0 +1,69 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from logging import Filter, getLogger
+
+from opentelemetry.exporter.otlp.proto.grpc._log_exporter import (
+    OTLPLogExporter,
+)
+from opentelemetry.launcher._exporter import _LightstepExporterMixin
+from opentelemetry.proto.collector.logs.v1.logs_service_pb2_grpc import (
+    LogsServiceStub,
+)
+from opentelemetry.sdk._logs import LogData
+from opentelemetry.sdk._logs.export import BatchLogRecordProcessor
+
+_logger = getLogger(__name__)
+
+
+class LightstepOTLPLogExporter(_LightstepExporterMixin, OTLPLogExporter):
+    _stub_class = LogsServiceStub
+    _unit = "log records"
+
+
+class _DroppingBatchLogRecordProcessor(BatchLogRecordProcessor):
+    """
+    Batch log record processor that drops new log records when its queue is
+    full
+
+    The records already queued are kept so that the queue is always drained
+    in order, the number of dropped records is kept in `dropped`.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dropped = 0
+
+    def emit(self, log_data: LogData) -> None:
+        if len(self._queue) >= self._max_queue_size:
+            if not self.dropped:
+                _logger.warning(
+                    "Queue is full, likely log records will be dropped."
+                )
+            self.dropped += 1
+            return
+
+        super().emit(log_data)
+
+
+class _ExcludeOpenTelemetryFilter(Filter):
+    """
+    Keeps the records of OpenTelemetry loggers out of the logging handler
+
+    Otherwise a failed export would log an error that would be queued to be
+    exported again.
+    """
+
+    def filter(self, record):
+        return not record.name.startswith("opentelemetry")
@@ -12,21 +12,34 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from logging import getLogger
+from time import time_ns
 
 from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import (
     OTLPMetricExporter,
 )
+from opentelemetry.launcher._exporter import _LightstepExporterMixin
+from opentelemetry.proto.collector.metrics.v1.metrics_service_pb2_grpc import (
+    MetricsServiceStub,
+)
+
+
+class LightstepOTLPMetricExporter(_LightstepExporterMixin, OTLPMetricExporter):
+    _stub_class = MetricsServiceStub
+    _unit = "data points"
 
-_logger = getLogger(__name__)
+    def export(self, metrics_data, timeout_millis: float = 10_000, **kwargs):
+        # The readers pass what remains of their own deadline.
+        if not self._retry:
+            self.deadline_ns = time_ns() + timeout_millis * 10**6
 
+        return super().export(
+            metrics_data, timeout_millis=timeout_millis, **kwargs
+        )
 
-class LightstepOTLPMetricExporter(OTLPMetricExporter):
-    def export(self, *args, **kwargs):
-        try:
-            super().export(*args, **kwargs)
-        except Exception as error:
-            _logger.exception(
-                "Unable to export metrics to satellite: %s", error
-            )
-            raise
+    def _count(self, data) -> int:
+        return sum(
+            len(metric.data.data_points)
+            for resource_metrics in data.resource_metrics
+            for scope_metrics in resource_metrics.scope_metrics
+            for metric in scope_metrics.metrics
+        )
@@ -0,0 +1,125 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from logging import WARNING, Logger
+from time import perf_counter_ns, time_ns
+
+from opentelemetry.trace import Tracer, set_span_in_context
+
+_STARTUP_SPAN_NAME = "launcher.startup"
+
+
+def _log_report(logger: Logger, msg: str, *args, extra=None) -> None:
+    """
+    Logs a report of the launcher at WARNING level
+
+    The record is handled whatever the level of `logger`, the default
+    OTEL_LOG_LEVEL being ERROR would otherwise hide it.
+    """
+    if logger.disabled:
+        return
+
+    filename, lineno, function, _ = logger.findCaller(stacklevel=2)
+    logger.handle(
+        logger.makeRecord(
+            logger.name,
+            WARNING,
+            filename,
+            lineno,
+            msg,
+            args,
+            None,
+            function,
+            extra,
+        )
+    )
+
+
+class _StartupProfile:
+    """
+    Durations of the consecutive phases of the launcher startup
+
+    `mark` ends the current phase and starts the next one. Marking is cheap
+    enough to always be done, the profile is only reported when
+    LS_LAUNCHER_PROFILE_STARTUP is set.
+    """
+
+    def __init__(self):
+        self.start_time_ns = time_ns()
+        self._start_ns = perf_counter_ns()
+        self._last_ns = self._start_ns
+        # Tuples of phase name, offset from the start and duration, in
+        # nanoseconds.
+        self.phases = []
+
+    def mark(self, phase: str) -> None:
+        now_ns = perf_counter_ns()
+        self.phases.append(
+            (phase, self._last_ns - self._start_ns, now_ns - self._last_ns)
+        )
+        self._last_ns = now_ns
+
+    @property
+    def total_ns(self) -> int:
+        return self._last_ns - self._start_ns
+
+    def log(self, logger: Logger, **attributes) -> None:
+        """
+        Logs the profile as one record, whatever the level of `logger`
+
+        The durations in milliseconds are also set in the `startup_profile`
+        attribute of the record for structured log formatters.
+        """
+        phases_ms = {
+            phase: duration_ns / 1e6 for phase, _, duration_ns in self.phases
+        }
+        startup_profile = {
+            "total_ms": self.total_ns / 1e6,
+            "phases_ms": phases_ms,
+            **attributes,
+        }
+
+        _log_report(
+            logger,
+            "Launcher startup took %.3fms: %s",
+            self.total_ns / 1e6,
+            ", ".join(
+                f"{phase}={duration_ms:.3f}ms"
+                for phase, duration_ms in phases_ms.items()
+            ),
+            extra={"startup_profile": startup_profile},
+        )
+
+    def record_span(self, tracer: Tracer, **attributes) -> None:
+        """
+        Records the startup as a span with a child span per phase, backdated
+        to when the startup happened
+        """
+        span = tracer.start_span(
+            _STARTUP_SPAN_NAME,
+            start_time=self.start_time_ns,
+            attributes=attributes,
+        )
+        context = set_span_in_context(span)
+
+        for phase, offset_ns, duration_ns in self.phases:
+            phase_start_ns = self.start_time_ns + offset_ns
+
+            tracer.start_span(
+                f"{_STARTUP_SPAN_NAME}.{phase}",
+                context=context,
+                start_time=phase_start_ns,
+            ).end(end_time=phase_start_ns + duration_ns)
+
+        span.end(end_time=self.start_time_ns + self.total_ns)
@@ -0,0 +1,308 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Offline capture of telemetry
+
+The capture exporters write OTLP export requests to segment files instead of
+sending them to a satellite, `opentelemetry.launcher.replay` sends them
+later.
+
+A segment is a sequence of records, each one made of a one byte signal, the
+length of the request as a 4 bytes big-endian unsigned integer and the
+serialized `Export*ServiceRequest` protobuf message.
+"""
+
+from logging import getLogger
+from os import getpid, makedirs
+from os.path import join
+from struct import Struct
+from threading import Lock
+from time import time_ns
+from typing import Iterable, Iterator, Sequence, Tuple
+
+from opentelemetry.exporter.otlp.proto.common._log_encoder import encode_logs
+from opentelemetry.exporter.otlp.proto.common.metrics_encoder import (
+    encode_metrics,
+)
+from opentelemetry.exporter.otlp.proto.common.trace_encoder import encode_spans
+from opentelemetry.launcher._encoding import _encode_request, _EncodedSpan
+from opentelemetry.sdk._logs import LogData
+from opentelemetry.sdk._logs.export import LogExporter, LogExportResult
+from opentelemetry.sdk.metrics.export import (
+    MetricExporter,
+    MetricExportResult,
+    MetricsData,
+)
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+
+_logger = getLogger(__name__)
+
+TRACES = b"T"
+METRICS = b"M"
+LOGS = b"L"
+
+_HEADER = Struct("!cI")
+
+_DEFAULT_SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+_SEGMENT_SUFFIX = ".otlp"
+
+
+class SegmentWriter:
+    """
+    Appends serialized export requests to segment files in a directory
+
+    A new segment is started when the current one would grow larger than
+    `segment_max_bytes` and when the process has forked, so that processes
+    never write to the same file. Every record is written and flushed with
+    one write, segments are always readable up to their last complete
+    record.
+
+    Segments are named after the process id, the time the writer was
+    created and a sequence number, so that sorting their names sorts them in
+    the order they were written for each process.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_max_bytes: int = _DEFAULT_SEGMENT_MAX_BYTES,
+    ):
+        makedirs(directory, exist_ok=True)
+
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self._start_time = time_ns()
+        self._lock = Lock()
+        self._pid = None
+        self._file = None
+        self._size = 0
+        self._sequence = 0
+        self._users = 0
+
+    def _open_segment(self):
+        if self._file is not None:
+            self._file.close()
+
+        if self._pid != getpid():
+            self._pid = getpid()
+            self._sequence = 0
+
+        path = join(
+            self.directory,
+            f"{self._pid}-{self._start_time}-{self._sequence:06d}"
+            f"{_SEGMENT_SUFFIX}",
+        )
+        self._sequence += 1
+        # pylint: disable=consider-using-with
+        self._file = open(path, "ab")
+        self._size = 0
+
+    def acquire(self):
+        with self._lock:
+            self._users += 1
+
+    def release(self):
+        """
+        Closes the current segment when the last exporter using this writer
+        is shut down
+        """
+
+        with self._lock:
+            self._users -= 1
+
+            if self._users <= 0 and self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def write(self, signal: bytes, request: bytes) -> None:
+        record = _HEADER.pack(signal, len(request)) + request
+
+        with self._lock:
+            if (
+                self._file is None
+                or self._pid != getpid()
+                or (
+                    self._size
+                    and self._size + len(record) > self.segment_max_bytes
+                )
+            ):
+                self._open_segment()
+
+            self._file.write(record)
+            self._file.flush()
+            self._size += len(record)
+
+
+def _read_records(
+    paths: Iterable[str], offset: int = 0
+) -> Iterator[Tuple[int, int, bytes, bytes]]:
+    # Yields the index of the segment and the offset of every record along
+    # with it, the records of the first segment are read from `offset`.
+    for index, path in enumerate(paths):
+        with open(path, "rb") as segment:
+            segment.seek(offset)
+            offset = 0
+
+            while True:
+                record_offset = segment.tell()
+                header = segment.read(_HEADER.size)
+
+                if not header:
+                    break
+
+                if len(header) < _HEADER.size:
+                    _logger.warning("Skipping truncated record in %s", path)
+                    break
+
+                signal, size = _HEADER.unpack(header)
+
+                if signal not in (TRACES, METRICS, LOGS):
+                    _logger.warning(
+                        "Skipping corrupt segment %s from offset %s, unknown "
+                        "signal %r",
+                        path,
+                        record_offset,
+                        signal,
+                    )
+                    break
+
+                request = segment.read(size)
+
+                if len(request) < size:
+                    _logger.warning("Skipping truncated record in %s", path)
+                    break
+
+                yield index, record_offset, signal, request
+
+
+def read_segments(paths: Iterable[str]) -> Iterator[Tuple[bytes, bytes]]:
+    """
+    Reads the records of segment files
+
+    A truncated record at the end of a segment, left by a process that was
+    killed while writing it, is skipped with a warning. So is the rest of a
+    segment from a record with an unknown signal.
+
+    Yields:
+        Tuples of the signal and the serialized export request.
+    """
+
+    for _, _, signal, request in _read_records(paths):
+        yield signal, request
+
+
+class CaptureSpanExporter(SpanExporter):
+    """
+    Span exporter that writes spans to segment files
+
+    Also accepts the encoded spans queued by `CompactSpanProcessor`.
+    """
+
+    def __init__(self, segment_writer: SegmentWriter):
+        self._segment_writer = segment_writer
+        self._segment_writer.acquire()
+        self._shutdown = False
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        if self._shutdown:
+            return SpanExportResult.FAILURE
+
+        if spans and isinstance(spans[0], _EncodedSpan):
+            request = _encode_request(spans)
+        else:
+            request = encode_spans(spans).SerializeToString()
+
+        try:
+            self._segment_writer.write(TRACES, request)
+        except OSError:
+            _logger.exception("Unable to capture spans")
+            return SpanExportResult.FAILURE
+
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        if not self._shutdown:
+            self._shutdown = True
+            self._segment_writer.release()
+
+
+class CaptureMetricExporter(MetricExporter):
+    """
+    Metric exporter that writes metrics to segment files
+    """
+
+    def __init__(self, segment_writer: SegmentWriter, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._segment_writer = segment_writer
+        self._segment_writer.acquire()
+        self._shutdown = False
+
+    def export(
+        self,
+        metrics_data: MetricsData,
+        timeout_millis: float = 10_000,
+        **kwargs,
+    ) -> MetricExportResult:
+        if self._shutdown:
+            return MetricExportResult.FAILURE
+
+        try:
+            self._segment_writer.write(
+                METRICS, encode_metrics(metrics_data).SerializeToString()
+            )
+        except OSError:
+            _logger.exception("Unable to capture metrics")
+            return MetricExportResult.FAILURE
+
+        return MetricExportResult.SUCCESS
+
+    def force_flush(self, timeout_millis: float = 10_000) -> bool:
+        return True
+
+    def shutdown(self, timeout_millis: float = 30_000, **kwargs) -> None:
+        if not self._shutdown:
+            self._shutdown = True
+            self._segment_writer.release()
+
+
+class CaptureLogExporter(LogExporter):
+    """
+    Log exporter that writes log records to segment files
+    """
+
+    def __init__(self, segment_writer: SegmentWriter):
+        self._segment_writer = segment_writer
+        self._segment_writer.acquire()
+        self._shutdown = False
+
+    def export(self, batch: Sequence[LogData]) -> LogExportResult:
+        if self._shutdown:
+            return LogExportResult.FAILURE
+
+        try:
+            self._segment_writer.write(
+                LOGS, encode_logs(batch).SerializeToString()
+            )
+        except OSError:
+            _logger.exception("Unable to capture logs")
+            return LogExportResult.FAILURE
+
+        return LogExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        if not self._shutdown:
+            self._shutdown = True
+            self._segment_writer.release()
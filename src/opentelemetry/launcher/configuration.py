@@ -13,6 +13,7 @@
 # limitations under the License.
 # pylint: disable=too-many-branches
 
+from json import loads
 from logging import (
     CRITICAL,
     DEBUG,
@@ -24,21 +25,84 @@ from logging import (
     getLevelName,
     getLogger,
 )
+from math import inf
 from socket import gethostname
-from typing import Optional
+from time import perf_counter_ns
+from typing import Optional, Union
 
 from environs import Env
 from grpc import ssl_channel_credentials
 from pkg_resources import iter_entry_points
 
+from opentelemetry._logs import get_logger_provider, set_logger_provider
 from opentelemetry.instrumentation.distro import BaseDistro
+from opentelemetry.launcher._components import (
+    _replace_log_record_processor,
+    _replace_metric_reader,
+    _replace_span_processor,
+)
+from opentelemetry.launcher._failures import _RepeatedRecordFilter
+from opentelemetry.launcher._logs_exporter import (
+    LightstepOTLPLogExporter,
+    _DroppingBatchLogRecordProcessor,
+    _ExcludeOpenTelemetryFilter,
+)
 from opentelemetry.launcher._metrics_exporter import (
     LightstepOTLPMetricExporter,
 )
+from opentelemetry.launcher._startup import _log_report, _StartupProfile
+from opentelemetry.launcher.capture import (
+    CaptureLogExporter,
+    CaptureMetricExporter,
+    CaptureSpanExporter,
+    SegmentWriter,
+)
+from opentelemetry.launcher.cooperative import (
+    CooperativeMetricExporter,
+    CooperativeSpanExporter,
+    _http_endpoint,
+    monkey_patching,
+)
+from opentelemetry.launcher.exporter_process import (
+    ExporterProcessSpanProcessor,
+)
+from opentelemetry.launcher.file_exporter import FileSpanExporter
+from opentelemetry.launcher.memory_budget import (
+    MemoryBudget,
+    MemoryBudgetMetrics,
+    budget_log_record_processor,
+    budget_span_processor,
+)
+from opentelemetry.launcher.metrics_endpoint import MetricsEndpointReader
+from opentelemetry.launcher.profiler import ProfilerSpanProcessor
+from opentelemetry.launcher.runtime_metrics import RuntimeMetrics
+from opentelemetry.launcher.sampling import (
+    AdaptiveSampler,
+    RecordingSampler,
+    RuleBasedSampler,
+)
+from opentelemetry.launcher.scheduler import (
+    ExportScheduler,
+    ScheduledMetricReader,
+    ScheduledSpanProcessor,
+)
+from opentelemetry.launcher.series_eviction import SeriesEviction
+from opentelemetry.launcher.serverless import (
+    ServerlessLogRecordProcessor,
+    ServerlessSpanProcessor,
+    _set_flush_timeout_millis,
+)
+from opentelemetry.launcher.span_metrics import SpanMetricsProcessor
+from opentelemetry.launcher.span_processor import (
+    CompactSpanProcessor,
+    InterningSpanProcessor,
+    PrioritySpanProcessor,
+)
 from opentelemetry.launcher.tracer import LightstepOTLPSpanExporter
-from opentelemetry.metrics import set_meter_provider
+from opentelemetry.metrics import get_meter_provider, set_meter_provider
 from opentelemetry.propagate import set_global_textmap
 from opentelemetry.propagators.composite import CompositePropagator
+from opentelemetry.sdk._logs import LoggerProvider, LoggingHandler
 from opentelemetry.sdk.metrics import (
     Counter,
     Histogram,
@@ -56,7 +120,9 @@ from opentelemetry.sdk.trace import Resource, TracerProvider
 from opentelemetry.sdk.trace.export import (
     BatchSpanProcessor,
     ConsoleSpanExporter,
+    SimpleSpanProcessor,
 )
+from opentelemetry.sdk.trace.sampling import _get_from_env_or_default
 from opentelemetry.trace import get_tracer_provider, set_tracer_provider
 
 from .version import __version__
@@ -70,6 +136,7 @@ _DEFAULT_OTEL_EXPORTER_OTLP_TRACES_ENDPOINT = (
 _DEFAULT_OTEL_EXPORTER_OTLP_METRICS_ENDPOINT = (
     "https://ingest.lightstep.com:443"
 )
+_DEFAULT_OTEL_EXPORTER_OTLP_LOGS_ENDPOINT = "https://ingest.lightstep.com:443"
 
 _LS_ACCESS_TOKEN = _env.str("LS_ACCESS_TOKEN", None)
 _LS_METRICS_ENABLED = _env.bool("LS_METRICS_ENABLED", False)
@@ -103,6 +170,52 @@ _OTEL_EXPORTER_OTLP_METRICS_TEMPORALITY_PREFERENCE = _env.str(
     "OTEL_EXPORTER_OTLP_METRICS_TEMPORALITY_PREFERENCE", "LOWMEMORY"
 )
 _OTEL_METRIC_EXPORT_INTERVAL = _env.int("OTEL_METRIC_EXPORT_INTERVAL", 60000)
+_LS_SERVERLESS = _env.bool("LS_SERVERLESS", False)
+_LS_SERVERLESS_FLUSH_TIMEOUT = _env.int("LS_SERVERLESS_FLUSH_TIMEOUT", 1000)
+_LS_EXPORTER_PREWARM = _env.bool("LS_EXPORTER_PREWARM", False)
+_LS_LOGS_ENABLED = _env.bool("LS_LOGS_ENABLED", False)
+_OTEL_EXPORTER_OTLP_LOGS_ENDPOINT = _env.str(
+    "OTEL_EXPORTER_OTLP_LOGS_ENDPOINT",
+    _DEFAULT_OTEL_EXPORTER_OTLP_LOGS_ENDPOINT,
+)
+_LS_SAMPLER_SPANS_PER_SECOND = _env.float("LS_SAMPLER_SPANS_PER_SECOND", None)
+_LS_SAMPLING_RULES = _env.str("LS_SAMPLING_RULES", None)
+_LS_SAMPLING_RULES_OVERRIDE_REMOTE_PARENT = _env.bool(
+    "LS_SAMPLING_RULES_OVERRIDE_REMOTE_PARENT", False
+)
+_LS_SPAN_PRIORITY_QUEUE = _env.bool("LS_SPAN_PRIORITY_QUEUE", False)
+_LS_COMPACT_SPAN_QUEUE = _env.bool("LS_COMPACT_SPAN_QUEUE", False)
+_LS_EXPORTER_PROCESS = _env.bool("LS_EXPORTER_PROCESS", False)
+_LS_EXPORTER_PROCESS_PYTHON = _env.str("LS_EXPORTER_PROCESS_PYTHON", None)
+_LS_DEBUG_SPAN_FILE = _env.str("LS_DEBUG_SPAN_FILE", None)
+_LS_DEBUG_SPAN_FILE_MAX_BYTES = _env.int(
+    "LS_DEBUG_SPAN_FILE_MAX_BYTES", 100 * 1024 * 1024
+)
+_LS_DEBUG_SPAN_SAMPLE_RATIO = _env.float("LS_DEBUG_SPAN_SAMPLE_RATIO", 1.0)
+_LS_CAPTURE_DIRECTORY = _env.str("LS_CAPTURE_DIRECTORY", None)
+_LS_INSTRUMENTATIONS_ENABLED = _env.list("LS_INSTRUMENTATIONS_ENABLED", [])
+_LS_INSTRUMENTATIONS_DISABLED = _env.list("LS_INSTRUMENTATIONS_DISABLED", [])
+_LS_ADDITIONAL_SPAN_EXPORTER_ENDPOINTS = _env.list(
+    "LS_ADDITIONAL_SPAN_EXPORTER_ENDPOINTS", []
+)
+_LS_ADDITIONAL_METRICS_EXPORTER_ENDPOINTS = _env.list(
+    "LS_ADDITIONAL_METRICS_EXPORTER_ENDPOINTS", []
+)
+_LS_RUNTIME_METRICS_ENABLED = _env.bool("LS_RUNTIME_METRICS_ENABLED", False)
+_LS_METRICS_SERIES_MAX_IDLE_INTERVALS = _env.int(
+    "LS_METRICS_SERIES_MAX_IDLE_INTERVALS", None
+)
+_LS_SHARED_SCHEDULER = _env.bool("LS_SHARED_SCHEDULER", False)
+_LS_COOPERATIVE = _env.bool("LS_COOPERATIVE", False)
+_LS_INTERN_STRINGS = _env.bool("LS_INTERN_STRINGS", False)
+_LS_SPAN_METRICS_ENABLED = _env.bool("LS_SPAN_METRICS_ENABLED", False)
+_LS_MEMORY_BUDGET_BYTES = _env.int("LS_MEMORY_BUDGET_BYTES", None)
+_LS_METRICS_SCRAPE_ENDPOINT = _env.str("LS_METRICS_SCRAPE_ENDPOINT", None)
+_LS_PROFILER_ENABLED = _env.bool("LS_PROFILER_ENABLED", False)
+_LS_LAUNCHER_PROFILE_STARTUP = _env.bool("LS_LAUNCHER_PROFILE_STARTUP", False)
+_LS_LAUNCHER_PROFILE_STARTUP_SPAN = _env.bool(
+    "LS_LAUNCHER_PROFILE_STARTUP_SPAN", False
+)
 
 # FIXME Find a way to "import" this value from:
 # https://github.com/open-telemetry/opentelemetry-collector/blob/master/translator/conventions/opentelemetry.go
@@ -116,10 +229,71 @@ class InvalidConfigurationError(Exception):
     """
 
 
+_OTLP_EXPORTER_LOGGER_NAME = "opentelemetry.exporter.otlp.proto.grpc.exporter"
+
+# The components installed by configure_opentelemetry, by part, so that
+# calling it again only replaces the parts whose configuration changed. Most
+# parts map to a tuple of the provider the component was installed in, the
+# configuration it was built from and the component.
+_installed_components = {}
+
+
+def _installed_component(part, provider, configuration):
+    """
+    Returns the component installed for `part` in `provider` by a previous
+    call, or `None`, and if it was built from `configuration`
+    """
+    installed = _installed_components.get(part)
+
+    if installed is None or installed[0] is not provider:
+        return None, False
+
+    return installed[2], installed[1] == configuration
+
+
+def _install_per_endpoint(
+    part, provider, configuration, endpoints, build, replace
+):
+    """
+    Installs a component built with `build(endpoint)` in `provider` for
+    every endpoint
+
+    The components installed by a previous call for an endpoint that is
+    still in `endpoints` are kept if `configuration` is unchanged, the ones
+    for other endpoints are removed with `replace(provider, old, new)`.
+    """
+    installed, unchanged = _installed_component(part, provider, configuration)
+    installed = dict(installed or {})
+    components = {}
+
+    for endpoint in endpoints:
+        if unchanged and endpoint in installed:
+            components[endpoint] = installed.pop(endpoint)
+            continue
+
+        components[endpoint] = build(endpoint)
+        replace(provider, installed.pop(endpoint, None), components[endpoint])
+
+    for component in installed.values():
+        replace(provider, component, None)
+
+    _installed_components[part] = (provider, configuration, components)
+
+
 def _common_configuration(
-    provider_setter, provider_class, environment_variable, insecure
+    provider_setter,
+    provider_getter,
+    provider_class,
+    environment_variable,
+    insecure,
+    startup_profile,
 ):
-    if _env.str(environment_variable, None) is None:
+    # The global provider can only be set once, the one set by a previous
+    # call is kept.
+    if _env.str(environment_variable, None) is None and (
+        _installed_components.get(environment_variable)
+        is not provider_getter()
+    ):
         # FIXME now that new values can be set in the global configuration
         # object, check for this object having a tracer_provider attribute,
         # if not, set it to "sdk_tracer_provider" instead of using
@@ -127,19 +301,29 @@ def _common_configuration(
         # method of setting configuration.
         provider_setter(provider_class())
 
+        _installed_components[environment_variable] = provider_getter()
+
+    startup_profile.mark("tracer_provider")
+
     if insecure:
         credentials = None
     else:
         credentials = ssl_channel_credentials()
 
+    startup_profile.mark("credentials")
+
     return credentials
 
 
 def configure_opentelemetry(
     access_token: str = _LS_ACCESS_TOKEN,
     metrics_enabled: bool = _LS_METRICS_ENABLED,
-    span_exporter_endpoint: str = _OTEL_EXPORTER_OTLP_TRACES_ENDPOINT,
-    metrics_exporter_endpoint: str = _OTEL_EXPORTER_OTLP_METRICS_ENDPOINT,
+    span_exporter_endpoint: Union[str, list] = (
+        _OTEL_EXPORTER_OTLP_TRACES_ENDPOINT
+    ),
+    metrics_exporter_endpoint: Union[str, list] = (
+        _OTEL_EXPORTER_OTLP_METRICS_ENDPOINT
+    ),
     metrics_exporter_temporality_preference: int = (
         _OTEL_EXPORTER_OTLP_METRICS_TEMPORALITY_PREFERENCE
     ),
@@ -150,6 +334,43 @@ def configure_opentelemetry(
     resource_attributes: str = _OTEL_RESOURCE_ATTRIBUTES,
     log_level: str = _OTEL_LOG_LEVEL,
     span_exporter_insecure: bool = _OTEL_EXPORTER_OTLP_TRACES_INSECURE,
+    serverless: bool = _LS_SERVERLESS,
+    serverless_flush_timeout: int = _LS_SERVERLESS_FLUSH_TIMEOUT,
+    exporter_prewarm: bool = _LS_EXPORTER_PREWARM,
+    logs_enabled: bool = _LS_LOGS_ENABLED,
+    logs_exporter_endpoint: str = _OTEL_EXPORTER_OTLP_LOGS_ENDPOINT,
+    sampler_spans_per_second: float = _LS_SAMPLER_SPANS_PER_SECOND,
+    sampling_rules: Union[str, list] = _LS_SAMPLING_RULES,
+    sampling_rules_override_remote_parent: bool = (
+        _LS_SAMPLING_RULES_OVERRIDE_REMOTE_PARENT
+    ),
+    span_priority_queue: bool = _LS_SPAN_PRIORITY_QUEUE,
+    compact_span_queue: bool = _LS_COMPACT_SPAN_QUEUE,
+    exporter_process: bool = _LS_EXPORTER_PROCESS,
+    exporter_process_python: Optional[str] = _LS_EXPORTER_PROCESS_PYTHON,
+    debug_span_file: str = _LS_DEBUG_SPAN_FILE,
+    debug_span_file_max_bytes: int = _LS_DEBUG_SPAN_FILE_MAX_BYTES,
+    debug_span_sample_ratio: float = _LS_DEBUG_SPAN_SAMPLE_RATIO,
+    capture_directory: str = _LS_CAPTURE_DIRECTORY,
+    additional_span_exporter_endpoints: list = (
+        _LS_ADDITIONAL_SPAN_EXPORTER_ENDPOINTS
+    ),
+    additional_metrics_exporter_endpoints: list = (
+        _LS_ADDITIONAL_METRICS_EXPORTER_ENDPOINTS
+    ),
+    runtime_metrics_enabled: bool = _LS_RUNTIME_METRICS_ENABLED,
+    metrics_series_max_idle_intervals: int = (
+        _LS_METRICS_SERIES_MAX_IDLE_INTERVALS
+    ),
+    shared_scheduler: bool = _LS_SHARED_SCHEDULER,
+    cooperative: bool = _LS_COOPERATIVE,
+    intern_strings: bool = _LS_INTERN_STRINGS,
+    span_metrics_enabled: bool = _LS_SPAN_METRICS_ENABLED,
+    memory_budget_bytes: Optional[int] = _LS_MEMORY_BUDGET_BYTES,
+    metrics_scrape_endpoint: Optional[str] = _LS_METRICS_SCRAPE_ENDPOINT,
+    profiler_enabled: bool = _LS_PROFILER_ENABLED,
+    launcher_profile_startup: bool = _LS_LAUNCHER_PROFILE_STARTUP,
+    launcher_profile_startup_span: bool = _LS_LAUNCHER_PROFILE_STARTUP_SPAN,
     _auto_instrumented: bool = False,
 ):
     # pylint: disable=too-many-locals
@@ -173,10 +394,14 @@ def configure_opentelemetry(
             indicates if metrics are enabled or not. Defaults to `False`.
         span_exporter_endpoint (str): OTEL_EXPORTER_OTLP_TRACES_ENDPOINT, the
             URL of the Lightstep satellite where the spans are to be exported.
-            Defaults to `ingest.lightstep.com:443`.
+            A list or a comma separated string of URLs spreads the exports
+            across several satellites, each batch is exported to the one
+            with the lowest latency and error rate and to the next one if it
+            fails. Defaults to `ingest.lightstep.com:443`.
         metrics_exporter_endpoint (str): OTEL_EXPORTER_OTLP_METRICS_ENDPOINT,
             the URL of the Lightstep satellite where the metrics are to be
-            exported. Defaults to `ingest.lightstep.com:443`.
+            exported. Can be several URLs like `span_exporter_endpoint`.
+            Defaults to `ingest.lightstep.com:443`.
         metrics_exporter_temporality_preference (str): OTEL_EXPORTER_OTLP_METRICS_TEMPORALITY_PREFERENCE,
             The preferred association between instrument type and temporality,
             meaningless if `metrics_enabled` is `False`. Can be `DELTA`,
@@ -239,7 +464,205 @@ def configure_opentelemetry(
             OTEL_EXPORTER_OTLP_TRACES_INSECURE, a boolean value that indicates
             if an insecure channel is to be used to send spans to the
             satellite. Defaults to `False`.
+        serverless (bool): LS_SERVERLESS, a boolean value that indicates if
+            the process runs in a serverless platform (like AWS Lambda) that
+            freezes the process between invocations. If `True`, no background
+            export threads are started, spans, metrics and log records are
+            buffered in memory and exported synchronously when
+            `opentelemetry.launcher.serverless.flush_on_exit` or
+            `opentelemetry.launcher.serverless.flush` are called at the end of
+            every invocation. Failed exports are not retried. Defaults to
+            `False`.
+        serverless_flush_timeout (int): LS_SERVERLESS_FLUSH_TIMEOUT, the
+            deadline in milliseconds to flush spans, metrics and log records
+            at the end of every invocation, which also bounds every export
+            attempt, meaningless if `serverless` is `False`. Defaults to
+            `1000`.
+        exporter_prewarm (bool): LS_EXPORTER_PREWARM, a boolean value that
+            indicates if the connections of the span and metric exporters are
+            to be established in the background right away instead of when
+            the first batch is exported. The time it takes for the connections
+            to be ready is logged at debug level. Defaults to `False`.
+        logs_enabled (bool): LS_LOGS_ENABLED, a boolean value that indicates
+            if a handler is to be added to the root logger to export the
+            records of the `logging` module along with the current trace and
+            span ids. The records are queued in a bounded queue and exported
+            by a background thread. New records are dropped when the queue is
+            full. The maximum size of the queue can be set with the
+            OTEL_BLRP_MAX_QUEUE_SIZE environment variable. Defaults to `False`.
+        logs_exporter_endpoint (str): OTEL_EXPORTER_OTLP_LOGS_ENDPOINT, the
+            URL of the Lightstep satellite where the logs are to be exported.
+            Defaults to `ingest.lightstep.com:443`.
+        sampler_spans_per_second (float): LS_SAMPLER_SPANS_PER_SECOND, the
+            budget of sampled spans per second for this process. If set, an
+            `opentelemetry.launcher.sampling.AdaptiveSampler` continuously
+            adjusts the ratio of sampled traces to stay near this budget,
+            following the decision of the parent span when there is one. The
+            ratio used is recorded in the `sampling.ratio` attribute of root
+            spans. Defaults to `None`.
+        sampling_rules (list): LS_SAMPLING_RULES, a JSON list in the
+            environment variable, rules that sample root spans by name, kind
+            and attributes, each with a ratio or a rate limit, for instance
+            `[{"attributes": {"http.target": "/health"}, "ratio": 0},
+            {"name": "POST /checkout", "ratio": 1}]`. The first rule a span
+            matches decides, spans that match no rule are sampled as if
+            there were no rules. Spans with a parent, remote or local,
+            follow its decision. See
+            `opentelemetry.launcher.sampling.RuleBasedSampler`. Defaults to
+            `None`.
+        sampling_rules_override_remote_parent (bool):
+            LS_SAMPLING_RULES_OVERRIDE_REMOTE_PARENT, a boolean value that
+            indicates if `sampling_rules` also apply to spans with a remote
+            parent, overriding the decision of the upstream service, which
+            breaks the traces it sampled when a rule drops them. Defaults to
+            `False`.
+        span_priority_queue (bool): LS_SPAN_PRIORITY_QUEUE, a boolean value
+            that indicates if the span queue is to evict the least valuable
+            spans first when full: short successful non-root spans are
+            evicted before root spans, which are evicted before error spans.
+            The number of dropped spans by class is logged at shutdown.
+            Meaningless if `serverless` is `True`. Defaults to `False`.
+        compact_span_queue (bool): LS_COMPACT_SPAN_QUEUE, a boolean value that
+            indicates if spans are to be encoded into OTLP protobuf bytes when
+            they end, so that the span queue holds a few hundred bytes per span
+            instead of whole span objects. Spans are encoded in the thread
+            that ends them. Can't be used along with `span_priority_queue`.
+            Meaningless if `serverless` is `True`. Defaults to `False`.
+        exporter_process (bool): LS_EXPORTER_PROCESS, a boolean value that
+            indicates if spans are to be exported by a helper process. Ended
+            spans are forwarded over a Unix domain socket to a process
+            launched and supervised by the launcher, which batches, encodes
+            and exports them, keeping that work from competing for the GIL
+            with the application threads. Can't be used along with
+            `serverless`, `span_priority_queue` or `compact_span_queue`.
+            Defaults to `False`.
+        exporter_process_python (str): LS_EXPORTER_PROCESS_PYTHON, the path
+            of the Python interpreter running the helper process of
+            `exporter_process`. When Python is embedded in a server such as
+            uWSGI or mod_wsgi, the interpreter installed in `sys.exec_prefix`
+            is used if this is not set. Defaults to `None`.
+        debug_span_file (str): LS_DEBUG_SPAN_FILE, the path of the file where
+            spans are written when `log_level` is `DEBUG`, instead of
+            printing them to the standard output. Spans are appended in
+            batches as OTLP JSON lines, one `ExportTraceServiceRequest` per
+            line. A file that can't be opened for appending is an invalid
+            configuration. Defaults to `None`.
+        debug_span_file_max_bytes (int): LS_DEBUG_SPAN_FILE_MAX_BYTES, the
+            maximum size in bytes of `debug_span_file`. When it is reached,
+            the file is rotated and only one rotated file is kept. Defaults
+            to `104857600`.
+        debug_span_sample_ratio (float): LS_DEBUG_SPAN_SAMPLE_RATIO, the ratio
+            of traces whose spans are written to `debug_span_file`, between 0
+            and 1. Defaults to `1.0`.
+        capture_directory (str): LS_CAPTURE_DIRECTORY, the path of a
+            directory where spans, metrics and logs are to be written as
+            length-prefixed OTLP protobuf export requests instead of being
+            sent to the satellite. The captured segment files can be sent
+            later with `python -m opentelemetry.launcher.replay`. No access
+            token is needed when it is set. Can't be used along with
+            `exporter_process`. Defaults to `None`.
+        additional_span_exporter_endpoints (list):
+            LS_ADDITIONAL_SPAN_EXPORTER_ENDPOINTS, the URLs of other OTLP
+            endpoints where spans are also to be exported, like a local
+            collector. Every endpoint has its own queue, worker thread and
+            exporter, so that a slow or unavailable endpoint doesn't delay
+            or drop the spans exported to the others. The access token is
+            not sent to them, their headers can be set with
+            OTEL_EXPORTER_OTLP_HEADERS. Their connection is insecure if
+            `span_exporter_insecure` is set or their scheme is `http`.
+            Defaults to `[]`.
+        additional_metrics_exporter_endpoints (list):
+            LS_ADDITIONAL_METRICS_EXPORTER_ENDPOINTS, the URLs of other OTLP
+            endpoints where metrics are also to be exported, each one with
+            its own metric reader, see `additional_span_exporter_endpoints`.
+            Defaults to `[]`.
+        runtime_metrics_enabled (bool): LS_RUNTIME_METRICS_ENABLED, a
+            boolean value that indicates if the runtime metrics of the
+            process (garbage collections, threads, memory, CPU time, file
+            descriptors and event loop lag) are to be reported. Meaningless
+            if `metrics_enabled` is `False`. Defaults to `False`.
+        metrics_series_max_idle_intervals (int):
+            LS_METRICS_SERIES_MAX_IDLE_INTERVALS, the number of metric
+            export intervals after which the series of an instrument that
+            were not updated are removed from memory, see
+            `metrics_exporter_interval`. A removed series updated again
+            starts over. The evicted and kept series are counted by the
+            `metric_series.evicted` and `metric_series.active` metrics.
+            Meaningless if `metrics_enabled` is `False`. Defaults to `None`,
+            series are then never removed.
+        shared_scheduler (bool): LS_SHARED_SCHEDULER, a boolean value that
+            indicates if the spans and metrics of every pipeline are to be
+            exported from a single thread that only wakes up when the next
+            export is due, instead of a thread per span processor and metric
+            reader. Exports then happen one after the other, without retries
+            so that an unreachable endpoint does not hold up the others, each
+            within its export timeout. Can't be used along with `serverless`,
+            `exporter_process`, `span_priority_queue` or
+            `compact_span_queue`. Defaults to `False`.
+        cooperative (bool): LS_COOPERATIVE, a boolean value that indicates
+            if spans and metrics are to be exported in a way that cooperates
+            with the hub of gevent or eventlet: from the shared scheduler
+            (see `shared_scheduler`), with OTLP over HTTP instead of gRPC.
+            The span and metric exporter endpoints must then accept OTLP
+            over HTTP, an endpoint without a scheme gets `http` if
+            `span_exporter_insecure` is set, `https` otherwise. Can't be
+            used along with `serverless`, `exporter_process`,
+            `span_priority_queue`, `compact_span_queue` or several
+            endpoints. Defaults to `False`, a warning is logged if the
+            socket module is monkey patched by gevent or eventlet.
+        intern_strings (bool): LS_INTERN_STRINGS, a boolean value that
+            indicates if the span names, attribute keys, event names and
+            the values of low cardinality attributes like `http.method` or
+            `http.route` are to be deduplicated with a bounded intern table,
+            so that queued spans share one copy of each string. Defaults to
+            `False`.
+        span_metrics_enabled (bool): LS_SPAN_METRICS_ENABLED, a boolean
+            value that indicates if the `span.calls`, `span.errors` and
+            `span.duration` metrics are to be computed from every span that
+            ends, by service, span name, span kind and status code. Spans
+            that are not sampled are then recorded, without being exported,
+            so that they are counted too. Meaningless if `metrics_enabled`
+            is `False`. Defaults to `False`.
+        memory_budget_bytes (int): LS_MEMORY_BUDGET_BYTES, the approximate
+            number of bytes the span queues, the log record queue and the
+            metric series may use together. Past 90% of the budget, only
+            spans with an error status, local root spans, warning log
+            records and the existing metric series are kept, past 100%
+            nothing new is. The usage and the telemetry dropped are reported
+            by the `telemetry.memory.usage`, `telemetry.memory.limit` and
+            `telemetry.memory.shed` metrics. Defaults to `None`, the buffers
+            are then only limited by their own sizes.
+        metrics_scrape_endpoint (str): LS_METRICS_SCRAPE_ENDPOINT, the
+            `host:port` address of a local HTTP endpoint serving the metrics
+            when scraped, in the Prometheus text format at `/metrics` and
+            as OTLP protobuf at `/v1/metrics`, instead of exporting them to
+            `metrics_exporter_endpoint` periodically. The temporality of
+            the metrics follows `metrics_exporter_temporality_preference`.
+            Every process serves its own metrics: when the port is taken,
+            by another worker of a pre-fork server for instance, the next
+            free port is used, and processes forked after configuration
+            listen on a port of their own. Port 0 lets the system pick a
+            port. Can't be used with `serverless`. Meaningless if
+            `metrics_enabled` is `False`. Defaults to `None`.
+        profiler_enabled (bool): LS_PROFILER_ENABLED, a boolean value that
+            indicates if the stacks of the threads running spans are to be
+            sampled, with an overhead kept under 1% of a CPU. The stacks are
+            aggregated by span name and exported every minute as `profile`
+            spans, with the folded stacks in their `profile.folded_stacks`
+            attribute and links to the sampled spans. Defaults to `False`.
+        launcher_profile_startup (bool): LS_LAUNCHER_PROFILE_STARTUP, a
+            boolean value that indicates if the duration of every phase of
+            this function is to be logged at WARNING level when it returns,
+            whatever `log_level` is. The durations are also set in the
+            `startup_profile` attribute of the log record. Defaults to
+            `False`.
+        launcher_profile_startup_span (bool):
+            LS_LAUNCHER_PROFILE_STARTUP_SPAN, a boolean value that indicates
+            if the startup is also to be recorded as a `launcher.startup`
+            span with a child span per phase. Meaningless if
+            `launcher_profile_startup` is `False`. Defaults to `False`.
     """
+    startup_profile = _StartupProfile()
 
     log_levels = {
         "NOTSET": NOTSET,
@@ -258,6 +681,8 @@ def configure_opentelemetry(
     # arguments.
     propagators = _env.list("", propagators)
     resource_attributes = _env.dict("", resource_attributes)
+    span_exporter_endpoint = _parse_endpoints(span_exporter_endpoint)
+    metrics_exporter_endpoint = _parse_endpoints(metrics_exporter_endpoint)
 
     log_level = log_level.upper()
 
@@ -288,15 +713,21 @@ def configure_opentelemetry(
         _logger.error(message)
         raise InvalidConfigurationError(message)
 
-    if access_token is None:
+    if access_token is None and capture_directory is None:
         if (
             span_exporter_endpoint
             == _DEFAULT_OTEL_EXPORTER_OTLP_TRACES_ENDPOINT
             or (
                 metrics_enabled
+                and metrics_scrape_endpoint is None
                 and metrics_exporter_endpoint
                 == (_DEFAULT_OTEL_EXPORTER_OTLP_METRICS_ENDPOINT)
             )
+            or (
+                logs_enabled
+                and logs_exporter_endpoint
+                == (_DEFAULT_OTEL_EXPORTER_OTLP_LOGS_ENDPOINT)
+            )
         ):
             message = (
                 "Invalid configuration: token missing. "
@@ -318,6 +749,168 @@ def configure_opentelemetry(
         _logger.error(message)
         raise InvalidConfigurationError(message)
 
+    if span_priority_queue and compact_span_queue:
+        message = (
+            "Invalid configuration: span_priority_queue and "
+            "compact_span_queue can't be used together."
+        )
+        _logger.error(message)
+        raise InvalidConfigurationError(message)
+
+    if exporter_process and (
+        serverless or span_priority_queue or compact_span_queue
+    ):
+        message = (
+            "Invalid configuration: exporter_process can't be used along with "
+            "serverless, span_priority_queue or compact_span_queue."
+        )
+        _logger.error(message)
+        raise InvalidConfigurationError(message)
+
+    incompatible_with_cooperative = (
+        serverless
+        or exporter_process
+        or span_priority_queue
+        or compact_span_queue
+        or isinstance(span_exporter_endpoint, list)
+        or isinstance(metrics_exporter_endpoint, list)
+    )
+
+    if cooperative:
+        if incompatible_with_cooperative:
+            message = (
+                "Invalid configuration: cooperative can't be used along with "
+                "serverless, exporter_process, span_priority_queue, "
+                "compact_span_queue or several exporter endpoints."
+            )
+            _logger.error(message)
+            raise InvalidConfigurationError(message)
+
+        cooperative_endpoints = [span_exporter_endpoint]
+        cooperative_endpoints.extend(additional_span_exporter_endpoints)
+
+        if metrics_enabled:
+            cooperative_endpoints.append(metrics_exporter_endpoint)
+            cooperative_endpoints.extend(additional_metrics_exporter_endpoints)
+
+        for endpoint in cooperative_endpoints:
+            try:
+                _http_endpoint(endpoint, "traces", span_exporter_insecure)
+            except ValueError as error:
+                message = (
+                    f"Invalid configuration: invalid endpoint {endpoint} for "
+                    "cooperative, it must be an OTLP/HTTP URL or host:port."
+                )
+                _logger.error(message)
+                raise InvalidConfigurationError(message) from error
+
+        shared_scheduler = True
+
+    elif monkey_patching() is not None:
+        _logger.warning(
+            "The socket module is monkey patched by %s, the gRPC exporters "
+            "may block its hub. Set LS_COOPERATIVE=true to export over "
+            "OTLP/HTTP instead.",
+            monkey_patching(),
+        )
+
+    if shared_scheduler and (
+        serverless
+        or exporter_process
+        or span_priority_queue
+        or compact_span_queue
+    ):
+        message = (
+            "Invalid configuration: shared_scheduler can't be used along with "
+            "serverless, exporter_process, span_priority_queue or "
+            "compact_span_queue."
+        )
+        _logger.error(message)
+        raise InvalidConfigurationError(message)
+
+    if exporter_process and capture_directory is not None:
+        message = (
+            "Invalid configuration: exporter_process can't be used along with "
+            "capture_directory."
+        )
+        _logger.error(message)
+        raise InvalidConfigurationError(message)
+
+    if not 0 <= debug_span_sample_ratio <= 1:
+        message = (
+            "Invalid configuration: invalid debug_span_sample_ratio value. "
+            "It must be between 0 and 1."
+        )
+        _logger.error(message)
+        raise InvalidConfigurationError(message)
+
+    if debug_span_file_max_bytes <= 0:
+        message = (
+            "Invalid configuration: invalid debug_span_file_max_bytes value. "
+            "It must be a positive number."
+        )
+        _logger.error(message)
+        raise InvalidConfigurationError(message)
+
+    if metrics_scrape_endpoint is not None:
+        scrape_host, _, scrape_port = metrics_scrape_endpoint.rpartition(":")
+
+        if serverless or not scrape_port.isdigit():
+            message = (
+                "Invalid configuration: invalid metrics_scrape_endpoint "
+                "value. It must be a host:port address and can't be used "
+                "together with serverless."
+            )
+            _logger.error(message)
+            raise InvalidConfigurationError(message)
+
+    if memory_budget_bytes is not None and memory_budget_bytes <= 0:
+        message = (
+            "Invalid configuration: invalid memory_budget_bytes value. It "
+            "must be a positive number."
+        )
+        _logger.error(message)
+        raise InvalidConfigurationError(message)
+
+    if (
+        metrics_series_max_idle_intervals is not None
+        and metrics_series_max_idle_intervals <= 0
+    ):
+        message = (
+            "Invalid configuration: invalid metrics_series_max_idle_intervals "
+            "value. It must be a positive number."
+        )
+        _logger.error(message)
+        raise InvalidConfigurationError(message)
+
+    if sampler_spans_per_second is not None and sampler_spans_per_second <= 0:
+        message = (
+            "Invalid configuration: invalid sampler_spans_per_second value. "
+            "It must be a positive number."
+        )
+        _logger.error(message)
+        raise InvalidConfigurationError(message)
+
+    rule_based_sampler = None
+
+    if sampling_rules:
+        try:
+            if isinstance(sampling_rules, str):
+                sampling_rules = loads(sampling_rules)
+
+            rule_based_sampler = RuleBasedSampler(
+                sampling_rules,
+                override_remote_parent=sampling_rules_override_remote_parent,
+            )
+        except (ValueError, TypeError, AttributeError) as error:
+            message = (
+                f"Invalid configuration: invalid sampling_rules value: {error}"
+            )
+            _logger.error(message)
+            raise InvalidConfigurationError(message) from error
+
+    startup_profile.mark("validation")
+
     _logger.debug("configuring propagation")
 
     propagator_instances = []
@@ -338,6 +931,8 @@ def configure_opentelemetry(
 
     set_global_textmap(CompositePropagator(propagator_instances))
 
+    startup_profile.mark("propagators")
+
     headers = None
 
     if access_token != "":
@@ -347,21 +942,322 @@ def configure_opentelemetry(
 
     credentials = _common_configuration(
         set_tracer_provider,
+        get_tracer_provider,
         TracerProvider,
         "OTEL_PYTHON_TRACER_PROVIDER",
         span_exporter_insecure,
+        startup_profile,
     )
 
-    get_tracer_provider().add_span_processor(
-        BatchSpanProcessor(
-            LightstepOTLPSpanExporter(
+    tracer_provider = get_tracer_provider()
+
+    if sampler_spans_per_second is not None:
+        if isinstance(tracer_provider, TracerProvider):
+            _, unchanged = _installed_component(
+                "sampler", tracer_provider, sampler_spans_per_second
+            )
+
+            # An unchanged sampler keeps its measured rate.
+            if not unchanged:
+                tracer_provider.sampler = AdaptiveSampler(
+                    sampler_spans_per_second
+                )
+                _installed_components["sampler"] = (
+                    tracer_provider,
+                    sampler_spans_per_second,
+                    tracer_provider.sampler,
+                )
+        else:
+            _logger.warning(
+                "Unable to set the adaptive sampler, the tracer provider is "
+                "not an SDK TracerProvider"
+            )
+    elif "sampler" in _installed_components:
+        # The sampler the provider was created with, the rules and the
+        # recording sampler are set again around it below.
+        if _installed_components.pop("sampler")[0] is tracer_provider:
+            tracer_provider.sampler = _get_from_env_or_default()
+
+    if isinstance(tracer_provider, TracerProvider):
+        sampler = tracer_provider.sampler
+
+        if isinstance(sampler, RecordingSampler):
+            sampler = sampler.sampler
+
+        if isinstance(sampler, RuleBasedSampler):
+            sampler = sampler.fallback
+
+        if rule_based_sampler is not None:
+            rules_configuration = (
+                sampling_rules,
+                sampling_rules_override_remote_parent,
+            )
+            installed_rule_based_sampler, unchanged = _installed_component(
+                "rule_based_sampler", tracer_provider, rules_configuration
+            )
+
+            # Unchanged rules keep the state of their rate limits.
+            if unchanged:
+                rule_based_sampler = installed_rule_based_sampler
+
+            rule_based_sampler.fallback = sampler
+            sampler = rule_based_sampler
+            _installed_components["rule_based_sampler"] = (
+                tracer_provider,
+                rules_configuration,
+                rule_based_sampler,
+            )
+
+        # The span metrics processor needs to see the spans the sampler
+        # drops.
+        if metrics_enabled and span_metrics_enabled:
+            sampler = RecordingSampler(sampler)
+
+        tracer_provider.sampler = sampler
+
+    startup_profile.mark("sampler")
+
+    # The OTLP exporters log every retry of every batch, only the first of
+    # the identical ones are kept. The filter of a previous call is replaced
+    # so that no record stays filtered out after a reconfiguration.
+    otlp_exporter_logger = getLogger(_OTLP_EXPORTER_LOGGER_NAME)
+    repeated_record_filter = _installed_components.get(
+        "repeated_record_filter"
+    )
+
+    if repeated_record_filter is not None:
+        otlp_exporter_logger.removeFilter(repeated_record_filter)
+
+    repeated_record_filter = _RepeatedRecordFilter()
+    otlp_exporter_logger.addFilter(repeated_record_filter)
+    _installed_components["repeated_record_filter"] = repeated_record_filter
+
+    capture_writer, unchanged = _installed_component(
+        "capture_writer", None, capture_directory
+    )
+
+    if not unchanged:
+        if capture_directory is not None:
+            capture_writer = SegmentWriter(capture_directory)
+        else:
+            capture_writer = None
+
+        _installed_components["capture_writer"] = (
+            None,
+            capture_directory,
+            capture_writer,
+        )
+
+    memory_budget, unchanged = _installed_component(
+        "memory_budget", None, memory_budget_bytes
+    )
+
+    if not unchanged:
+        if memory_budget_bytes is not None:
+            memory_budget = MemoryBudget(memory_budget_bytes)
+        else:
+            memory_budget = None
+
+        _installed_components["memory_budget"] = (
+            None,
+            memory_budget_bytes,
+            memory_budget,
+        )
+
+    if serverless:
+        _set_flush_timeout_millis(serverless_flush_timeout)
+
+    scheduler = None
+
+    if shared_scheduler:
+        # The scheduler thread is idle once it has no timers left, it is
+        # kept for later calls.
+        scheduler = _installed_components.get("scheduler")
+
+        if scheduler is None:
+            scheduler = ExportScheduler()
+            _installed_components["scheduler"] = scheduler
+
+    installed_interning_span_processor, unchanged = _installed_component(
+        "interning_span_processor", tracer_provider, intern_strings
+    )
+
+    if not unchanged:
+        interning_span_processor = (
+            InterningSpanProcessor() if intern_strings else None
+        )
+
+        # Spans are interned in place, before the other processors queue or
+        # encode them.
+        _replace_span_processor(
+            tracer_provider,
+            installed_interning_span_processor,
+            interning_span_processor,
+            first=True,
+        )
+        _installed_components["interning_span_processor"] = (
+            tracer_provider,
+            intern_strings,
+            interning_span_processor,
+        )
+
+    span_configuration = (
+        span_exporter_endpoint,
+        span_exporter_insecure,
+        headers,
+        serverless,
+        serverless_flush_timeout,
+        exporter_process,
+        exporter_process_python,
+        span_priority_queue,
+        compact_span_queue,
+        shared_scheduler,
+        cooperative,
+        capture_directory,
+        memory_budget_bytes,
+    )
+
+    installed_span_processor, unchanged = _installed_component(
+        "span_processor", tracer_provider, span_configuration
+    )
+
+    if unchanged:
+        _logger.debug("span exporter unchanged")
+    else:
+        if capture_writer is not None:
+            span_exporter = CaptureSpanExporter(capture_writer)
+        elif exporter_process:
+            span_exporter = None
+        elif serverless:
+            # Without retries, so that a flush never outlasts its deadline.
+            span_exporter = LightstepOTLPSpanExporter(
                 endpoint=span_exporter_endpoint,
                 credentials=credentials,
                 headers=headers,
+                timeout=serverless_flush_timeout / 1e3,
+                retry=False,
             )
+        elif cooperative:
+            span_exporter = CooperativeSpanExporter(
+                span_exporter_endpoint,
+                headers=headers,
+                insecure=span_exporter_insecure,
+                retry=False,
+            )
+        else:
+            # Retries from the shared scheduler would hold up every other
+            # pipeline.
+            span_exporter = LightstepOTLPSpanExporter(
+                endpoint=span_exporter_endpoint,
+                credentials=credentials,
+                headers=headers,
+                retry=not shared_scheduler,
+            )
+
+        startup_profile.mark("span_exporter")
+
+        if serverless:
+            span_processor = ServerlessSpanProcessor(span_exporter)
+        elif exporter_process:
+            span_processor = ExporterProcessSpanProcessor(
+                span_exporter_endpoint,
+                insecure=span_exporter_insecure,
+                headers=headers,
+                python=exporter_process_python,
+            )
+        elif span_priority_queue:
+            span_processor = PrioritySpanProcessor(span_exporter)
+        elif compact_span_queue:
+            span_processor = CompactSpanProcessor(span_exporter)
+        elif shared_scheduler:
+            span_processor = ScheduledSpanProcessor(span_exporter, scheduler)
+        else:
+            span_processor = BatchSpanProcessor(span_exporter)
+
+        if (
+            exporter_prewarm
+            and not exporter_process
+            and capture_writer is None
+        ):
+            span_exporter.prewarm()
+
+        budget_span_processor(span_processor, memory_budget)
+
+        _replace_span_processor(
+            tracer_provider, installed_span_processor, span_processor
         )
+        _installed_components["span_processor"] = (
+            tracer_provider,
+            span_configuration,
+            span_processor,
+        )
+
+        startup_profile.mark("span_processor")
+
+    # The access token is only sent to Lightstep, the additional endpoints
+    # get the headers of OTEL_EXPORTER_OTLP_HEADERS if any. Their connection
+    # is insecure if span_exporter_insecure is set or their scheme is http.
+    additional_exporter_kwargs = {
+        "credentials": credentials,
+        "insecure": span_exporter_insecure or None,
+    }
+
+    def _additional_span_processor(endpoint):
+        if serverless:
+            return ServerlessSpanProcessor(
+                LightstepOTLPSpanExporter(
+                    endpoint=endpoint,
+                    timeout=serverless_flush_timeout / 1e3,
+                    retry=False,
+                    **additional_exporter_kwargs,
+                )
+            )
+
+        if cooperative:
+            additional_span_exporter = CooperativeSpanExporter(
+                endpoint, insecure=span_exporter_insecure, retry=False
+            )
+        else:
+            additional_span_exporter = LightstepOTLPSpanExporter(
+                endpoint=endpoint,
+                retry=not shared_scheduler,
+                **additional_exporter_kwargs,
+            )
+
+        if exporter_prewarm:
+            additional_span_exporter.prewarm()
+
+        if span_priority_queue:
+            return PrioritySpanProcessor(additional_span_exporter)
+        if compact_span_queue:
+            return CompactSpanProcessor(additional_span_exporter)
+        if shared_scheduler:
+            return ScheduledSpanProcessor(additional_span_exporter, scheduler)
+        return BatchSpanProcessor(additional_span_exporter)
+
+    _install_per_endpoint(
+        "additional_span_processors",
+        tracer_provider,
+        (
+            span_exporter_insecure,
+            serverless,
+            serverless_flush_timeout,
+            span_priority_queue,
+            compact_span_queue,
+            shared_scheduler,
+            cooperative,
+            memory_budget_bytes,
+        ),
+        additional_span_exporter_endpoints,
+        lambda endpoint: budget_span_processor(
+            _additional_span_processor(endpoint), memory_budget
+        ),
+        _replace_span_processor,
     )
 
+    if additional_span_exporter_endpoints:
+        startup_profile.mark("additional_span_processors")
+
     if _ATTRIBUTE_HOST_NAME not in resource_attributes.keys() or not (
         resource_attributes[_ATTRIBUTE_HOST_NAME]
     ):
@@ -382,7 +1278,7 @@ def configure_opentelemetry(
                 "Unable to get hostname, %s", no_hostname_message
             )
 
-    tracer_provider = get_tracer_provider()
+    startup_profile.mark("hostname")
 
     if isinstance(tracer_provider, TracerProvider):
         # FIXME: Accessing a private attribute here because resource is no
@@ -419,6 +1315,8 @@ def configure_opentelemetry(
 
         get_tracer_provider()._resource = Resource(resource_attributes_copy)
 
+    startup_profile.mark("resource")
+
     logged_attributes = {
         "access_token": access_token,
         "span_exporter_endpoint": span_exporter_endpoint,
@@ -427,21 +1325,246 @@ def configure_opentelemetry(
         "resource_attributes": resource_attributes,
         "log_level": getLevelName(log_level),
         "span_exporter_insecure": span_exporter_insecure,
+        "serverless": serverless,
+        "exporter_prewarm": exporter_prewarm,
+        "sampler_spans_per_second": sampler_spans_per_second,
+        "sampling_rules": sampling_rules,
+        "sampling_rules_override_remote_parent": (
+            sampling_rules_override_remote_parent
+        ),
+        "span_priority_queue": span_priority_queue,
+        "compact_span_queue": compact_span_queue,
+        "exporter_process": exporter_process,
+        "exporter_process_python": exporter_process_python,
+        "capture_directory": capture_directory,
+        "additional_span_exporter_endpoints": (
+            additional_span_exporter_endpoints
+        ),
+        "shared_scheduler": shared_scheduler,
+        "cooperative": cooperative,
+        "intern_strings": intern_strings,
+        "memory_budget_bytes": memory_budget_bytes,
+        "launcher_profile_startup": launcher_profile_startup,
     }
 
     logged_attributes.update(resource_attributes)
 
     if log_level <= DEBUG:
-        get_tracer_provider().add_span_processor(
-            BatchSpanProcessor(ConsoleSpanExporter())
+        debug_configuration = (
+            debug_span_file,
+            debug_span_file_max_bytes,
+            debug_span_sample_ratio,
+            serverless,
+            shared_scheduler,
+            memory_budget_bytes,
+        )
+
+        if debug_span_file is not None:
+            logged_attributes["debug_span_file"] = debug_span_file
+    else:
+        debug_configuration = None
+
+    installed_debug_span_processor, unchanged = _installed_component(
+        "debug_span_processor", tracer_provider, debug_configuration
+    )
+
+    if not unchanged:
+        debug_span_processor = None
+
+        if debug_configuration is not None:
+            if debug_span_file is not None:
+                try:
+                    debug_span_exporter = FileSpanExporter(
+                        debug_span_file,
+                        max_bytes=debug_span_file_max_bytes,
+                        sample_ratio=debug_span_sample_ratio,
+                    )
+                except OSError as error:
+                    message = (
+                        f"Invalid configuration: unable to open "
+                        f"debug_span_file {debug_span_file}: {error}"
+                    )
+                    _logger.error(message)
+                    raise InvalidConfigurationError(message) from error
+            else:
+                debug_span_exporter = ConsoleSpanExporter()
+
+            if serverless:
+                debug_span_processor = SimpleSpanProcessor(debug_span_exporter)
+            elif shared_scheduler:
+                debug_span_processor = ScheduledSpanProcessor(
+                    debug_span_exporter, scheduler
+                )
+            else:
+                debug_span_processor = BatchSpanProcessor(debug_span_exporter)
+
+            budget_span_processor(debug_span_processor, memory_budget)
+
+        _replace_span_processor(
+            tracer_provider,
+            installed_debug_span_processor,
+            debug_span_processor,
+        )
+        _installed_components["debug_span_processor"] = (
+            tracer_provider,
+            debug_configuration,
+            debug_span_processor,
+        )
+
+        if debug_span_processor is not None:
+            startup_profile.mark("debug_span_exporter")
+
+    installed_profiler_span_processor, unchanged = _installed_component(
+        "profiler_span_processor", tracer_provider, profiler_enabled
+    )
+
+    if not unchanged:
+        profiler_span_processor = None
+
+        if profiler_enabled and isinstance(tracer_provider, TracerProvider):
+            profiler_span_processor = ProfilerSpanProcessor(tracer_provider)
+
+        _replace_span_processor(
+            tracer_provider,
+            installed_profiler_span_processor,
+            profiler_span_processor,
+            # Shut down first, while the other processors still export the
+            # last profiles.
+            first=True,
+        )
+        _installed_components["profiler_span_processor"] = (
+            tracer_provider,
+            profiler_enabled,
+            profiler_span_processor,
         )
 
+    if profiler_enabled:
+        logged_attributes["profiler_enabled"] = True
+
+    if logs_enabled:
+        _logger.debug("configuring logs")
+
+        logged_attributes["logs_exporter_endpoint"] = logs_exporter_endpoint
+
+        if isinstance(tracer_provider, TracerProvider):
+            logs_resource = tracer_provider.resource
+        else:
+            logs_resource = Resource.create(resource_attributes)
+
+        installed = _installed_components.get("logger_provider")
+
+        if installed is not None and installed[0] is get_logger_provider():
+            logger_provider, logging_handler = installed
+            # FIXME: Accessing a private attribute here for the same reason
+            # the tracer provider resource is set above.
+            # pylint: disable=protected-access
+            logger_provider._resource = logs_resource
+        else:
+            if installed is not None:
+                getLogger().removeHandler(installed[1])
+
+            logger_provider = LoggerProvider(resource=logs_resource)
+
+            set_logger_provider(logger_provider)
+
+            logging_handler = LoggingHandler(logger_provider=logger_provider)
+            logging_handler.addFilter(_ExcludeOpenTelemetryFilter())
+
+            _installed_components["logger_provider"] = (
+                logger_provider,
+                logging_handler,
+            )
+
+        # Adding a handler the root logger already has does nothing.
+        getLogger().addHandler(logging_handler)
+
+        logs_configuration = (
+            logs_exporter_endpoint,
+            span_exporter_insecure,
+            headers,
+            serverless,
+            serverless_flush_timeout,
+            capture_directory,
+            memory_budget_bytes,
+        )
+
+        installed_log_record_processor, unchanged = _installed_component(
+            "log_record_processor", logger_provider, logs_configuration
+        )
+
+        if not unchanged:
+            if capture_writer is not None:
+                logs_exporter = CaptureLogExporter(capture_writer)
+            elif serverless:
+                logs_exporter = LightstepOTLPLogExporter(
+                    endpoint=logs_exporter_endpoint,
+                    credentials=credentials,
+                    headers=headers,
+                    timeout=serverless_flush_timeout / 1e3,
+                    retry=False,
+                )
+            else:
+                logs_exporter = LightstepOTLPLogExporter(
+                    endpoint=logs_exporter_endpoint,
+                    credentials=credentials,
+                    headers=headers,
+                )
+
+            if exporter_prewarm and capture_writer is None:
+                logs_exporter.prewarm()
+
+            if serverless:
+                log_record_processor = ServerlessLogRecordProcessor(
+                    logs_exporter
+                )
+            else:
+                log_record_processor = _DroppingBatchLogRecordProcessor(
+                    logs_exporter
+                )
+
+            log_record_processor = budget_log_record_processor(
+                log_record_processor, memory_budget
+            )
+
+            _replace_log_record_processor(
+                logger_provider,
+                installed_log_record_processor,
+                log_record_processor,
+            )
+            _installed_components["log_record_processor"] = (
+                logger_provider,
+                logs_configuration,
+                log_record_processor,
+            )
+
+        startup_profile.mark("logs")
+
+    elif "logger_provider" in _installed_components:
+        logger_provider, logging_handler = _installed_components[
+            "logger_provider"
+        ]
+
+        getLogger().removeHandler(logging_handler)
+
+        installed_log_record_processor, _ = _installed_component(
+            "log_record_processor", logger_provider, None
+        )
+        _replace_log_record_processor(
+            logger_provider, installed_log_record_processor, None
+        )
+        _installed_components.pop("log_record_processor", None)
+
     if metrics_enabled:
         _logger.debug("configuring metrics")
 
-        logged_attributes[
-            "metrics_exporter_endpoint"
-        ] = metrics_exporter_endpoint
+        logged_attributes["metrics_exporter_endpoint"] = (
+            metrics_exporter_endpoint
+        )
+
+        if metrics_scrape_endpoint is not None:
+            logged_attributes["metrics_scrape_endpoint"] = (
+                metrics_scrape_endpoint
+            )
 
         if metrics_exporter_temporality_preference == "DELTA":
             instrument_class_temporality = {
@@ -482,24 +1605,334 @@ def configure_opentelemetry(
             _logger.error(message)
             raise InvalidConfigurationError(message)
 
-        exporter = LightstepOTLPMetricExporter(
-            endpoint=metrics_exporter_endpoint,
-            credentials=credentials,
-            headers=headers,
-            preferred_temporality=instrument_class_temporality,
+        metrics_configuration = (
+            metrics_exporter_endpoint,
+            span_exporter_insecure,
+            headers,
+            metrics_exporter_temporality_preference,
+            metrics_exporter_interval,
+            serverless,
+            serverless_flush_timeout,
+            shared_scheduler,
+            cooperative,
+            capture_directory,
+            metrics_scrape_endpoint,
         )
 
-        reader = PeriodicExportingMetricReader(
-            exporter, export_timeout_millis=metrics_exporter_interval
+        def _metric_reader(metric_exporter):
+            if shared_scheduler:
+                return ScheduledMetricReader(
+                    metric_exporter,
+                    scheduler,
+                    export_interval_millis=metrics_exporter_interval,
+                )
+            if serverless:
+                # An infinite interval keeps the reader from starting its
+                # collection thread, metrics are only collected and exported
+                # when the invocation ends.
+                return PeriodicExportingMetricReader(
+                    metric_exporter,
+                    export_interval_millis=inf,
+                    export_timeout_millis=serverless_flush_timeout,
+                )
+            return PeriodicExportingMetricReader(
+                metric_exporter,
+                export_timeout_millis=metrics_exporter_interval,
+            )
+
+        installed_reader, unchanged = _installed_component(
+            "metric_reader", get_meter_provider(), metrics_configuration
         )
 
-        provider = MeterProvider(metric_readers=[reader])
+        if not unchanged:
+            if metrics_scrape_endpoint is not None:
+                exporter = None
+            elif capture_writer is not None:
+                exporter = CaptureMetricExporter(
+                    capture_writer,
+                    preferred_temporality=instrument_class_temporality,
+                )
+            elif serverless:
+                exporter = LightstepOTLPMetricExporter(
+                    endpoint=metrics_exporter_endpoint,
+                    credentials=credentials,
+                    headers=headers,
+                    preferred_temporality=instrument_class_temporality,
+                    timeout=serverless_flush_timeout / 1e3,
+                    retry=False,
+                )
+            elif cooperative:
+                exporter = CooperativeMetricExporter(
+                    metrics_exporter_endpoint,
+                    headers=headers,
+                    insecure=span_exporter_insecure,
+                    preferred_temporality=instrument_class_temporality,
+                    retry=False,
+                )
+            else:
+                exporter = LightstepOTLPMetricExporter(
+                    endpoint=metrics_exporter_endpoint,
+                    credentials=credentials,
+                    headers=headers,
+                    preferred_temporality=instrument_class_temporality,
+                    retry=not shared_scheduler,
+                )
+
+            if exporter is None:
+                # The previous endpoint is closed first in case the new one
+                # listens on the same address.
+                if isinstance(installed_reader, MetricsEndpointReader):
+                    installed_reader.shutdown()
+
+                try:
+                    reader = MetricsEndpointReader(
+                        scrape_host,
+                        int(scrape_port),
+                        preferred_temporality=instrument_class_temporality,
+                    )
+                except OSError as error:
+                    message = (
+                        f"Invalid configuration: unable to listen on "
+                        f"metrics_scrape_endpoint {metrics_scrape_endpoint}: "
+                        f"{error}"
+                    )
+                    _logger.error(message)
+                    raise InvalidConfigurationError(message) from error
+            else:
+                reader = _metric_reader(exporter)
+
+                if exporter_prewarm and capture_writer is None:
+                    exporter.prewarm()
+
+            meter_provider = _installed_components.get("meter_provider")
+
+            if meter_provider is not None and (
+                meter_provider is get_meter_provider()
+            ):
+                _replace_metric_reader(
+                    meter_provider, installed_reader, reader
+                )
+            else:
+                meter_provider = MeterProvider(metric_readers=[reader])
+
+                set_meter_provider(meter_provider)
+
+                _installed_components["meter_provider"] = meter_provider
+
+            _installed_components["metric_reader"] = (
+                meter_provider,
+                metrics_configuration,
+                reader,
+            )
+
+        startup_profile.mark("metrics")
+
+        def _additional_metric_reader(endpoint):
+            if serverless:
+                additional_metric_exporter = LightstepOTLPMetricExporter(
+                    endpoint=endpoint,
+                    preferred_temporality=instrument_class_temporality,
+                    timeout=serverless_flush_timeout / 1e3,
+                    retry=False,
+                    **additional_exporter_kwargs,
+                )
+            elif cooperative:
+                additional_metric_exporter = CooperativeMetricExporter(
+                    endpoint,
+                    insecure=span_exporter_insecure,
+                    preferred_temporality=instrument_class_temporality,
+                    retry=False,
+                )
+            else:
+                additional_metric_exporter = LightstepOTLPMetricExporter(
+                    endpoint=endpoint,
+                    preferred_temporality=instrument_class_temporality,
+                    retry=not shared_scheduler,
+                    **additional_exporter_kwargs,
+                )
+
+            if exporter_prewarm:
+                additional_metric_exporter.prewarm()
+
+            return _metric_reader(additional_metric_exporter)
+
+        meter_provider = _installed_components["metric_reader"][0]
+
+        _install_per_endpoint(
+            "additional_metric_readers",
+            meter_provider,
+            (
+                span_exporter_insecure,
+                metrics_exporter_temporality_preference,
+                metrics_exporter_interval,
+                serverless,
+                serverless_flush_timeout,
+                shared_scheduler,
+                cooperative,
+            ),
+            additional_metrics_exporter_endpoints,
+            _additional_metric_reader,
+            _replace_metric_reader,
+        )
+
+        if additional_metrics_exporter_endpoints:
+            logged_attributes["additional_metrics_exporter_endpoints"] = (
+                additional_metrics_exporter_endpoints
+            )
+
+            startup_profile.mark("additional_metric_readers")
+
+        runtime_metrics, _ = _installed_component(
+            "runtime_metrics", meter_provider, None
+        )
+
+        if runtime_metrics_enabled:
+            if runtime_metrics is None:
+                runtime_metrics = RuntimeMetrics(meter_provider)
+                _installed_components["runtime_metrics"] = (
+                    meter_provider,
+                    None,
+                    runtime_metrics,
+                )
+
+            runtime_metrics.start()
+
+            logged_attributes["runtime_metrics_enabled"] = True
+
+        elif runtime_metrics is not None:
+            runtime_metrics.stop()
+
+        series_eviction, _ = _installed_component(
+            "series_eviction", meter_provider, None
+        )
+
+        # Series are accounted in the memory budget by the eviction.
+        if (
+            metrics_series_max_idle_intervals is not None
+            or memory_budget is not None
+        ):
+            if metrics_series_max_idle_intervals is not None:
+                max_idle_seconds = (
+                    metrics_series_max_idle_intervals
+                    * metrics_exporter_interval
+                    / 1e3
+                )
+            else:
+                max_idle_seconds = None
+
+            if series_eviction is None:
+                series_eviction = SeriesEviction(
+                    meter_provider, max_idle_seconds
+                )
+                _installed_components["series_eviction"] = (
+                    meter_provider,
+                    None,
+                    series_eviction,
+                )
+
+            series_eviction.max_idle_seconds = max_idle_seconds
+            series_eviction.memory_budget = memory_budget
+            series_eviction.start()
+
+            if metrics_series_max_idle_intervals is not None:
+                logged_attributes["metrics_series_max_idle_intervals"] = (
+                    metrics_series_max_idle_intervals
+                )
+
+        elif series_eviction is not None:
+            series_eviction.stop()
+
+        memory_budget_metrics, _ = _installed_component(
+            "memory_budget_metrics", meter_provider, None
+        )
 
-        set_meter_provider(provider)
+        if memory_budget is not None and memory_budget_metrics is None:
+            memory_budget_metrics = MemoryBudgetMetrics(meter_provider)
+            _installed_components["memory_budget_metrics"] = (
+                meter_provider,
+                None,
+                memory_budget_metrics,
+            )
+
+        if memory_budget_metrics is not None:
+            memory_budget_metrics.memory_budget = memory_budget
+
+        span_metrics_processor, _ = _installed_component(
+            "span_metrics_processor", meter_provider, tracer_provider
+        )
+
+        if span_metrics_enabled and isinstance(
+            tracer_provider, TracerProvider
+        ):
+            if span_metrics_processor is None:
+                span_metrics_processor = SpanMetricsProcessor(meter_provider)
+                _replace_span_processor(
+                    tracer_provider, None, span_metrics_processor
+                )
+                _installed_components["span_metrics_processor"] = (
+                    meter_provider,
+                    tracer_provider,
+                    span_metrics_processor,
+                )
+
+            span_metrics_processor.start()
+
+            logged_attributes["span_metrics_enabled"] = True
+
+        elif span_metrics_processor is not None:
+            span_metrics_processor.stop()
+
+    else:
+        if "runtime_metrics" in _installed_components:
+            _installed_components["runtime_metrics"][2].stop()
+
+        if "span_metrics_processor" in _installed_components:
+            _installed_components["span_metrics_processor"][2].stop()
+
+        if "series_eviction" in _installed_components:
+            _installed_components["series_eviction"][2].stop()
+
+        installed_reader, _ = _installed_component(
+            "metric_reader", get_meter_provider(), None
+        )
+
+        if installed_reader is not None:
+            _replace_metric_reader(
+                get_meter_provider(), installed_reader, None
+            )
+            _installed_components.pop("metric_reader")
+
+        _install_per_endpoint(
+            "additional_metric_readers",
+            get_meter_provider(),
+            None,
+            [],
+            None,
+            _replace_metric_reader,
+        )
 
     for key, value in logged_attributes.items():
         _logger.debug("%s: %s", key, value)
 
+    if launcher_profile_startup:
+        startup_profile.log(_logger, auto_instrumented=_auto_instrumented)
+
+        if launcher_profile_startup_span:
+            startup_profile.record_span(
+                get_tracer_provider().get_tracer(__name__, __version__),
+                **{"launcher.auto_instrumented": _auto_instrumented},
+            )
+
+
+def _parse_endpoints(endpoint: Union[str, list]) -> Union[str, list]:
+    # A single endpoint is kept as a string, several ones become a list.
+    endpoints = [url.strip() for url in _env.list("", endpoint)]
+
+    if len(endpoints) > 1:
+        return endpoints
+
+    return endpoint
+
 
 def _validate_token(token: str):
     return len(token) in [32, 84, 104]
@@ -510,6 +1943,48 @@ def _validate_service_name(service_name: Optional[str]):
 
 
 class LightstepLauncherDistro(BaseDistro):
+    """
+    Distro that configures the launcher under opentelemetry-instrument
+
+    Instrumentors are loaded only if they are in the comma separated list of
+    entry point names of the LS_INSTRUMENTATIONS_ENABLED environment
+    variable, when it is set, and not in the LS_INSTRUMENTATIONS_DISABLED
+    one. The time each instrumentor took to import and to instrument is kept
+    in `instrumentation_report` and logged at WARNING level, whatever
+    OTEL_LOG_LEVEL is, once all of them are loaded.
+    """
+
+    instrumentation_report = None
+
+    def load_instrumentor(self, entry_point, **kwargs):
+        if self.instrumentation_report is None:
+            self.instrumentation_report = []
+
+        name = entry_point.name
+
+        if (
+            _LS_INSTRUMENTATIONS_ENABLED
+            and name not in _LS_INSTRUMENTATIONS_ENABLED
+        ) or name in _LS_INSTRUMENTATIONS_DISABLED:
+            _logger.debug("Instrumentation %s not loaded", name)
+            self.instrumentation_report.append({"name": name, "loaded": False})
+            return
+
+        start = perf_counter_ns()
+        instrumentor = entry_point.load()
+        imported = perf_counter_ns()
+        instrumentor().instrument(**kwargs)
+        instrumented = perf_counter_ns()
+
+        self.instrumentation_report.append(
+            {
+                "name": name,
+                "loaded": True,
+                "import_ns": imported - start,
+                "instrument_ns": instrumented - imported,
+            }
+        )
+
     def _configure(self, **kwargs):
         try:
             configure_opentelemetry(_auto_instrumented=True)
@@ -521,3 +1996,46 @@ class LightstepLauncherDistro(BaseDistro):
                     "variables"
                 )
             )
+
+
+def _log_instrumentation_report():
+    """
+    Logs the time every instrumentor took to load
+
+    Registered as an `opentelemetry_post_instrument` entry point, called by
+    opentelemetry-instrument after all the instrumentors are loaded.
+    """
+
+    # pylint: disable=protected-access
+    distro = LightstepLauncherDistro._instance
+
+    if distro is None or not distro.instrumentation_report:
+        return
+
+    loaded = sorted(
+        (entry for entry in distro.instrumentation_report if entry["loaded"]),
+        key=lambda entry: entry["import_ns"] + entry["instrument_ns"],
+        reverse=True,
+    )
+    lines = [
+        f"  {entry['name']}: import {entry['import_ns'] / 1e6:.1f}ms, "
+        f"instrument {entry['instrument_ns'] / 1e6:.1f}ms"
+        for entry in loaded
+    ]
+    not_loaded = [
+        entry["name"]
+        for entry in distro.instrumentation_report
+        if not entry["loaded"]
+    ]
+
+    if not_loaded:
+        lines.append(f"  not loaded: {', '.join(not_loaded)}")
+
+    _log_report(
+        _logger,
+        "Loaded %s instrumentations in %.1fms:\n%s",
+        len(loaded),
+        sum(entry["import_ns"] + entry["instrument_ns"] for entry in loaded)
+        / 1e6,
+        "\n".join(lines),
+    )
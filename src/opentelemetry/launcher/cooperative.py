@@ -0,0 +1,145 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Export from processes monkey patched by gevent or eventlet
+
+The gRPC exporters block in gRPC C-core threads the hub knows nothing about.
+The exporters here send the same OTLP protobuf requests over HTTP with
+`requests`, whose sockets are patched to yield to the hub. They are meant to
+be driven by the shared export scheduler, whose thread is a greenlet once
+`threading` is patched. The satellite or collector must accept OTLP over
+HTTP on the endpoints they are given.
+"""
+
+from sys import modules
+from typing import Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+from opentelemetry.exporter.otlp.proto.http.metric_exporter import (
+    OTLPMetricExporter,
+)
+from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+    OTLPSpanExporter,
+)
+
+# The OTLP/HTTP paths of Lightstep public satellites, other satellites and
+# collectors use the standard ones.
+_LIGHTSTEP_INGEST_HOST = "ingest.lightstep.com"
+_LIGHTSTEP_PATHS = {
+    "traces": "/traces/otlp/v0.9",
+    "metrics": "/metrics/otlp/v0.9",
+}
+_OTLP_PATHS = {"traces": "/v1/traces", "metrics": "/v1/metrics"}
+
+
+def monkey_patching() -> Optional[str]:
+    """
+    Returns `"gevent"` or `"eventlet"` if that library monkey patched the
+    socket module, `None` otherwise
+
+    Neither library is imported here, a process that did not import one of
+    them is not patched by it.
+    """
+    gevent_monkey = modules.get("gevent.monkey")
+
+    if gevent_monkey is not None and gevent_monkey.is_module_patched("socket"):
+        return "gevent"
+
+    eventlet_patcher = modules.get("eventlet.patcher")
+
+    if eventlet_patcher is not None and eventlet_patcher.is_monkey_patched(
+        "socket"
+    ):
+        return "eventlet"
+
+    return None
+
+
+def _http_endpoint(endpoint: str, signal: str, insecure: bool = False) -> str:
+    """
+    Returns the OTLP/HTTP URL of `endpoint` for `signal`
+
+    The gRPC endpoints are host and port URLs, or only `host:port`, the
+    OTLP/HTTP ones also have a path. Raises `ValueError` if `endpoint` has no
+    host.
+    """
+    if "://" not in endpoint:
+        endpoint = f"{'http' if insecure else 'https'}://{endpoint}"
+
+    parsed_url = urlparse(endpoint)
+
+    if parsed_url.scheme not in ("http", "https") or not parsed_url.hostname:
+        raise ValueError(f"invalid OTLP/HTTP endpoint {endpoint}")
+
+    if parsed_url.path not in ("", "/"):
+        return endpoint
+
+    if parsed_url.hostname == _LIGHTSTEP_INGEST_HOST:
+        path = _LIGHTSTEP_PATHS[signal]
+    else:
+        path = _OTLP_PATHS[signal]
+
+    return f"{parsed_url.scheme}://{parsed_url.netloc}{path}"
+
+
+class _CooperativeExporterMixin:
+    def __init__(
+        self,
+        endpoint: str,
+        headers: Sequence[Tuple[str, str]] = (),
+        signal: str = None,
+        insecure: bool = False,
+        retry: bool = True,
+        **kwargs,
+    ):
+        self._retry = retry
+
+        super().__init__(
+            endpoint=_http_endpoint(endpoint, signal, insecure),
+            headers=dict(headers),
+            **kwargs,
+        )
+
+    def _retryable(self, resp) -> bool:
+        # Without retries, a transient error fails the export right away.
+        return self._retry and super()._retryable(resp)
+
+    def prewarm(self) -> None:
+        # The connection is established by the first export.
+        pass
+
+
+class CooperativeSpanExporter(_CooperativeExporterMixin, OTLPSpanExporter):
+    """
+    OTLP/HTTP span exporter for monkey patched processes
+
+    `endpoint` is the URL of the satellite as given to the gRPC exporter,
+    the OTLP/HTTP path is added unless it has one. An endpoint without a
+    scheme gets `http` if `insecure` is set, `https` otherwise. With `retry`
+    set to `False`, every export is a single request.
+    """
+
+    def __init__(self, endpoint: str, **kwargs):
+        super().__init__(endpoint, signal="traces", **kwargs)
+
+
+class CooperativeMetricExporter(_CooperativeExporterMixin, OTLPMetricExporter):
+    """
+    OTLP/HTTP metric exporter for monkey patched processes, see
+    `CooperativeSpanExporter`
+    """
+
+    def __init__(self, endpoint: str, **kwargs):
+        super().__init__(endpoint, signal="metrics", **kwargs)
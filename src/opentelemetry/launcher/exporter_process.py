@@ -0,0 +1,692 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Exports spans from a helper process
+
+`ExporterProcessSpanProcessor` forwards ended spans over a Unix domain socket
+to a helper process that it launches and supervises. The helper owns a
+`LightstepOTLPSpanExporter` and does the batching, protobuf encoding and
+network I/O, so that this work doesn't compete for the GIL with the threads
+of the instrumented process.
+
+The helper runs `opentelemetry.launcher._exporter_helper` with the Python
+interpreter of this process. Servers embedding Python, such as uWSGI or
+mod_wsgi, set `sys.executable` to their own binary, the interpreter is then
+looked up in `sys.exec_prefix` unless its path is given.
+"""
+
+from collections import deque
+from logging import getLogger
+from os import X_OK, access, environ, pathsep, register_at_fork
+from os.path import basename, dirname, join
+from pickle import HIGHEST_PROTOCOL, dumps, loads
+from socket import AF_UNIX, SOCK_STREAM, socket, socketpair
+from socket import timeout as SocketTimeout
+from struct import Struct
+from subprocess import Popen, TimeoutExpired
+from sys import exec_prefix, executable, version_info
+from threading import Condition, Event, Thread
+from time import monotonic
+from typing import Optional, Sequence, Tuple
+from weakref import WeakMethod
+
+from opentelemetry.attributes import BoundedAttributes
+from opentelemetry.sdk.trace import Event as SpanEvent
+from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor
+from opentelemetry.sdk.util import BoundedList
+from opentelemetry.trace import (
+    Link,
+    SpanContext,
+    SpanKind,
+    Status,
+    StatusCode,
+    TraceFlags,
+    TraceState,
+)
+
+_logger = getLogger(__name__)
+
+_HEADER = Struct("!I")
+
+_CONFIGURE = 0
+_SPANS = 1
+_FLUSH = 2
+
+_DEFAULT_MAX_QUEUE_SIZE = 2048
+_DEFAULT_MAX_EXPORT_BATCH_SIZE = 512
+_DEFAULT_SCHEDULE_DELAY_MILLIS = 200
+_DEFAULT_MAX_RESTARTS = 5
+
+
+def _send_frame(connection: socket, kind: int, payload) -> None:
+    data = dumps((kind, payload), HIGHEST_PROTOCOL)
+    connection.sendall(b"".join((_HEADER.pack(len(data)), data)))
+
+
+def _receive_exactly(connection: socket, size: int) -> Optional[bytes]:
+    chunks = []
+
+    while size:
+        chunk = connection.recv(size)
+
+        if not chunk:
+            return None
+
+        chunks.append(chunk)
+        size -= len(chunk)
+
+    return b"".join(chunks)
+
+
+def _receive_frame(connection: socket):
+    header = _receive_exactly(connection, _HEADER.size)
+
+    if header is None:
+        return None
+
+    data = _receive_exactly(connection, _HEADER.unpack(header)[0])
+
+    # Closed in the middle of a frame.
+    if data is None:
+        return None
+
+    return loads(data)
+
+
+def _flatten_context(span_context: Optional[SpanContext]):
+    if span_context is None:
+        return None
+
+    return (
+        span_context.trace_id,
+        span_context.span_id,
+        span_context.is_remote,
+        int(span_context.trace_flags),
+        tuple(span_context.trace_state.items()),
+    )
+
+
+def _restore_context(flat_context) -> Optional[SpanContext]:
+    if flat_context is None:
+        return None
+
+    trace_id, span_id, is_remote, trace_flags, trace_state = flat_context
+
+    return SpanContext(
+        trace_id,
+        span_id,
+        is_remote,
+        trace_flags=TraceFlags(trace_flags),
+        trace_state=TraceState(list(trace_state)),
+    )
+
+
+def _flatten_attributes(attributes):
+    return dict(attributes), getattr(attributes, "dropped", 0)
+
+
+def _restore_attributes(flat_attributes) -> BoundedAttributes:
+    attributes, dropped = flat_attributes
+    bounded_attributes = BoundedAttributes(attributes=attributes)
+    bounded_attributes.dropped = dropped
+    return bounded_attributes
+
+
+def _restore_list(items, dropped) -> BoundedList:
+    bounded_list = BoundedList.from_seq(None, items)
+    bounded_list.dropped = dropped
+    return bounded_list
+
+
+def _python_executable() -> str:
+    if basename(executable).startswith(("python", "pypy")):
+        return executable
+
+    # Embedded in a server, the interpreter is installed alongside the
+    # standard library.
+    version = f"{version_info.major}.{version_info.minor}"
+
+    for name in [f"python{version}", "python3", "python"]:
+        path = join(exec_prefix, "bin", name)
+
+        if access(path, X_OK):
+            return path
+
+    return executable
+
+
+def _helper_environment() -> dict:
+    # opentelemetry-instrument adds its sitecustomize directory to
+    # PYTHONPATH, the helper must not configure the launcher again.
+    # pylint: disable=import-outside-toplevel
+    from opentelemetry.instrumentation import auto_instrumentation
+
+    auto_instrumentation_path = dirname(auto_instrumentation.__file__)
+    environment = dict(environ)
+    python_path = [
+        path
+        for path in environment.get("PYTHONPATH", "").split(pathsep)
+        if path and path != auto_instrumentation_path
+    ]
+
+    if python_path:
+        environment["PYTHONPATH"] = pathsep.join(python_path)
+    else:
+        environment.pop("PYTHONPATH", None)
+
+    return environment
+
+
+class ExporterProcessSpanProcessor(SpanProcessor):
+    """
+    Span processor that forwards ended spans to an exporter helper process
+
+    Ending a span only appends it to a bounded queue. A forwarding thread
+    flattens the queued spans into tuples of builtin types, pickles them and
+    writes them to the socket, which releases the GIL while it blocks. The
+    resource and instrumentation scope of the spans are sent only the first
+    time they are seen.
+
+    If the helper process dies, it is restarted up to `max_restarts` times,
+    the spans that were being forwarded are lost. The helper exits when the
+    socket is closed, which happens on shutdown or when this process exits.
+
+    Arguments:
+        endpoint (str): the URL of the Lightstep satellite.
+        insecure (bool): if an insecure channel is to be used.
+        headers: the gRPC metadata sent with every export request.
+        max_queue_size (int): the maximum number of queued spans, the oldest
+            spans are dropped when it is reached.
+        max_export_batch_size (int): the maximum number of spans forwarded in
+            one frame, also used as the batch size of the helper process.
+        schedule_delay_millis (float): the delay between two forwards.
+        max_restarts (int): the maximum number of times the helper process
+            is restarted.
+        python (str): the path of the Python interpreter running the helper
+            process, the interpreter of this process by default.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        insecure: bool = False,
+        headers: Optional[Sequence[Tuple[str, str]]] = None,
+        max_queue_size: int = _DEFAULT_MAX_QUEUE_SIZE,
+        max_export_batch_size: int = _DEFAULT_MAX_EXPORT_BATCH_SIZE,
+        schedule_delay_millis: float = _DEFAULT_SCHEDULE_DELAY_MILLIS,
+        max_restarts: int = _DEFAULT_MAX_RESTARTS,
+        python: Optional[str] = None,
+    ):
+        if max_export_batch_size > max_queue_size:
+            raise ValueError(
+                "max_export_batch_size must be less than or equal to "
+                "max_queue_size."
+            )
+
+        self._configuration = {
+            "endpoint": endpoint,
+            "insecure": insecure,
+            "headers": headers,
+            "max_export_batch_size": max_export_batch_size,
+            "schedule_delay_millis": schedule_delay_millis,
+        }
+        self.max_queue_size = max_queue_size
+        self.max_export_batch_size = max_export_batch_size
+        self.schedule_delay_millis = schedule_delay_millis
+        self.max_restarts = max_restarts
+        self.python = python or _python_executable()
+        self.restarts = 0
+        self.dropped_spans = 0
+        # Kept across forks since it may be wrapped, see
+        # budget_span_processor.
+        self._queue = deque([], self.max_queue_size)
+
+        self._start()
+
+        weak_reinit = WeakMethod(self._at_fork_reinit)
+        register_at_fork(after_in_child=lambda: weak_reinit()())
+
+    def _start(self):
+        self._flush_requests = deque()
+        self._condition = Condition()
+        self._done = False
+        self._process = None
+        self._connection = None
+        self._start_process()
+        self._thread = Thread(
+            name="OtelExporterProcessForwarder",
+            target=self._forward,
+            daemon=True,
+        )
+        self._thread.start()
+
+    def _at_fork_reinit(self):
+        if self._done:
+            return
+
+        # The forked process shares the socket of the parent, closing this
+        # copy doesn't close the connection of the parent with its helper.
+        if self._connection is not None:
+            self._connection.close()
+
+        # The spans of the parent are exported by the parent.
+        self._queue.clear()
+        self.restarts = 0
+        self.dropped_spans = 0
+        self._start()
+
+    @property
+    def pid(self) -> Optional[int]:
+        if self._process is None:
+            return None
+        return self._process.pid
+
+    def _start_process(self) -> bool:
+        connection, helper_connection = socketpair(AF_UNIX, SOCK_STREAM)
+
+        try:
+            self._process = Popen(
+                [
+                    self.python,
+                    "-m",
+                    "opentelemetry.launcher._exporter_helper",
+                    str(helper_connection.fileno()),
+                ],
+                pass_fds=(helper_connection.fileno(),),
+                env=_helper_environment(),
+            )
+            # The access token is sent through the socket instead of the
+            # command line, where other users could read it.
+            _send_frame(connection, _CONFIGURE, self._configuration)
+        except OSError:
+            _logger.exception(
+                "Unable to start the exporter process with %s", self.python
+            )
+            connection.close()
+            self._process = None
+            return False
+        finally:
+            helper_connection.close()
+
+        self._connection = connection
+        self._resources = {}
+        self._scopes = {}
+
+        _logger.debug("Exporter process %s started", self._process.pid)
+
+        return True
+
+    def _restart_process(self) -> bool:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+        returncode = None
+
+        if self._process is not None:
+            returncode = self._process.poll()
+            self._process.kill()
+            self._process.wait()
+            self._process = None
+
+        while self.restarts < self.max_restarts:
+            self.restarts += 1
+            _logger.warning(
+                "Exporter process failed, exit status %s, restarting it "
+                "(%s/%s)",
+                returncode,
+                self.restarts,
+                self.max_restarts,
+            )
+
+            if self._start_process():
+                return True
+
+        _logger.error(
+            "Exporter process failed %s times, giving up: spans are dropped "
+            "until this process exits. Set LS_EXPORTER_PROCESS=false to "
+            "export spans from this process instead.",
+            self.restarts,
+        )
+
+        return False
+
+    def on_end(self, span: ReadableSpan) -> None:
+        if self._done or not span.context.trace_flags.sampled:
+            return
+
+        if len(self._queue) == self.max_queue_size:
+            self.dropped_spans += 1
+
+        self._queue.appendleft(span)
+
+        if len(self._queue) >= self.max_export_batch_size:
+            with self._condition:
+                self._condition.notify()
+
+    def _index(self, table: dict, value) -> Tuple[int, bool]:
+        # Resources and scopes are shared by many spans, they are looked up
+        # by identity because hashing a resource serializes its attributes.
+        entry = table.get(id(value))
+
+        if entry is not None:
+            return entry[0], False
+
+        table[id(value)] = (len(table), value)
+
+        return len(table) - 1, True
+
+    def _flatten(self, spans, new_resources, new_scopes):
+        rows = []
+
+        for span in spans:
+            resource_index, new = self._index(self._resources, span.resource)
+
+            if new:
+                new_resources[resource_index] = (
+                    dict(span.resource.attributes),
+                    span.resource.schema_url,
+                )
+
+            scope = span.instrumentation_scope
+            scope_index, new = self._index(self._scopes, scope)
+
+            if new:
+                new_scopes[scope_index] = (
+                    (scope.name, scope.version, scope.schema_url)
+                    if scope is not None
+                    else None
+                )
+
+            rows.append(
+                (
+                    span.name,
+                    _flatten_context(span.context),
+                    _flatten_context(span.parent),
+                    span.kind.value,
+                    _flatten_attributes(span.attributes),
+                    (
+                        tuple(
+                            (
+                                event.name,
+                                _flatten_attributes(event.attributes),
+                                event.timestamp,
+                            )
+                            for event in span.events
+                        ),
+                        span.dropped_events,
+                    ),
+                    (
+                        tuple(
+                            (
+                                _flatten_context(link.context),
+                                _flatten_attributes(link.attributes),
+                            )
+                            for link in span.links
+                        ),
+                        span.dropped_links,
+                    ),
+                    span.status.status_code.value,
+                    span.status.description,
+                    span.start_time,
+                    span.end_time,
+                    resource_index,
+                    scope_index,
+                )
+            )
+
+        return rows
+
+    def _send_spans(self) -> None:
+        while self._queue:
+            spans = []
+
+            while self._queue and len(spans) < self.max_export_batch_size:
+                spans.append(self._queue.pop())
+
+            if self._connection is None:
+                self.dropped_spans += len(spans)
+                continue
+
+            new_resources = {}
+            new_scopes = {}
+            rows = self._flatten(spans, new_resources, new_scopes)
+
+            try:
+                _send_frame(
+                    self._connection, _SPANS, (new_resources, new_scopes, rows)
+                )
+            except OSError:
+                self.dropped_spans += len(spans)
+                self._restart_process()
+
+    def _send_flush(self, timeout_millis: float) -> bool:
+        if self._connection is None:
+            return False
+
+        try:
+            _send_frame(self._connection, _FLUSH, timeout_millis)
+            self._connection.settimeout(timeout_millis / 1e3)
+
+            try:
+                acknowledgement = _receive_exactly(self._connection, 1)
+            finally:
+                self._connection.settimeout(None)
+
+        except SocketTimeout:
+            # The late acknowledgement would be read as the one of the next
+            # flush, the connection can't be used anymore.
+            _logger.warning("Exporter process didn't flush in time")
+            self._restart_process()
+            return False
+
+        except OSError:
+            self._restart_process()
+            return False
+
+        if acknowledgement is None:
+            self._restart_process()
+            return False
+
+        return acknowledgement == b"\x01"
+
+    def _forward(self):
+        while not self._done:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._done
+                    or self._flush_requests
+                    or len(self._queue) >= self.max_export_batch_size,
+                    self.schedule_delay_millis / 1e3,
+                )
+
+            if self._process is not None and self._process.poll() is not None:
+                self._restart_process()
+
+            self._send_spans()
+
+            while self._flush_requests:
+                timeout_millis, flushed, result = self._flush_requests.pop()
+                result.append(self._send_flush(timeout_millis))
+                flushed.set()
+
+        self._send_spans()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        if self._done:
+            return False
+
+        deadline = monotonic() + timeout_millis / 1e3
+        flushed = Event()
+        result = []
+
+        with self._condition:
+            self._flush_requests.appendleft((timeout_millis, flushed, result))
+            self._condition.notify()
+
+        if not flushed.wait(max(deadline - monotonic(), 0)):
+            _logger.warning("Timeout was exceeded in force_flush().")
+            return False
+
+        return result[0]
+
+    def shutdown(self) -> None:
+        if self._done:
+            return
+
+        with self._condition:
+            self._done = True
+            self._condition.notify()
+
+        self._thread.join()
+
+        if self._connection is not None:
+            # The helper exports the spans it still has and exits when its
+            # end of the socket is closed.
+            self._connection.close()
+            self._connection = None
+
+        if self._process is not None:
+            try:
+                self._process.wait(30)
+            except TimeoutExpired:
+                _logger.warning("Exporter process didn't exit, killing it.")
+                self._process.kill()
+                self._process.wait()
+
+        if self.dropped_spans:
+            _logger.warning(
+                "%s spans dropped before reaching the exporter process.",
+                self.dropped_spans,
+            )
+
+
+def _restore_spans(rows, resources, scopes):
+    for (
+        name,
+        context,
+        parent,
+        kind,
+        attributes,
+        events,
+        links,
+        status_code,
+        status_description,
+        start_time,
+        end_time,
+        resource_index,
+        scope_index,
+    ) in rows:
+        status_code = StatusCode(status_code)
+
+        events, dropped_events = events
+        links, dropped_links = links
+
+        yield ReadableSpan(
+            name=name,
+            context=_restore_context(context),
+            parent=_restore_context(parent),
+            resource=resources[resource_index],
+            attributes=_restore_attributes(attributes),
+            events=_restore_list(
+                [
+                    SpanEvent(
+                        event_name,
+                        _restore_attributes(event_attributes),
+                        timestamp,
+                    )
+                    for event_name, event_attributes, timestamp in events
+                ],
+                dropped_events,
+            ),
+            links=_restore_list(
+                [
+                    Link(
+                        _restore_context(link_context),
+                        _restore_attributes(link_attributes),
+                    )
+                    for link_context, link_attributes in links
+                ],
+                dropped_links,
+            ),
+            kind=SpanKind(kind),
+            status=Status(
+                status_code,
+                (
+                    status_description
+                    if status_code is StatusCode.ERROR
+                    else None
+                ),
+            ),
+            start_time=start_time,
+            end_time=end_time,
+            instrumentation_scope=scopes[scope_index],
+        )
+
+
+def _serve(connection: socket) -> None:
+    # pylint: disable=import-outside-toplevel
+    from grpc import ssl_channel_credentials
+
+    from opentelemetry.launcher.tracer import LightstepOTLPSpanExporter
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.sdk.util.instrumentation import InstrumentationScope
+
+    _, configuration = _receive_frame(connection)
+
+    span_processor = BatchSpanProcessor(
+        LightstepOTLPSpanExporter(
+            endpoint=configuration["endpoint"],
+            credentials=(
+                None
+                if configuration["insecure"]
+                else ssl_channel_credentials()
+            ),
+            headers=configuration["headers"],
+        ),
+        max_export_batch_size=configuration["max_export_batch_size"],
+        schedule_delay_millis=configuration["schedule_delay_millis"],
+    )
+    resources = {}
+    scopes = {}
+
+    while True:
+        frame = _receive_frame(connection)
+
+        if frame is None:
+            break
+
+        kind, payload = frame
+
+        if kind == _FLUSH:
+            flushed = span_processor.force_flush(payload)
+            connection.sendall(b"\x01" if flushed else b"\x00")
+            continue
+
+        new_resources, new_scopes, rows = payload
+
+        for index, (attributes, schema_url) in new_resources.items():
+            resources[index] = Resource(attributes, schema_url)
+
+        for index, scope in new_scopes.items():
+            scopes[index] = (
+                InstrumentationScope(*scope) if scope is not None else None
+            )
+
+        for span in _restore_spans(rows, resources, scopes):
+            span_processor.on_end(span)
+
+    span_processor.shutdown()
@@ -0,0 +1,307 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from base64 import b64encode
+from json import dumps
+from logging import getLogger
+from os import remove, rename
+from os.path import exists, getsize
+from threading import Lock
+from time import monotonic
+from typing import Sequence
+
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+from opentelemetry.sdk.trace.sampling import TraceIdRatioBased
+
+_logger = getLogger(__name__)
+
+_DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+_DEFAULT_BACKUP_COUNT = 1
+_BUFFER_SIZE = 1024 * 1024
+_FLUSH_INTERVAL_SECONDS = 1.0
+
+
+def _value(value) -> dict:
+    # bool is checked before int since it is a subclass of int
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, str):
+        return {"stringValue": value}
+    if isinstance(value, bytes):
+        return {"bytesValue": b64encode(value).decode("ascii")}
+    return {"arrayValue": {"values": [_value(item) for item in value]}}
+
+
+def _attributes(attributes) -> list:
+    # BoundedAttributes.copy returns its underlying dict, iterating the
+    # BoundedAttributes instead would look up every key through its lock.
+    return [
+        {"key": key, "value": _value(value)}
+        for key, value in attributes.copy().items()
+    ]
+
+
+def _set_attributes(otlp_object: dict, attributes) -> None:
+    if attributes:
+        otlp_object["attributes"] = _attributes(attributes)
+
+        dropped = getattr(attributes, "dropped", 0)
+
+        if dropped:
+            otlp_object["droppedAttributesCount"] = dropped
+
+
+def _span(span: ReadableSpan) -> dict:
+    context = span.context
+    otlp_span = {
+        "traceId": format(context.trace_id, "032x"),
+        "spanId": format(context.span_id, "016x"),
+        "name": span.name,
+        # OTLP span kinds start at 1 for internal, 0 is unspecified.
+        "kind": span.kind.value + 1,
+        "startTimeUnixNano": str(span.start_time),
+        "endTimeUnixNano": str(span.end_time),
+    }
+
+    if context.trace_state:
+        otlp_span["traceState"] = context.trace_state.to_header()
+
+    if span.parent is not None:
+        otlp_span["parentSpanId"] = format(span.parent.span_id, "016x")
+
+    _set_attributes(otlp_span, span.attributes)
+
+    if span.events:
+        otlp_events = []
+
+        for event in span.events:
+            otlp_event = {
+                "timeUnixNano": str(event.timestamp),
+                "name": event.name,
+            }
+            _set_attributes(otlp_event, event.attributes)
+            otlp_events.append(otlp_event)
+
+        otlp_span["events"] = otlp_events
+
+    if span.dropped_events:
+        otlp_span["droppedEventsCount"] = span.dropped_events
+
+    if span.links:
+        otlp_links = []
+
+        for link in span.links:
+            otlp_link = {
+                "traceId": format(link.context.trace_id, "032x"),
+                "spanId": format(link.context.span_id, "016x"),
+            }
+
+            if link.context.trace_state:
+                otlp_link["traceState"] = link.context.trace_state.to_header()
+
+            _set_attributes(otlp_link, link.attributes)
+            otlp_links.append(otlp_link)
+
+        otlp_span["links"] = otlp_links
+
+    if span.dropped_links:
+        otlp_span["droppedLinksCount"] = span.dropped_links
+
+    otlp_status = {}
+
+    if span.status.status_code.value:
+        otlp_status["code"] = span.status.status_code.value
+    if span.status.description:
+        otlp_status["message"] = span.status.description
+
+    otlp_span["status"] = otlp_status
+
+    return otlp_span
+
+
+def _encode_request(spans: Sequence[ReadableSpan]) -> str:
+    """
+    Encodes spans as an `ExportTraceServiceRequest` in OTLP JSON
+
+    Identifiers are hex encoded as the OTLP JSON encoding requires.
+    """
+    # Resources are grouped by identity, hashing a resource serializes its
+    # attributes.
+    resources = {}
+
+    for span in spans:
+        resource_entry = resources.get(id(span.resource))
+
+        if resource_entry is None:
+            resource_entry = (span.resource, {})
+            resources[id(span.resource)] = resource_entry
+
+        resource_entry[1].setdefault(span.instrumentation_scope, []).append(
+            _span(span)
+        )
+
+    resource_spans = []
+
+    for resource, scopes in resources.values():
+        scope_spans = []
+
+        for scope, otlp_spans in scopes.items():
+            otlp_scope_spans = {"scope": {}, "spans": otlp_spans}
+
+            if scope is not None:
+                otlp_scope_spans["scope"]["name"] = scope.name
+
+                if scope.version:
+                    otlp_scope_spans["scope"]["version"] = scope.version
+                if scope.schema_url:
+                    otlp_scope_spans["schemaUrl"] = scope.schema_url
+
+            scope_spans.append(otlp_scope_spans)
+
+        otlp_resource_spans = {
+            "resource": {"attributes": _attributes(resource.attributes)},
+            "scopeSpans": scope_spans,
+        }
+
+        if resource.schema_url:
+            otlp_resource_spans["schemaUrl"] = resource.schema_url
+
+        resource_spans.append(otlp_resource_spans)
+
+    return dumps({"resourceSpans": resource_spans}, separators=(",", ":"))
+
+
+class FileSpanExporter(SpanExporter):
+    """
+    Span exporter that appends spans to a rotating OTLP JSON lines file
+
+    Every export writes one line holding an `ExportTraceServiceRequest` in
+    OTLP JSON, the same format the file exporter of the OpenTelemetry
+    Collector writes. Lines are written to a large buffer that is flushed to
+    disk at most once per second and on `force_flush` and `shutdown`.
+
+    When writing a line would make the file larger than `max_bytes`, the file
+    is rotated: it is renamed with a `.1` suffix, the previous `.1` file is
+    renamed `.2` and so on, up to `backup_count` files. The files never take
+    more than `max_bytes * (backup_count + 1)` bytes.
+
+    Arguments:
+        path (str): the path of the file.
+        max_bytes (int): the maximum size of each file in bytes.
+        backup_count (int): the number of rotated files that are kept.
+        sample_ratio (float): the ratio of traces whose spans are written,
+            decided by trace id so that traces are written whole.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = _DEFAULT_MAX_BYTES,
+        backup_count: int = _DEFAULT_BACKUP_COUNT,
+        sample_ratio: float = 1.0,
+    ):
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be positive.")
+        if not 0 <= sample_ratio <= 1:
+            raise ValueError("sample_ratio must be in range [0.0, 1.0].")
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.sample_ratio = sample_ratio
+        self._bound = TraceIdRatioBased.get_bound_for_rate(sample_ratio)
+        self._lock = Lock()
+        # pylint: disable=consider-using-with
+        self._file = open(path, "ab", buffering=_BUFFER_SIZE)
+        self._size = getsize(path)
+        self._last_flush = monotonic()
+
+    def _rotate(self):
+        self._file.close()
+
+        if self.backup_count > 0:
+            for index in range(self.backup_count - 1, 0, -1):
+                source = f"{self.path}.{index}"
+
+                if exists(source):
+                    rename(source, f"{self.path}.{index + 1}")
+
+            rename(self.path, f"{self.path}.1")
+        else:
+            remove(self.path)
+
+        # pylint: disable=consider-using-with
+        self._file = open(self.path, "ab", buffering=_BUFFER_SIZE)
+        self._size = 0
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        if self.sample_ratio < 1:
+            spans = [
+                span
+                for span in spans
+                if span.context.trace_id & TraceIdRatioBased.TRACE_ID_LIMIT
+                < self._bound
+            ]
+
+        if not spans:
+            return SpanExportResult.SUCCESS
+
+        line = _encode_request(spans).encode("utf-8") + b"\n"
+
+        if len(line) > self.max_bytes:
+            _logger.warning(
+                "Dropping %s spans, their encoding is larger than max_bytes",
+                len(spans),
+            )
+            return SpanExportResult.FAILURE
+
+        with self._lock:
+            if self._file.closed:
+                return SpanExportResult.FAILURE
+
+            try:
+                if self._size and self._size + len(line) > self.max_bytes:
+                    self._rotate()
+
+                self._file.write(line)
+                self._size += len(line)
+
+                now = monotonic()
+
+                if now - self._last_flush >= _FLUSH_INTERVAL_SECONDS:
+                    self._file.flush()
+                    self._last_flush = now
+
+            except OSError:
+                _logger.exception("Unable to write spans to %s", self.path)
+                return SpanExportResult.FAILURE
+
+        return SpanExportResult.SUCCESS
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+                self._last_flush = monotonic()
+
+        return True
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,415 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A memory budget shared by the buffers of telemetry
+
+Span and log record queues and metric series each have their own limits,
+which say nothing about how much memory they use together. The components
+registered in a `MemoryBudget` account an approximate size of what they hold
+and ask the budget before holding more, the budget sheds the least valuable
+telemetry first as usage gets close to its limit.
+"""
+
+from logging import getLogger
+from os import register_at_fork
+from threading import Lock
+from typing import Callable, Iterable, Optional
+from weakref import WeakKeyDictionary, WeakMethod
+
+from opentelemetry.launcher._encoding import _EncodedSpan
+from opentelemetry.launcher.profiler import _is_profile
+from opentelemetry.launcher.span_processor import _OTHER, _priority_class
+from opentelemetry.metrics import CallbackOptions, MeterProvider, Observation
+from opentelemetry.sdk._logs import LogData
+
+from .version import __version__
+
+_logger = getLogger(__name__)
+
+# Usage from which only the valuable telemetry is accepted, as a ratio of
+# the budget.
+_DEFAULT_SHED_RATIO = 0.9
+
+# Approximate sizes of the Python objects held, measured with tracemalloc.
+_SPAN_BYTES = 2800
+_SPAN_ATTRIBUTE_BYTES = 170
+_SPAN_EVENT_BYTES = 500
+_ENCODED_SPAN_BYTES = 100
+_LOG_RECORD_BYTES = 900
+# The aggregation of a series and its attribute set.
+_SERIES_BYTES = 1000
+
+# Reasons for shedding telemetry.
+_DOWNSAMPLED = "downsampled"
+_OVER_BUDGET = "over_budget"
+
+# The weight of a new size in the running average of the sizes of queued
+# items.
+_AVERAGE_WEIGHT = 1 / 16
+# Admissions between two computations of the usage of the components.
+_REFRESH_ADMISSIONS = 64
+
+
+class MemoryBudget:
+    """
+    Limits the memory used by the registered components to `max_bytes`
+
+    Components are registered with `register` and report the bytes they use
+    with their `memory_usage` method. Before holding more, they call
+    `admit`, which accepts everything while usage is below `shed_ratio` of
+    the budget, then only valuable telemetry until the budget is used up,
+    then nothing. The telemetry shed is counted by component and reason in
+    `shed`. Components are only weakly referenced.
+
+    Asking every component for its usage at every admission would cost more
+    than the admission itself, so the usage is kept as a running total of
+    the sizes of the admitted items, computed again from the components
+    every `_REFRESH_ADMISSIONS` admissions and before shedding anything.
+    """
+
+    def __init__(
+        self, max_bytes: int, shed_ratio: float = _DEFAULT_SHED_RATIO
+    ):
+        self.max_bytes = max_bytes
+        self.shed_bytes = max_bytes * shed_ratio
+        # Component and reason to the number of items shed.
+        self.shed = {}
+        self._components = WeakKeyDictionary()
+        self._lock = Lock()
+        self._over_budget = False
+        self._usage = 0
+        # The usage is computed at the first admission.
+        self._admissions = _REFRESH_ADMISSIONS
+
+        weak_reinit = WeakMethod(self._at_fork_reinit)
+        register_at_fork(after_in_child=lambda: weak_reinit()())
+
+    def _at_fork_reinit(self):
+        self._lock = Lock()
+        self._admissions = _REFRESH_ADMISSIONS
+
+    def register(self, account, component: str) -> None:
+        """
+        Accounts the usage of `account` under the `component` name
+        """
+        with self._lock:
+            self._components[account] = component
+
+    def usage(self) -> dict:
+        """
+        Returns the bytes used by component
+        """
+        usage = {}
+
+        for account, component in list(self._components.items()):
+            usage[component] = usage.get(component, 0) + account.memory_usage()
+
+        return usage
+
+    def _refresh(self) -> None:
+        # Called with the lock held.
+        self._usage = sum(
+            account.memory_usage() for account in list(self._components)
+        )
+        self._admissions = 0
+
+    def _reason(self, valuable: bool) -> Optional[str]:
+        # The reason for shedding an item, `None` to admit it. Called with
+        # the lock held.
+        if self._usage < self.shed_bytes:
+            return None
+
+        if self._usage < self.max_bytes:
+            return None if valuable else _DOWNSAMPLED
+
+        return _OVER_BUDGET
+
+    def admit(
+        self, component: str, valuable: bool = False, size: int = 0
+    ) -> bool:
+        """
+        Returns if `component` may hold one more item of `size` bytes, counts
+        it as shed if not
+        """
+        exceeded = False
+
+        with self._lock:
+            self._admissions += 1
+
+            if self._admissions >= _REFRESH_ADMISSIONS:
+                self._refresh()
+
+            reason = self._reason(valuable)
+
+            # Items held by the components may have been released since the
+            # usage was computed.
+            if reason is not None and self._admissions:
+                self._refresh()
+                reason = self._reason(valuable)
+
+            if reason is None:
+                if self._usage < self.shed_bytes:
+                    self._over_budget = False
+
+                self._usage += size
+                return True
+
+            if reason == _OVER_BUDGET and not self._over_budget:
+                self._over_budget = True
+                exceeded = True
+
+            key = (component, reason)
+            self.shed[key] = self.shed.get(key, 0) + 1
+
+        if exceeded:
+            _logger.warning(
+                "Telemetry memory budget of %s bytes exceeded, dropping "
+                "telemetry.",
+                self.max_bytes,
+            )
+
+        return False
+
+
+def _span_size(span) -> int:
+    # pylint: disable=protected-access
+    if isinstance(span, _EncodedSpan):
+        return _ENCODED_SPAN_BYTES + len(span.data)
+
+    return (
+        _SPAN_BYTES
+        + _SPAN_ATTRIBUTE_BYTES * len(span._attributes or ())
+        + sum(
+            _SPAN_EVENT_BYTES
+            + _SPAN_ATTRIBUTE_BYTES * len(event.attributes or ())
+            for event in span._events
+        )
+    )
+
+
+def _span_valuable(span) -> bool:
+    # Encoded spans were sampled and no longer have a status, they are all
+    # kept until the budget is used up.
+    if isinstance(span, _EncodedSpan):
+        return False
+
+    return _priority_class(span) != _OTHER
+
+
+def _span_exempt(span) -> bool:
+    return not isinstance(span, _EncodedSpan) and _is_profile(span)
+
+
+def _log_size(log_data: LogData) -> int:
+    body = log_data.log_record.body
+
+    return _LOG_RECORD_BYTES + (len(body) if isinstance(body, str) else 0)
+
+
+def _log_valuable(log_data: LogData) -> bool:
+    severity_number = log_data.log_record.severity_number
+
+    # Warnings and above.
+    return severity_number is not None and severity_number.value >= 13
+
+
+class BudgetedQueue:
+    """
+    Queue that asks a memory budget before queuing an item
+
+    Wraps the `collections.deque` of a batching processor, or an object
+    implementing the same subset of its interface, and implements that
+    subset. Items the budget does not admit are dropped. The usage is
+    estimated as the length of the queue times the running average of the
+    sizes of the queued items, so that items evicted by the wrapped queue
+    itself need no accounting. Items for which `exempt` returns `True` are
+    queued without asking the budget or changing the average.
+    """
+
+    def __init__(
+        self,
+        queue,
+        memory_budget: MemoryBudget,
+        component: str,
+        size: Callable[[object], int],
+        valuable: Callable[[object], bool],
+        exempt: Optional[Callable[[object], bool]] = None,
+    ):
+        self.queue = queue
+        self._memory_budget = memory_budget
+        self._component = component
+        self._size = size
+        self._valuable = valuable
+        self._exempt = exempt
+        self._average_size = 0
+        memory_budget.register(self, component)
+
+    def appendleft(self, item):
+        if self._exempt is not None and self._exempt(item):
+            self.queue.appendleft(item)
+            return
+
+        size = self._size(item)
+
+        if not self._memory_budget.admit(
+            self._component, self._valuable(item), size
+        ):
+            return
+
+        if self._average_size:
+            self._average_size += (size - self._average_size) * _AVERAGE_WEIGHT
+        else:
+            self._average_size = size
+
+        self.queue.appendleft(item)
+
+    def pop(self):
+        return self.queue.pop()
+
+    def clear(self):
+        self.queue.clear()
+
+    def __len__(self):
+        return len(self.queue)
+
+    def memory_usage(self) -> int:
+        return int(len(self.queue) * self._average_size)
+
+
+def budget_span_processor(
+    span_processor, memory_budget: Optional[MemoryBudget]
+):
+    """
+    Makes the queue of `span_processor`, if it has one, use `memory_budget`
+
+    Must be called before any span ends, does nothing if `memory_budget` is
+    `None`. Spans with an error status and local root spans are kept while
+    other spans are downsampled. The profiles of `ProfilerSpanProcessor`,
+    bounded by the profiler itself, are always queued.
+    """
+    if memory_budget is None:
+        return span_processor
+
+    for attribute in ["queue", "_queue"]:
+        queue = getattr(span_processor, attribute, None)
+
+        if queue is not None:
+            setattr(
+                span_processor,
+                attribute,
+                BudgetedQueue(
+                    queue,
+                    memory_budget,
+                    "span_queue",
+                    _span_size,
+                    _span_valuable,
+                    _span_exempt,
+                ),
+            )
+            break
+
+    return span_processor
+
+
+def budget_log_record_processor(
+    log_record_processor, memory_budget: Optional[MemoryBudget]
+):
+    """
+    Makes the queue of `log_record_processor` use `memory_budget`
+
+    Must be called before any record is emitted, does nothing if
+    `memory_budget` is `None`. Warnings and more severe records are kept
+    while other records are downsampled.
+    """
+    # pylint: disable=protected-access
+    if memory_budget is not None:
+        log_record_processor._queue = BudgetedQueue(
+            log_record_processor._queue,
+            memory_budget,
+            "log_queue",
+            _log_size,
+            _log_valuable,
+        )
+
+    return log_record_processor
+
+
+class MemoryBudgetMetrics:
+    """
+    Reports the usage of `memory_budget`
+
+    The `telemetry.memory.usage` observable up-down counter reports the
+    bytes used by component, `telemetry.memory.limit` the budget and the
+    `telemetry.memory.shed` observable counter the number of items shed by
+    component and reason. The instruments are created once per meter
+    provider, nothing is reported while `memory_budget` is `None`.
+    """
+
+    def __init__(self, meter_provider: MeterProvider):
+        self.memory_budget: Optional[MemoryBudget] = None
+
+        meter = meter_provider.get_meter(__name__, __version__)
+        meter.create_observable_up_down_counter(
+            "telemetry.memory.usage",
+            callbacks=[self._observe_usage],
+            unit="By",
+            description="Memory used by the buffers of telemetry",
+        )
+        meter.create_observable_up_down_counter(
+            "telemetry.memory.limit",
+            callbacks=[self._observe_limit],
+            unit="By",
+            description="Memory the buffers of telemetry may use",
+        )
+        meter.create_observable_counter(
+            "telemetry.memory.shed",
+            callbacks=[self._observe_shed],
+            unit="{item}",
+            description="Telemetry dropped to stay within the memory budget",
+        )
+
+    def _observe_usage(
+        self, options: CallbackOptions
+    ) -> Iterable[Observation]:
+        memory_budget = self.memory_budget
+
+        if memory_budget is None:
+            return []
+
+        return [
+            Observation(usage, {"component": component})
+            for component, usage in memory_budget.usage().items()
+        ]
+
+    def _observe_limit(
+        self, options: CallbackOptions
+    ) -> Iterable[Observation]:
+        memory_budget = self.memory_budget
+
+        if memory_budget is None:
+            return []
+
+        return [Observation(memory_budget.max_bytes)]
+
+    def _observe_shed(self, options: CallbackOptions) -> Iterable[Observation]:
+        memory_budget = self.memory_budget
+
+        if memory_budget is None:
+            return []
+
+        return [
+            Observation(shed, {"component": component, "reason": reason})
+            for (component, reason), shed in dict(memory_budget.shed).items()
+        ]
@@ -0,0 +1,575 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Metrics served from a local HTTP endpoint
+
+Instead of collecting and pushing metrics from a thread of every process,
+`MetricsEndpointReader` collects them when they are scraped. `GET /metrics`
+responds in the Prometheus text format, or with a serialized OTLP
+`ExportMetricsServiceRequest` if the request accepts
+`application/x-protobuf`, which `GET /v1/metrics` always responds with.
+
+Every process serves its own metrics. When the port is taken, by another
+worker of a pre-fork server for instance, the next free port is used.
+"""
+
+from errno import EADDRINUSE
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging import getLogger
+from math import isinf, isnan
+from os import getpid, register_at_fork
+from re import compile as re_compile
+from threading import Lock, Thread
+from time import monotonic
+from typing import Dict, Optional
+from weakref import WeakMethod
+
+from opentelemetry.exporter.otlp.proto.common._internal import (
+    _encode_instrumentation_scope,
+    _encode_resource,
+)
+from opentelemetry.exporter.otlp.proto.common.metrics_encoder import (
+    encode_metrics,
+)
+from opentelemetry.launcher._encoding import _length_delimited
+from opentelemetry.sdk.metrics.export import (
+    AggregationTemporality,
+    Gauge,
+    Histogram,
+    Metric,
+    MetricReader,
+    MetricsData,
+    ResourceMetrics,
+    ScopeMetrics,
+    Sum,
+)
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.util.instrumentation import InstrumentationScope
+
+_logger = getLogger(__name__)
+
+_PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+_OTLP_CONTENT_TYPE = "application/x-protobuf"
+
+# Scrapes within this time of a collection get the responses encoded from
+# it.
+_DEFAULT_CACHE_SECONDS = 1.0
+# Label sets cached between scrapes before the cache is cleared.
+_MAX_CACHED_LABELS = 10000
+# Ports tried after the requested one when it is taken.
+_DEFAULT_MAX_PORT_OFFSET = 64
+
+# Field numbers of the OTLP messages, from
+# opentelemetry/proto/collector/metrics/v1/metrics_service.proto and
+# opentelemetry/proto/metrics/v1/metrics.proto
+_REQUEST_RESOURCE_METRICS = 1
+_RESOURCE_METRICS_RESOURCE = 1
+_RESOURCE_METRICS_SCOPE_METRICS = 2
+_SCOPE_METRICS_SCOPE = 1
+_SCOPE_METRICS_METRICS = 2
+
+_INVALID_METRIC_NAME_CHARACTERS = re_compile(r"[^a-zA-Z0-9_:]")
+_INVALID_LABEL_NAME_CHARACTERS = re_compile(r"[^a-zA-Z0-9_]")
+
+# Used to encode a metric alone, the encoded resource and scope are dropped.
+_EMPTY_RESOURCE = Resource({})
+_EMPTY_SCOPE = InstrumentationScope("")
+
+
+def _metric_name(name: str) -> str:
+    name = _INVALID_METRIC_NAME_CHARACTERS.sub("_", name)
+
+    if name[:1].isdigit():
+        return f"_{name}"
+
+    return name
+
+
+def _label_name(name: str) -> str:
+    name = _INVALID_LABEL_NAME_CHARACTERS.sub("_", name)
+
+    if name[:1].isdigit():
+        return f"_{name}"
+
+    return name
+
+
+def _label_value(value) -> str:
+    if isinstance(value, (tuple, list)):
+        value = ",".join(str(item) for item in value)
+
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+
+
+def _sample_value(value) -> str:
+    if isinstance(value, float):
+        if isnan(value):
+            return "NaN"
+        if isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+
+    return repr(value)
+
+
+class _PrometheusEncoder:
+    """
+    Encodes metrics in the Prometheus text exposition format
+
+    The label sets and the help and type lines are kept between scrapes,
+    only the samples are encoded again. Monotonic cumulative sums are
+    exposed as counters and cumulative histograms as histograms. Delta sums
+    and histograms, which Prometheus has no type for, are exposed as
+    untyped samples of the values since the previous collection.
+    """
+
+    def __init__(self):
+        self._labels = {}
+        self._headers = {}
+
+    def _label_set(self, attributes) -> str:
+        # The labels of a series, without braces.
+        try:
+            key = frozenset(attributes.items())
+            labels = self._labels.get(key)
+        except TypeError:
+            key = None
+            labels = None
+
+        if labels is None:
+            labels = ",".join(
+                f'{_label_name(name)}="{_label_value(value)}"'
+                for name, value in attributes.items()
+            )
+
+            if key is not None:
+                if len(self._labels) >= _MAX_CACHED_LABELS:
+                    self._labels.clear()
+
+                self._labels[key] = labels
+
+        return labels
+
+    def _header(self, name: str, description: str, metric_type: str):
+        key = (name, description, metric_type)
+        header = self._headers.get(key)
+
+        if header is None:
+            description = description.replace("\\", "\\\\").replace(
+                "\n", "\\n"
+            )
+            header = f"# TYPE {name} {metric_type}\n"
+
+            if description:
+                header = f"# HELP {name} {description}\n{header}"
+
+            self._headers[key] = header
+
+        return header
+
+    def _target_info(self, resource: Resource) -> str:
+        labels = self._label_set(resource.attributes)
+
+        return (
+            "# HELP target_info Target metadata\n"
+            "# TYPE target_info gauge\n"
+            f"target_info{{{labels}}} 1\n"
+        )
+
+    @staticmethod
+    def _sample(name: str, labels: str, value) -> str:
+        if labels:
+            return f"{name}{{{labels}}} {_sample_value(value)}\n"
+
+        return f"{name} {_sample_value(value)}\n"
+
+    def _encode_metric(self, metric: Metric, families: dict) -> None:
+        name = _metric_name(metric.name)
+        data = metric.data
+        cumulative = (
+            getattr(data, "aggregation_temporality", None)
+            is AggregationTemporality.CUMULATIVE
+        )
+
+        if isinstance(data, Sum):
+            if data.is_monotonic and cumulative:
+                metric_type = "counter"
+                name = f"{name}_total"
+            elif cumulative:
+                metric_type = "gauge"
+            else:
+                metric_type = "untyped"
+        elif isinstance(data, Gauge):
+            metric_type = "gauge"
+        elif isinstance(data, Histogram):
+            metric_type = "histogram" if cumulative else "untyped"
+        else:
+            _logger.debug(
+                "Metric %s of type %s not exposed in the Prometheus format",
+                metric.name,
+                data.__class__.__name__,
+            )
+            return
+
+        samples = families.get(name)
+
+        if samples is None:
+            samples = [self._header(name, metric.description, metric_type)]
+            families[name] = samples
+
+        sample = self._sample
+
+        if not isinstance(data, Histogram):
+            for data_point in data.data_points:
+                samples.append(
+                    sample(
+                        name,
+                        self._label_set(data_point.attributes),
+                        data_point.value,
+                    )
+                )
+            return
+
+        for data_point in data.data_points:
+            labels = self._label_set(data_point.attributes)
+            separator = "," if labels else ""
+            count = 0
+
+            for bound, bucket_count in zip(
+                (*data_point.explicit_bounds, float("inf")),
+                data_point.bucket_counts,
+            ):
+                count += bucket_count
+                bound = _sample_value(float(bound))
+                samples.append(
+                    sample(
+                        f"{name}_bucket",
+                        f'{labels}{separator}le="{bound}"',
+                        count,
+                    )
+                )
+
+            samples.append(sample(f"{name}_sum", labels, data_point.sum))
+            samples.append(sample(f"{name}_count", labels, data_point.count))
+
+    def encode(self, metrics_data: Optional[MetricsData]) -> bytes:
+        chunks = []
+        families = {}
+
+        for resource_metrics in (
+            metrics_data.resource_metrics if metrics_data else []
+        ):
+            chunks.append(self._target_info(resource_metrics.resource))
+
+            for scope_metrics in resource_metrics.scope_metrics:
+                for metric in scope_metrics.metrics:
+                    self._encode_metric(metric, families)
+
+        for samples in families.values():
+            chunks.extend(samples)
+
+        return "".join(chunks).encode()
+
+
+class _OTLPEncoder:
+    """
+    Encodes metrics as a serialized OTLP `ExportMetricsServiceRequest`
+
+    Every metric is encoded as its own `Metric` message and the messages
+    are concatenated with the resources and instrumentation scopes, which
+    are encoded once and kept between scrapes.
+    """
+
+    def __init__(self):
+        self._resources = {}
+        self._scopes = {}
+
+    def _resource(self, resource: Resource) -> bytes:
+        encoded = self._resources.get(resource)
+
+        if encoded is None:
+            encoded = _length_delimited(
+                _RESOURCE_METRICS_RESOURCE,
+                _encode_resource(resource).SerializeToString(),
+            )
+            self._resources[resource] = encoded
+
+        return encoded
+
+    def _scope(self, scope: InstrumentationScope) -> bytes:
+        encoded = self._scopes.get(scope)
+
+        if encoded is None:
+            encoded = _length_delimited(
+                _SCOPE_METRICS_SCOPE,
+                _encode_instrumentation_scope(scope).SerializeToString(),
+            )
+            self._scopes[scope] = encoded
+
+        return encoded
+
+    @staticmethod
+    def _metric(metric: Metric) -> bytes:
+        request = encode_metrics(
+            MetricsData(
+                [
+                    ResourceMetrics(
+                        _EMPTY_RESOURCE,
+                        [ScopeMetrics(_EMPTY_SCOPE, [metric], "")],
+                        "",
+                    )
+                ]
+            )
+        )
+        metrics = request.resource_metrics[0].scope_metrics[0].metrics
+
+        # Unsupported metric types are not encoded.
+        if not metrics:
+            return b""
+
+        return _length_delimited(
+            _SCOPE_METRICS_METRICS, metrics[0].SerializeToString()
+        )
+
+    def encode(self, metrics_data: Optional[MetricsData]) -> bytes:
+        chunks = []
+
+        for resource_metrics in (
+            metrics_data.resource_metrics if metrics_data else []
+        ):
+            scope_chunks = [self._resource(resource_metrics.resource)]
+
+            for scope_metrics in resource_metrics.scope_metrics:
+                scope_chunks.append(
+                    _length_delimited(
+                        _RESOURCE_METRICS_SCOPE_METRICS,
+                        b"".join(
+                            [
+                                self._scope(scope_metrics.scope),
+                                *[
+                                    self._metric(metric)
+                                    for metric in scope_metrics.metrics
+                                ],
+                            ]
+                        ),
+                    )
+                )
+
+            chunks.append(
+                _length_delimited(
+                    _REQUEST_RESOURCE_METRICS, b"".join(scope_chunks)
+                )
+            )
+
+        return b"".join(chunks)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Set on the subclass made for every reader.
+    reader = None
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        path = self.path.split("?", 1)[0]
+
+        if path == "/v1/metrics" or (
+            path == "/metrics"
+            and _OTLP_CONTENT_TYPE in self.headers.get("Accept", "")
+        ):
+            content_type = _OTLP_CONTENT_TYPE
+        elif path == "/metrics":
+            content_type = _PROMETHEUS_CONTENT_TYPE
+        else:
+            self.send_error(404)
+            return
+
+        try:
+            body = self.reader.scrape(content_type)
+        # pylint: disable=broad-except
+        except Exception:
+            _logger.exception("Exception while collecting metrics.")
+            self.send_error(500)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        _logger.debug(format, *args)
+
+
+class MetricsEndpointReader(MetricReader):
+    """
+    Metric reader that collects metrics when they are scraped
+
+    Serves `GET /metrics` and `GET /v1/metrics` on `host` and `port` from a
+    thread started with the reader, see the module documentation. Metrics
+    are collected with `preferred_temporality`, delta metrics report what
+    was measured since the previous collection, whatever scraped it. Scrapes
+    arriving while metrics are collected wait for that collection, scrapes
+    within `cache_seconds` of a collection get the responses encoded from
+    it, each format being encoded once.
+
+    If `port` is taken, the next free one up to `port + max_port_offset` is
+    used with a warning, so that the workers of a pre-fork server each get
+    their own port. A forked process stops serving the socket of its parent
+    and listens on a port of its own the same way. With `port` 0, a port is
+    picked by the system, see `port`.
+
+    Raises:
+        OSError: if no port can be listened on.
+    """
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 9464,
+        preferred_temporality: Dict[type, AggregationTemporality] = None,
+        cache_seconds: float = _DEFAULT_CACHE_SECONDS,
+        max_port_offset: int = _DEFAULT_MAX_PORT_OFFSET,
+    ):
+        super().__init__(preferred_temporality=preferred_temporality)
+        self.cache_seconds = cache_seconds
+        self.max_port_offset = max_port_offset
+        self._host = host
+        self._requested_port = port
+        self._done = False
+        self._lock = Lock()
+        self._metrics_data = None
+        self._collected = None
+        self._responses = {}
+        self._encoders = {
+            _PROMETHEUS_CONTENT_TYPE: _PrometheusEncoder(),
+            _OTLP_CONTENT_TYPE: _OTLPEncoder(),
+        }
+        self._server = None
+        self._start()
+
+        weak_reinit = WeakMethod(self._at_fork_reinit)
+        register_at_fork(after_in_child=lambda: weak_reinit()())
+
+    def _listen(self) -> ThreadingHTTPServer:
+        handler = type("_Handler", (_Handler,), {"reader": self})
+        port = self._requested_port
+        last_port = port + self.max_port_offset if port else port
+
+        while True:
+            try:
+                server = ThreadingHTTPServer((self._host, port), handler)
+            except OSError as error:
+                if error.errno != EADDRINUSE or port >= last_port:
+                    raise
+
+                port += 1
+                continue
+
+            if port != self._requested_port:
+                _logger.warning(
+                    "Port %s taken, serving the metrics of process %s on "
+                    "port %s",
+                    self._requested_port,
+                    getpid(),
+                    port,
+                )
+
+            return server
+
+    def _start(self):
+        self._server = self._listen()
+        self._server.daemon_threads = True
+        self._thread = Thread(
+            target=self._server.serve_forever,
+            name="MetricsEndpointReader",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def _at_fork_reinit(self):
+        self._lock = Lock()
+        self._collected = None
+        self._responses = {}
+
+        if self._done or self._server is None:
+            return
+
+        # The parent keeps serving its socket, this process only closes its
+        # copy of it.
+        self._server.socket.close()
+        self._server = None
+
+        try:
+            self._start()
+        except OSError:
+            _logger.exception(
+                "Unable to serve the metrics of process %s", getpid()
+            )
+
+    @property
+    def port(self) -> Optional[int]:
+        """
+        The port listened on, `None` if no port could be listened on after
+        a fork
+        """
+        if self._server is None:
+            return None
+
+        return self._server.server_address[1]
+
+    def scrape(self, content_type: str) -> bytes:
+        """
+        Returns the metrics encoded for `content_type`
+        """
+        with self._lock:
+            if (
+                self._collected is None
+                or monotonic() - self._collected >= self.cache_seconds
+            ):
+                self.collect()
+                self._collected = monotonic()
+                self._responses = {}
+
+            response = self._responses.get(content_type)
+
+            if response is None:
+                response = self._encoders[content_type].encode(
+                    self._metrics_data
+                )
+                self._responses[content_type] = response
+
+            return response
+
+    def _receive_metrics(
+        self,
+        metrics_data: MetricsData,
+        timeout_millis: float = 10_000,
+        **kwargs,
+    ) -> None:
+        self._metrics_data = metrics_data
+
+    def shutdown(self, timeout_millis: float = 30_000, **kwargs) -> None:
+        self._done = True
+
+        if self._server is None:
+            return
+
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join(timeout_millis / 1e3)
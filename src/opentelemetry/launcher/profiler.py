@@ -0,0 +1,378 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Sampling CPU profiler correlated with spans
+
+Traces tell which operation was slow, not where its CPU time went. The
+profiler here periodically captures the Python stack of every thread that
+has a span in progress, attributes the CPU time the thread used since the
+previous sample to that stack and to the innermost span the thread started,
+and aggregates the stacks by span name. The profiles are exported as spans,
+through the span processors of the tracer provider, so that they reach the
+same destinations as the traces.
+"""
+
+from logging import getLogger
+from os import path, register_at_fork
+from sys import _current_frames
+from threading import Event, Lock, Thread, get_ident
+from time import monotonic, thread_time, time_ns
+from typing import Optional
+from weakref import WeakMethod
+
+from opentelemetry.sdk.trace import (
+    ReadableSpan,
+    Span,
+    SpanProcessor,
+    TracerProvider,
+)
+from opentelemetry.sdk.util.instrumentation import InstrumentationScope
+from opentelemetry.trace import Link, SpanContext, TraceFlags
+
+from .version import __version__
+
+try:
+    from time import clock_gettime_ns, pthread_getcpuclockid
+except ImportError:  # pragma: no cover
+    # Not available on Windows, samples are then counted instead of the CPU
+    # time of the threads.
+    pthread_getcpuclockid = None
+
+_logger = getLogger(__name__)
+
+_DEFAULT_INTERVAL_SECONDS = 0.01
+_DEFAULT_EXPORT_INTERVAL_SECONDS = 60.0
+# The CPU time of the profiler as a ratio of the wall time it runs, the
+# interval between samples is lengthened to stay below it.
+_DEFAULT_MAX_OVERHEAD = 0.01
+_DEFAULT_MAX_STACKS = 10000
+# Deeper frames, the outermost ones, are left out of the stacks.
+_MAX_DEPTH = 64
+# Spans a profile links to, per span name.
+_MAX_LINKS = 16
+
+PROFILE_SPAN_NAME = "profile"
+
+
+def _is_profile(span: ReadableSpan) -> bool:
+    """
+    Returns if `span` is a profile exported by a `ProfilerSpanProcessor`
+
+    The processors that derive telemetry from the spans of the application
+    skip the profiles, which are only meant to be exported.
+    """
+    scope = span.instrumentation_scope
+
+    return scope is not None and scope.name == __name__
+
+
+class ProfilerSpanProcessor(SpanProcessor):
+    """
+    Span processor that samples the stacks of the threads running spans
+
+    Every `interval` seconds, a thread reads the frames of the other threads
+    with `sys._current_frames`. A thread that started a span that has not
+    ended yet is sampled: the CPU time it used since the previous sample is
+    added to its stack, under the name of the innermost such span. Spans
+    are tracked by the thread that started them, which is the thread running
+    them unless they are handed over to another thread or task. The interval
+    is lengthened whenever the sampling would use more than `max_overhead`
+    of a CPU.
+
+    Every `export_interval` seconds and when shut down, a `profile` span per
+    span name is handed to the span processors of `tracer_provider`, without
+    being sampled, with these attributes:
+
+    - `profile.span_name`: the name of the sampled spans
+    - `profile.folded_stacks`: the stacks in the folded format, outermost
+      frame first, frames separated by `;` and followed by a space and the
+      CPU microseconds spent in the stack
+    - `profile.unit`: `cpu_us`, or `samples` if the CPU time of threads can't
+      be read and every stack is followed by its number of samples
+    - `profile.samples`: the number of samples
+
+    and links to up to `_MAX_LINKS` of the sampled spans. Once `max_stacks`
+    distinct stacks are held, the samples of new ones are dropped until the
+    next export.
+    """
+
+    def __init__(
+        self,
+        tracer_provider: TracerProvider,
+        interval: float = _DEFAULT_INTERVAL_SECONDS,
+        export_interval: float = _DEFAULT_EXPORT_INTERVAL_SECONDS,
+        max_overhead: float = _DEFAULT_MAX_OVERHEAD,
+        max_stacks: int = _DEFAULT_MAX_STACKS,
+    ):
+        self.interval = interval
+        self.export_interval = export_interval
+        self.max_overhead = max_overhead
+        self.max_stacks = max_stacks
+        self.dropped_samples = 0
+        self._tracer_provider = tracer_provider
+        self._scope = InstrumentationScope(__name__, __version__)
+        # Thread identifier to the spans the thread started that have not
+        # ended, innermost last.
+        self._spans = {}
+        # Thread identifier to its CPU time at the previous sample.
+        self._cpu_times = {}
+        self._labels = {}
+        self._lock = Lock()
+        self._reset()
+        self._done = Event()
+        self._start()
+
+        weak_reinit = WeakMethod(self._at_fork_reinit)
+        register_at_fork(after_in_child=lambda: weak_reinit()())
+
+    def _reset(self):
+        # Span name and stack of code objects, innermost first, to the CPU
+        # microseconds or samples.
+        self._stacks = {}
+        # Span name to the number of samples.
+        self._samples = {}
+        # Span name to the contexts of sampled spans.
+        self._links = {}
+        self._started = time_ns()
+
+    def _start(self):
+        self._delay = self.interval
+        self._thread = Thread(
+            name="OtelProfiler", target=self._run, daemon=True
+        )
+        self._thread.start()
+
+    def _at_fork_reinit(self):
+        self._lock = Lock()
+        self._spans = {}
+        self._cpu_times = {}
+        self._reset()
+
+        if not self._done.is_set():
+            self._start()
+
+    def on_start(
+        self, span: Span, parent_context: Optional[object] = None
+    ) -> None:
+        ident = get_ident()
+        spans = self._spans.get(ident)
+
+        if spans is None:
+            spans = self._spans.setdefault(ident, [])
+
+        spans.append(span)
+
+    def on_end(self, span: ReadableSpan) -> None:
+        # The span ended is a copy of the one started, sharing its context.
+        context = span.context
+        spans = self._spans.get(get_ident())
+
+        if spans and spans[-1].context is context:
+            spans.pop()
+            return
+
+        if _is_profile(span):
+            return
+
+        # Ended by another thread or out of order.
+        for spans in list(self._spans.values()):
+            for index, started_span in enumerate(spans):
+                if started_span.context is context:
+                    del spans[index]
+                    return
+
+    def _cpu_time(self, ident: int) -> Optional[int]:
+        if pthread_getcpuclockid is None:
+            return None
+
+        try:
+            return clock_gettime_ns(pthread_getcpuclockid(ident))
+        except OSError:
+            # The thread just exited.
+            return None
+
+    def _sample(self) -> None:
+        frames = _current_frames()
+
+        for ident, spans in list(self._spans.items()):
+            frame = frames.get(ident)
+
+            if frame is None:
+                # The thread exited, with spans that never ended if any.
+                self._spans.pop(ident, None)
+                self._cpu_times.pop(ident, None)
+                continue
+
+            try:
+                span = spans[-1]
+            except IndexError:
+                # Idle threads are not sampled, their CPU time is read again
+                # once they start a span.
+                self._cpu_times.pop(ident, None)
+                continue
+
+            if pthread_getcpuclockid is None:
+                weight = 1
+            else:
+                cpu_time = self._cpu_time(ident)
+                previous = self._cpu_times.get(ident)
+                self._cpu_times[ident] = cpu_time
+
+                if cpu_time is None or previous is None:
+                    continue
+
+                weight = (cpu_time - previous) // 1000
+
+                # Idle since the previous sample.
+                if weight <= 0:
+                    continue
+
+            codes = []
+
+            while frame is not None and len(codes) < _MAX_DEPTH:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+
+            name = span.name
+            key = (name, tuple(codes))
+
+            with self._lock:
+                stacks = self._stacks
+
+                if key in stacks:
+                    stacks[key] += weight
+                elif len(stacks) < self.max_stacks:
+                    stacks[key] = weight
+                else:
+                    self.dropped_samples += 1
+                    continue
+
+                self._samples[name] = self._samples.get(name, 0) + 1
+                links = self._links.setdefault(name, {})
+
+                if len(links) < _MAX_LINKS:
+                    context = span.get_span_context()
+                    links[context.span_id] = context
+
+    def export(self) -> None:
+        """
+        Hands the profiles aggregated since the previous export to the span
+        processors of the tracer provider
+        """
+        with self._lock:
+            stacks = self._stacks
+            samples = self._samples
+            links = self._links
+            started = self._started
+            self._reset()
+
+        # Only the labels of the code objects sampled since the previous
+        # export are kept for the next one.
+        previous_labels = self._labels
+        labels = {}
+        folded_stacks = {}
+
+        for (name, codes), weight in stacks.items():
+            frames = []
+
+            for code in reversed(codes):
+                label = labels.get(code)
+
+                if label is None:
+                    label = previous_labels.get(code)
+
+                    if label is None:
+                        label = f"{path.basename(code.co_filename)}:" + (
+                            getattr(code, "co_qualname", code.co_name)
+                        )
+
+                    labels[code] = label
+
+                frames.append(label)
+
+            folded_stacks.setdefault(name, []).append(
+                (weight, ";".join(frames))
+            )
+
+        self._labels = labels
+
+        resource = self._tracer_provider.resource
+        id_generator = self._tracer_provider.id_generator
+        end_time = time_ns()
+        unit = "samples" if pthread_getcpuclockid is None else "cpu_us"
+
+        for name, folded in folded_stacks.items():
+            folded.sort(reverse=True)
+            span = ReadableSpan(
+                name=PROFILE_SPAN_NAME,
+                context=SpanContext(
+                    id_generator.generate_trace_id(),
+                    id_generator.generate_span_id(),
+                    is_remote=False,
+                    trace_flags=TraceFlags(TraceFlags.SAMPLED),
+                ),
+                resource=resource,
+                attributes={
+                    "profile.span_name": name,
+                    "profile.folded_stacks": tuple(
+                        f"{stack} {weight}" for weight, stack in folded
+                    ),
+                    "profile.unit": unit,
+                    "profile.samples": samples.get(name, 0),
+                },
+                links=[Link(context) for context in links[name].values()],
+                instrumentation_scope=self._scope,
+                start_time=started,
+                end_time=end_time,
+            )
+            # pylint: disable=protected-access
+            self._tracer_provider._active_span_processor.on_end(span)
+
+    def _run(self):
+        next_export = monotonic() + self.export_interval
+        cpu_time = thread_time()
+
+        while not self._done.wait(self._delay):
+            try:
+                self._sample()
+
+                if monotonic() >= next_export:
+                    next_export = monotonic() + self.export_interval
+                    self.export()
+            # pylint: disable=broad-except
+            except Exception:
+                _logger.exception("Exception while profiling.")
+
+            # Using `cost` seconds of CPU, waking up included, every `delay`
+            # seconds uses about cost / (cost + delay) of a CPU.
+            previous_cpu_time = cpu_time
+            cpu_time = thread_time()
+            cost = cpu_time - previous_cpu_time
+            self._delay = max(
+                self.interval,
+                cost * (1 - self.max_overhead) / self.max_overhead,
+            )
+
+    def shutdown(self) -> None:
+        if self._done.is_set():
+            return
+
+        self._done.set()
+        self._thread.join()
+        self.export()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        self.export()
+        return True
@@ -0,0 +1,360 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Sends captured telemetry to an OTLP endpoint
+
+    python -m opentelemetry.launcher.replay \\
+        --endpoint https://ingest.lightstep.com:443 capture/*.otlp
+
+The access token is read from the LS_ACCESS_TOKEN environment variable or
+from the --access-token argument. When a request keeps failing, the replay
+stops and logs the segment and offset to resume from with --offset.
+"""
+
+from argparse import ArgumentParser
+from logging import INFO, basicConfig, getLogger
+from os import environ
+from threading import BoundedSemaphore, Event, Lock, Timer
+from time import monotonic, sleep
+from typing import Iterable, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+from grpc import (
+    RpcError,
+    StatusCode,
+    insecure_channel,
+    secure_channel,
+    ssl_channel_credentials,
+)
+
+from opentelemetry.launcher.capture import LOGS, METRICS, TRACES, _read_records
+
+_logger = getLogger(__name__)
+
+_METHODS = {
+    TRACES: "/opentelemetry.proto.collector.trace.v1.TraceService/Export",
+    METRICS: (
+        "/opentelemetry.proto.collector.metrics.v1.MetricsService/Export"
+    ),
+    LOGS: "/opentelemetry.proto.collector.logs.v1.LogsService/Export",
+}
+
+_DEFAULT_MAX_BATCH_BYTES = 4 * 1024 * 1024
+_DEFAULT_CONCURRENCY = 8
+_DEFAULT_TIMEOUT = 10.0
+_DEFAULT_MAX_RETRIES = 5
+# Same codes as the retries of the OTLP exporters.
+_RETRYABLE_CODES = frozenset(
+    [
+        StatusCode.CANCELLED,
+        StatusCode.DEADLINE_EXCEEDED,
+        StatusCode.RESOURCE_EXHAUSTED,
+        StatusCode.ABORTED,
+        StatusCode.OUT_OF_RANGE,
+        StatusCode.UNAVAILABLE,
+        StatusCode.DATA_LOSS,
+    ]
+)
+
+
+class _RateLimiter:
+    """
+    Spaces calls to `wait` by at least 1 / `rate` seconds on average
+    """
+
+    def __init__(self, rate: Optional[float]):
+        self._interval = 1 / rate if rate else 0
+        self._next = monotonic()
+
+    def wait(self):
+        if not self._interval:
+            return
+
+        now = monotonic()
+
+        if self._next > now:
+            sleep(self._next - now)
+        else:
+            # Don't send a burst to catch up after a slow period.
+            self._next = now
+
+        self._next += self._interval
+
+
+def _batches(
+    records: Iterable[Tuple[int, int, bytes, bytes]], max_batch_bytes: int
+) -> Iterable[Tuple[Tuple[int, int], bytes, bytes]]:
+    # Serialized protobuf messages can be concatenated, the result is the
+    # message with the repeated fields of both, so requests are merged
+    # without being parsed. Only consecutive records are merged, so that
+    # every record after the first one of a failed batch is yet to be sent
+    # or in a later batch. Batches come with the position of their first
+    # record, the index of its segment and its offset.
+    position = None
+    pending_signal = None
+    pending = []
+    size = 0
+
+    for index, offset, signal, request in records:
+        if pending and (
+            signal != pending_signal or size + len(request) > max_batch_bytes
+        ):
+            yield position, pending_signal, b"".join(pending)
+            pending = []
+            size = 0
+
+        if not pending:
+            position = (index, offset)
+            pending_signal = signal
+
+        pending.append(request)
+        size += len(request)
+
+    if pending:
+        yield position, pending_signal, b"".join(pending)
+
+
+def replay(
+    paths: Sequence[str],
+    endpoint: str,
+    headers: Optional[Sequence[Tuple[str, str]]] = None,
+    insecure: bool = False,
+    max_batch_bytes: int = _DEFAULT_MAX_BATCH_BYTES,
+    concurrency: int = _DEFAULT_CONCURRENCY,
+    requests_per_second: Optional[float] = None,
+    timeout: float = _DEFAULT_TIMEOUT,
+    max_retries: int = _DEFAULT_MAX_RETRIES,
+    offset: int = 0,
+) -> dict:
+    """
+    Sends the records of segment files to an OTLP gRPC endpoint
+
+    Consecutive records of the same signal are merged into requests of up to
+    `max_batch_bytes` bytes, unless a single record is larger. Up to
+    `concurrency` requests are in flight at the same time over one HTTP/2
+    connection and no more than `requests_per_second` requests are started
+    per second.
+
+    Requests failing with a status code the OTLP exporters retry are retried
+    up to `max_retries` times with an exponential backoff. Once a request
+    failed for good, no more requests are started and the segment and offset
+    of its first record are returned, the replay can be resumed from there.
+    Requests that were in flight and succeeded after it are then sent
+    again.
+
+    Arguments:
+        paths: the segment files, in the order they are to be sent.
+        endpoint (str): the URL of the OTLP endpoint, an `http` scheme
+            implies an insecure channel.
+        headers: the gRPC metadata sent with every request.
+        insecure (bool): if an insecure channel is to be used.
+        max_batch_bytes (int): the maximum size of a merged request.
+        concurrency (int): the maximum number of requests in flight.
+        requests_per_second (float): the maximum rate of requests, `None` for
+            no limit.
+        timeout (float): the timeout of every request in seconds.
+        max_retries (int): the maximum number of retries of a request.
+        offset (int): the offset of the first record to send in the first
+            segment.
+
+    Returns:
+        A dictionary with the number of `requests` and `bytes` sent, the
+        number of `failed_requests` and, if any, the `resume_path` and
+        `resume_offset` of the first record that failed to be sent and the
+        `resume_paths`, that segment and the ones after it.
+    """
+    paths = list(paths)
+    parsed_endpoint = urlparse(endpoint)
+
+    if parsed_endpoint.netloc:
+        target = parsed_endpoint.netloc
+        insecure = insecure or parsed_endpoint.scheme == "http"
+    else:
+        target = endpoint
+
+    if insecure:
+        channel = insecure_channel(target)
+    else:
+        channel = secure_channel(target, ssl_channel_credentials())
+
+    # Without serializers, gRPC sends the request bytes as they are.
+    methods = {
+        signal: channel.unary_unary(method)
+        for signal, method in _METHODS.items()
+    }
+    in_flight = BoundedSemaphore(concurrency)
+    rate_limiter = _RateLimiter(requests_per_second)
+    statistics = {"requests": 0, "bytes": 0, "failed_requests": 0}
+    statistics_lock = Lock()
+    failed = Event()
+    failed_positions = []
+
+    def _send(position, signal, request, retries):
+        methods[signal].future(
+            request, timeout=timeout, metadata=headers
+        ).add_done_callback(
+            lambda future: _done(future, position, signal, request, retries)
+        )
+
+    def _done(future, position, signal, request, retries):
+        try:
+            future.result()
+        except RpcError as error:
+            if (
+                error.code() in _RETRYABLE_CODES
+                and retries < max_retries
+                and not failed.is_set()
+            ):
+                delay = 2**retries
+                _logger.warning(
+                    "Request failed: %s, retrying in %ss", error.code(), delay
+                )
+                # The slot of the request is kept until it is done.
+                retry = Timer(
+                    delay, _send, (position, signal, request, retries + 1)
+                )
+                retry.daemon = True
+                retry.start()
+                return
+
+            _logger.error("Request failed: %s", error.code())
+
+            with statistics_lock:
+                statistics["failed_requests"] += 1
+                failed_positions.append(position)
+
+            failed.set()
+
+        in_flight.release()
+
+    try:
+        for position, signal, request in _batches(
+            _read_records(paths, offset), max_batch_bytes
+        ):
+            rate_limiter.wait()
+            in_flight.acquire()  # pylint: disable=consider-using-with
+
+            if failed.is_set():
+                in_flight.release()
+                break
+
+            with statistics_lock:
+                statistics["requests"] += 1
+                statistics["bytes"] += len(request)
+
+            _send(position, signal, request, 0)
+
+        # Every slot is free once the last request is done.
+        for _ in range(concurrency):
+            in_flight.acquire()  # pylint: disable=consider-using-with
+
+    finally:
+        channel.close()
+
+    if failed_positions:
+        index, resume_offset = min(failed_positions)
+        statistics["resume_path"] = paths[index]
+        statistics["resume_offset"] = resume_offset
+        statistics["resume_paths"] = paths[index:]
+
+    return statistics
+
+
+def main(arguments: Optional[Sequence[str]] = None):
+    parser = ArgumentParser(
+        description="Sends captured telemetry to an OTLP endpoint"
+    )
+    parser.add_argument("paths", nargs="+", help="segment files")
+    parser.add_argument(
+        "--endpoint",
+        default=environ.get(
+            "OTEL_EXPORTER_OTLP_TRACES_ENDPOINT",
+            "https://ingest.lightstep.com:443",
+        ),
+    )
+    parser.add_argument(
+        "--access-token", default=environ.get("LS_ACCESS_TOKEN")
+    )
+    parser.add_argument("--insecure", action="store_true")
+    parser.add_argument(
+        "--max-batch-bytes", type=int, default=_DEFAULT_MAX_BATCH_BYTES
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=_DEFAULT_CONCURRENCY
+    )
+    parser.add_argument(
+        "--requests-per-second",
+        type=float,
+        default=None,
+        help="maximum rate of requests, unlimited by default",
+    )
+    parser.add_argument("--timeout", type=float, default=_DEFAULT_TIMEOUT)
+    parser.add_argument(
+        "--max-retries", type=int, default=_DEFAULT_MAX_RETRIES
+    )
+    parser.add_argument(
+        "--offset",
+        type=int,
+        default=0,
+        help="offset of the first record to send in the first segment",
+    )
+    parsed_arguments = parser.parse_args(arguments)
+
+    basicConfig(level=INFO)
+
+    headers = None
+
+    if parsed_arguments.access_token:
+        headers = (("lightstep-access-token", parsed_arguments.access_token),)
+
+    start = monotonic()
+    statistics = replay(
+        parsed_arguments.paths,
+        parsed_arguments.endpoint,
+        headers=headers,
+        insecure=parsed_arguments.insecure,
+        max_batch_bytes=parsed_arguments.max_batch_bytes,
+        concurrency=parsed_arguments.concurrency,
+        requests_per_second=parsed_arguments.requests_per_second,
+        timeout=parsed_arguments.timeout,
+        max_retries=parsed_arguments.max_retries,
+        offset=parsed_arguments.offset,
+    )
+    duration = monotonic() - start
+
+    _logger.info(
+        "Sent %s requests (%s failed), %.1f MB in %.1fs (%.1f MB/s)",
+        statistics["requests"],
+        statistics["failed_requests"],
+        statistics["bytes"] / 1e6,
+        duration,
+        statistics["bytes"] / 1e6 / duration if duration else 0,
+    )
+
+    if "resume_path" in statistics:
+        _logger.error(
+            "Replay stopped at %s, offset %s. To resume, run with: "
+            "--offset %s %s",
+            statistics["resume_path"],
+            statistics["resume_offset"],
+            statistics["resume_offset"],
+            " ".join(statistics["resume_paths"]),
+        )
+
+    return 1 if statistics["failed_requests"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
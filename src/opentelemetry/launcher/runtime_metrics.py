@@ -0,0 +1,271 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Runtime metrics of the Python process
+
+The metrics are observable instruments, all of them are measured at once
+when metrics are collected, nothing is measured when the application runs
+except for the duration of garbage collections.
+"""
+
+from asyncio import AbstractEventLoop, get_running_loop
+from gc import callbacks as gc_callbacks
+from gc import get_stats
+from mmap import PAGESIZE
+from os import listdir, times
+from threading import Lock, active_count
+from time import monotonic, perf_counter
+from typing import Iterable, Optional
+
+from opentelemetry.metrics import CallbackOptions, MeterProvider, Observation
+
+from .version import __version__
+
+_DEFAULT_LOOP_PROBE_INTERVAL = 0.5
+
+_loop_lag_lock = Lock()
+# The largest lag measured in any monitored event loop since the last
+# collection, in seconds.
+_loop_lag = None
+
+
+def _probe_loop(loop: AbstractEventLoop, interval: float, expected: float):
+    global _loop_lag  # pylint: disable=global-statement
+
+    lag = max(monotonic() - expected, 0)
+
+    with _loop_lag_lock:
+        if _loop_lag is None or lag > _loop_lag:
+            _loop_lag = lag
+
+    if not loop.is_closed():
+        loop.call_later(
+            interval, _probe_loop, loop, interval, monotonic() + interval
+        )
+
+
+def monitor_event_loop(
+    loop: Optional[AbstractEventLoop] = None,
+    interval: float = _DEFAULT_LOOP_PROBE_INTERVAL,
+) -> None:
+    """
+    Measures the lag of an asyncio event loop
+
+    A callback is scheduled in the loop every `interval` seconds, the lag is
+    how late it runs. It is reported by the
+    `process.runtime.cpython.asyncio.loop_lag` metric, the largest lag
+    measured since the previous collection.
+
+    Arguments:
+        loop: the event loop, the running one if `None`.
+        interval (float): the time between two measurements in seconds.
+    """
+    if loop is None:
+        loop = get_running_loop()
+
+    loop.call_later(
+        interval, _probe_loop, loop, interval, monotonic() + interval
+    )
+
+
+class RuntimeMetrics:
+    """
+    Observable instruments for the runtime metrics of the process
+
+    Garbage collections, threads, resident memory, CPU time and open file
+    descriptors are measured by a single callback when metrics are
+    collected, every instrument then reports its part of that measurement.
+    The duration of garbage collections is measured by a `gc.callbacks`
+    callback. The lag of the event loops passed to `monitor_event_loop` is
+    reported too.
+
+    Resident memory and file descriptors are read from `/proc` and are only
+    reported where it exists.
+    """
+
+    def __init__(self, meter_provider: MeterProvider):
+        self._meter = meter_provider.get_meter(__name__, __version__)
+        self._lock = Lock()
+        self._gc_start = None
+        self._gc_pause_time = [0.0] * len(get_stats())
+        self._observations = {}
+        self._instruments = None
+        self._started = False
+
+    def _on_gc(self, phase, info):
+        # Called by the interpreter around every collection, in whatever
+        # thread triggered it.
+        if phase == "start":
+            self._gc_start = perf_counter()
+        elif self._gc_start is not None:
+            self._gc_pause_time[info["generation"]] += (
+                perf_counter() - self._gc_start
+            )
+            self._gc_start = None
+
+    def _measure(self) -> dict:
+        global _loop_lag  # pylint: disable=global-statement
+
+        gc_stats = get_stats()
+        cpu_times = times()
+        observations = {
+            "process.runtime.cpython.gc_count": [
+                Observation(stats["collections"], {"generation": generation})
+                for generation, stats in enumerate(gc_stats)
+            ],
+            "process.runtime.cpython.gc.pause_time": [
+                Observation(pause_time, {"generation": generation})
+                for generation, pause_time in enumerate(self._gc_pause_time)
+            ],
+            "process.runtime.cpython.thread_count": [
+                Observation(active_count())
+            ],
+            "process.runtime.cpython.cpu_time": [
+                Observation(cpu_times.user, {"type": "user"}),
+                Observation(cpu_times.system, {"type": "system"}),
+            ],
+            "process.runtime.cpython.memory": [],
+            "process.open_file_descriptor.count": [],
+            "process.runtime.cpython.asyncio.loop_lag": [],
+        }
+
+        try:
+            with open("/proc/self/statm", "rb") as statm:
+                resident_pages = int(statm.read().split()[1])
+
+            observations["process.runtime.cpython.memory"].append(
+                Observation(resident_pages * PAGESIZE, {"type": "rss"})
+            )
+            observations["process.open_file_descriptor.count"].append(
+                Observation(len(listdir("/proc/self/fd")))
+            )
+        except OSError:
+            pass
+
+        with _loop_lag_lock:
+            loop_lag = _loop_lag
+            _loop_lag = None
+
+        if loop_lag is not None:
+            observations["process.runtime.cpython.asyncio.loop_lag"].append(
+                Observation(loop_lag)
+            )
+
+        return observations
+
+    def _callback(self, name, measure=False):
+        def callback(options: CallbackOptions) -> Iterable[Observation]:
+            with self._lock:
+                if not self._started:
+                    return []
+
+                # The first instrument is observed first at every
+                # collection, it takes the measurement for all of them.
+                if measure:
+                    self._observations = self._measure()
+
+                return self._observations.get(name, [])
+
+        return callback
+
+    def start(self) -> None:
+        """
+        Starts measuring, the instruments are created on the first call
+        """
+        with self._lock:
+            if self._started:
+                return
+
+            self._started = True
+
+            if self._instruments is None:
+                self._instruments = self._create_instruments()
+
+        gc_callbacks.append(self._on_gc)
+
+    def stop(self) -> None:
+        """
+        Stops measuring, the instruments no longer report anything
+        """
+        with self._lock:
+            if not self._started:
+                return
+
+            self._started = False
+
+        if self._on_gc in gc_callbacks:
+            gc_callbacks.remove(self._on_gc)
+
+    def _create_instruments(self):
+        meter = self._meter
+
+        return [
+            meter.create_observable_counter(
+                "process.runtime.cpython.gc_count",
+                callbacks=[
+                    self._callback(
+                        "process.runtime.cpython.gc_count", measure=True
+                    )
+                ],
+                unit="{collection}",
+                description="Garbage collections by generation",
+            ),
+            meter.create_observable_counter(
+                "process.runtime.cpython.gc.pause_time",
+                callbacks=[
+                    self._callback("process.runtime.cpython.gc.pause_time")
+                ],
+                unit="s",
+                description="Time spent in garbage collections by generation",
+            ),
+            meter.create_observable_up_down_counter(
+                "process.runtime.cpython.thread_count",
+                callbacks=[
+                    self._callback("process.runtime.cpython.thread_count")
+                ],
+                unit="{thread}",
+                description="Live threads",
+            ),
+            meter.create_observable_counter(
+                "process.runtime.cpython.cpu_time",
+                callbacks=[self._callback("process.runtime.cpython.cpu_time")],
+                unit="s",
+                description="CPU time by type",
+            ),
+            meter.create_observable_up_down_counter(
+                "process.runtime.cpython.memory",
+                callbacks=[self._callback("process.runtime.cpython.memory")],
+                unit="By",
+                description="Resident memory",
+            ),
+            meter.create_observable_up_down_counter(
+                "process.open_file_descriptor.count",
+                callbacks=[
+                    self._callback("process.open_file_descriptor.count")
+                ],
+                unit="{file_descriptor}",
+                description="Open file descriptors",
+            ),
+            meter.create_observable_gauge(
+                "process.runtime.cpython.asyncio.loop_lag",
+                callbacks=[
+                    self._callback("process.runtime.cpython.asyncio.loop_lag")
+                ],
+                unit="s",
+                description=(
+                    "Largest event loop lag since the previous collection"
+                ),
+            ),
+        ]
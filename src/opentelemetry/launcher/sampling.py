@@ -0,0 +1,478 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from itertools import count
+from logging import getLogger
+from threading import Lock
+from time import monotonic
+from typing import Mapping, Optional, Sequence
+
+from opentelemetry.context import Context
+from opentelemetry.sdk.trace.sampling import (
+    DEFAULT_ON,
+    Decision,
+    Sampler,
+    SamplingResult,
+    TraceIdRatioBased,
+)
+from opentelemetry.trace import Link, SpanKind, get_current_span
+from opentelemetry.trace.span import TraceState
+from opentelemetry.util.types import Attributes
+
+_logger = getLogger(__name__)
+
+# The ratio used to sample a root span is recorded in this attribute so that
+# span counts can be re-weighted in the backend.
+_ATTRIBUTE_SAMPLING_RATIO = "sampling.ratio"
+
+
+class AdaptiveSampler(Sampler):
+    """
+    Sampler that adjusts its trace id ratio to keep the rate of sampled spans
+    of the process near a budget
+
+    The rate of started spans is measured in windows of `window_seconds`
+    seconds. At the end of every window, the rate is smoothed with an
+    exponentially weighted moving average and the ratio is set to the budget
+    divided by that rate, never more than 1.
+
+    Spans with a valid parent follow the sampling decision of their parent.
+    Root spans are sampled with the current ratio, which is recorded in the
+    `sampling.ratio` attribute of the sampled ones.
+
+    Arguments:
+        spans_per_second (float): the budget of sampled spans per second.
+        window_seconds (float): the duration of the measuring window.
+        smoothing (float): the weight of the last window in the moving
+            average of the rate, between 0 and 1.
+    """
+
+    def __init__(
+        self,
+        spans_per_second: float,
+        window_seconds: float = 1.0,
+        smoothing: float = 0.5,
+    ):
+        if spans_per_second <= 0:
+            raise ValueError("spans_per_second must be positive.")
+        if window_seconds <= 0:
+            raise ValueError("window_seconds must be positive.")
+        if not 0 < smoothing <= 1:
+            raise ValueError("smoothing must be in range (0.0, 1.0].")
+
+        self._spans_per_second = spans_per_second
+        self._window_seconds = window_seconds
+        self._smoothing = smoothing
+        self._lock = Lock()
+        # next() on itertools.count is atomic, so starting spans never
+        # contend for the lock, only the adjustment at the end of each window
+        # does.
+        self._counter = count()
+        self._window_count = 0
+        self._window_start = monotonic()
+        self._window_end = self._window_start + window_seconds
+        self._rate = None
+        self._ratio = 1.0
+        self._bound = TraceIdRatioBased.get_bound_for_rate(self._ratio)
+
+    @property
+    def ratio(self) -> float:
+        return self._ratio
+
+    def _adjust(self, now: float):
+        current_count = next(self._counter)
+        window_rate = (current_count - self._window_count) / (
+            now - self._window_start
+        )
+
+        if self._rate is None:
+            self._rate = window_rate
+        else:
+            self._rate = (
+                self._smoothing * window_rate
+                + (1 - self._smoothing) * self._rate
+            )
+
+        if self._rate > self._spans_per_second:
+            ratio = self._spans_per_second / self._rate
+        else:
+            ratio = 1.0
+
+        if ratio != self._ratio:
+            _logger.debug(
+                "Span rate %.1f/s, adjusting sampling ratio to %s",
+                self._rate,
+                ratio,
+            )
+
+        self._ratio = ratio
+        self._bound = TraceIdRatioBased.get_bound_for_rate(ratio)
+        self._window_count = current_count
+        self._window_start = now
+        self._window_end = now + self._window_seconds
+
+    def should_sample(
+        self,
+        parent_context: Optional[Context],
+        trace_id: int,
+        name: str,
+        kind: SpanKind = None,
+        attributes: Attributes = None,
+        links: Sequence[Link] = None,
+        trace_state: TraceState = None,
+    ) -> SamplingResult:
+        next(self._counter)
+
+        now = monotonic()
+
+        if now >= self._window_end:
+            with self._lock:
+                if now >= self._window_end:
+                    self._adjust(now)
+
+        parent_span_context = get_current_span(
+            parent_context
+        ).get_span_context()
+
+        if parent_span_context.is_valid:
+            if parent_span_context.trace_flags.sampled:
+                decision = Decision.RECORD_AND_SAMPLE
+            else:
+                decision = Decision.DROP
+
+            return SamplingResult(
+                decision, None, parent_span_context.trace_state
+            )
+
+        ratio = self._ratio
+
+        if trace_id & TraceIdRatioBased.TRACE_ID_LIMIT < self._bound:
+            return SamplingResult(
+                Decision.RECORD_AND_SAMPLE,
+                {_ATTRIBUTE_SAMPLING_RATIO: ratio},
+            )
+
+        return SamplingResult(Decision.DROP)
+
+    def get_description(self) -> str:
+        return f"AdaptiveSampler{{{self._spans_per_second}}}"
+
+
+class RecordingSampler(Sampler):
+    """
+    Sampler that records the spans another sampler drops
+
+    Dropped spans are recorded without being sampled: span processors see
+    them end, the ones that export spans ignore them and the trace flags
+    propagated downstream stay unsampled. Meant for the span processors
+    that aggregate every span, like
+    `opentelemetry.launcher.span_metrics.SpanMetricsProcessor`.
+
+    Arguments:
+        sampler (Sampler): the sampler making the sampling decisions.
+    """
+
+    def __init__(self, sampler: Sampler):
+        self.sampler = sampler
+
+    def should_sample(
+        self,
+        parent_context: Optional[Context],
+        trace_id: int,
+        name: str,
+        kind: SpanKind = None,
+        attributes: Attributes = None,
+        links: Sequence[Link] = None,
+        trace_state: TraceState = None,
+    ) -> SamplingResult:
+        result = self.sampler.should_sample(
+            parent_context,
+            trace_id,
+            name,
+            kind=kind,
+            attributes=attributes,
+            links=links,
+            trace_state=trace_state,
+        )
+
+        if result.decision is Decision.DROP:
+            return SamplingResult(
+                Decision.RECORD_ONLY, None, result.trace_state
+            )
+
+        return result
+
+    def get_description(self) -> str:
+        return f"RecordingSampler{{{self.sampler.get_description()}}}"
+
+
+class _Matcher:
+    """
+    Rules matching a field of a span, as a bit mask of rule indices
+
+    A pattern ending with `*` matches the values starting with what
+    precedes it, other patterns match equal values only. Exact patterns are
+    looked up in a dictionary, prefixes in a trie, so that matching costs
+    one lookup plus one per character of the longest matching prefix,
+    whatever the number of rules.
+    """
+
+    def __init__(self):
+        self._exact = {}
+        # Nested dictionaries by character, the rules of the prefix ending
+        # at a node are under the None key.
+        self._trie = {}
+        # The rules that do not constrain this field.
+        self._any = 0
+
+    def add(self, bit: int, pattern: Optional[str]) -> None:
+        if pattern is None:
+            self._any |= bit
+        elif pattern.endswith("*"):
+            node = self._trie
+
+            for character in pattern[:-1]:
+                node = node.setdefault(character, {})
+
+            node[None] = node.get(None, 0) | bit
+        else:
+            self._exact[pattern] = self._exact.get(pattern, 0) | bit
+
+    def match(self, value) -> int:
+        mask = self._any
+
+        if value is None:
+            return mask
+
+        if not isinstance(value, str):
+            value = str(value)
+
+        mask |= self._exact.get(value, 0)
+        node = self._trie
+        mask |= node.get(None, 0)
+
+        for character in value:
+            node = node.get(character)
+
+            if node is None:
+                break
+
+            mask |= node.get(None, 0)
+
+        return mask
+
+
+class _SamplingRule:
+    def __init__(self, rule: Mapping):
+        unknown = set(rule) - {
+            "name",
+            "kind",
+            "attributes",
+            "ratio",
+            "spans_per_second",
+        }
+
+        if unknown:
+            raise ValueError(f"Unknown sampling rule keys: {sorted(unknown)}")
+
+        self.name = rule.get("name")
+        self.kind = rule.get("kind")
+        self.attributes = dict(rule.get("attributes") or {})
+        self.ratio = rule.get("ratio")
+        self.spans_per_second = rule.get("spans_per_second")
+
+        if self.kind is not None:
+            try:
+                self.kind = SpanKind[self.kind.upper()]
+            except KeyError as error:
+                raise ValueError(
+                    f"Invalid span kind in sampling rule: {self.kind}"
+                ) from error
+
+        if (self.ratio is None) == (self.spans_per_second is None):
+            raise ValueError(
+                "A sampling rule needs either a ratio or spans_per_second."
+            )
+
+        if self.ratio is not None:
+            if not 0 <= self.ratio <= 1:
+                raise ValueError("ratio must be in range [0.0, 1.0].")
+
+            self._bound = TraceIdRatioBased.get_bound_for_rate(self.ratio)
+        else:
+            if self.spans_per_second <= 0:
+                raise ValueError("spans_per_second must be positive.")
+
+            # A token bucket holding up to a second of spans.
+            self._lock = Lock()
+            self._tokens = self.spans_per_second
+            self._refilled = monotonic()
+
+    def sample(self, trace_id: int) -> bool:
+        if self.ratio is not None:
+            return trace_id & TraceIdRatioBased.TRACE_ID_LIMIT < self._bound
+
+        with self._lock:
+            now = monotonic()
+            self._tokens = min(
+                self._tokens + (now - self._refilled) * self.spans_per_second,
+                self.spans_per_second,
+            )
+            self._refilled = now
+
+            if self._tokens < 1:
+                return False
+
+            self._tokens -= 1
+            return True
+
+
+class RuleBasedSampler(Sampler):
+    """
+    Sampler that samples spans with the first rule they match
+
+    Every rule is a mapping with any of these keys, a span matches a rule if
+    it matches all of them:
+
+    - `name`: a pattern of the span name.
+    - `kind`: a span kind, like `"server"`.
+    - `attributes`: a mapping of attribute names to patterns of their
+      values, like `{"http.target": "/static/*"}`. Only the attributes set
+      when spans start are seen by samplers.
+
+    A pattern ending with `*` matches the values starting with the rest of
+    it, other patterns match equal values only. Every rule also has either a
+    `ratio` of traces to sample, recorded in the `sampling.ratio` attribute
+    of the sampled spans, or a number of `spans_per_second` to sample at
+    most.
+
+    The rules are compiled into a dictionary and a prefix trie per matched
+    field, a span is matched against all of them at once. Rules only apply
+    to root spans, spans with a parent, and spans that match no rule, are
+    sampled by `fallback`, which defaults to following the parent decision
+    and sampling root spans. A remote parent then decides for the spans of
+    this process like a local one, so that traces are not broken by
+    services sampling them differently, unless `override_remote_parent` is
+    `True`.
+
+    Arguments:
+        rules (Sequence[Mapping]): the sampling rules, in order.
+        fallback (Sampler): the sampler of the spans no rule applies to.
+        override_remote_parent (bool): if rules also apply to spans with a
+            remote parent, overriding the decision of the parent.
+
+    Raises:
+        ValueError: if a rule is invalid.
+    """
+
+    def __init__(
+        self,
+        rules: Sequence[Mapping],
+        fallback: Optional[Sampler] = None,
+        override_remote_parent: bool = False,
+    ):
+        self.fallback = fallback or DEFAULT_ON
+        self.override_remote_parent = override_remote_parent
+        self._rules = [_SamplingRule(rule) for rule in rules]
+        self._all = (1 << len(self._rules)) - 1
+        self._name = _Matcher()
+        self._kinds = dict.fromkeys(SpanKind, 0)
+        self._attributes = {}
+
+        for index, rule in enumerate(self._rules):
+            bit = 1 << index
+
+            self._name.add(bit, rule.name)
+
+            for kind in self._kinds:
+                if rule.kind is None or rule.kind is kind:
+                    self._kinds[kind] |= bit
+
+            for key in rule.attributes:
+                if key not in self._attributes:
+                    self._attributes[key] = _Matcher()
+
+        for index, rule in enumerate(self._rules):
+            for key, matcher in self._attributes.items():
+                matcher.add(1 << index, rule.attributes.get(key))
+
+    def _match(self, name, kind, attributes) -> Optional[_SamplingRule]:
+        mask = self._all & self._kinds[kind or SpanKind.INTERNAL]
+
+        if mask:
+            mask &= self._name.match(name)
+
+        for key, matcher in self._attributes.items():
+            if not mask:
+                return None
+
+            mask &= matcher.match(attributes.get(key) if attributes else None)
+
+        if not mask:
+            return None
+
+        # The lowest bit is the first rule that matched.
+        return self._rules[(mask & -mask).bit_length() - 1]
+
+    def should_sample(
+        self,
+        parent_context: Optional[Context],
+        trace_id: int,
+        name: str,
+        kind: SpanKind = None,
+        attributes: Attributes = None,
+        links: Sequence[Link] = None,
+        trace_state: TraceState = None,
+    ) -> SamplingResult:
+        parent_span_context = get_current_span(
+            parent_context
+        ).get_span_context()
+        rule = None
+
+        if not parent_span_context.is_valid or (
+            parent_span_context.is_remote and self.override_remote_parent
+        ):
+            rule = self._match(name, kind, attributes)
+
+        if rule is None:
+            return self.fallback.should_sample(
+                parent_context,
+                trace_id,
+                name,
+                kind=kind,
+                attributes=attributes,
+                links=links,
+                trace_state=trace_state,
+            )
+
+        if parent_span_context.is_valid:
+            trace_state = parent_span_context.trace_state
+
+        if not rule.sample(trace_id):
+            return SamplingResult(Decision.DROP, None, trace_state)
+
+        if rule.ratio is not None:
+            return SamplingResult(
+                Decision.RECORD_AND_SAMPLE,
+                {_ATTRIBUTE_SAMPLING_RATIO: rule.ratio},
+                trace_state,
+            )
+
+        return SamplingResult(Decision.RECORD_AND_SAMPLE, None, trace_state)
+
+    def get_description(self) -> str:
+        return (
+            f"RuleBasedSampler{{{len(self._rules)} rules,"
+            f"{self.fallback.get_description()}}}"
+        )
@@ -0,0 +1,277 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A single thread to export the spans and metrics of every pipeline
+
+`BatchSpanProcessor` and `PeriodicExportingMetricReader` each start a thread
+that wakes up on its own timer. The processor and reader here are driven by
+the timers of one shared `ExportScheduler` thread instead, which only wakes
+up when the earliest of them is due.
+"""
+
+from heapq import heappop, heappush
+from itertools import count
+from logging import getLogger
+from math import inf
+from os import register_at_fork
+from threading import Condition, Thread
+from time import monotonic, time_ns
+from typing import Callable, Optional
+from weakref import WeakMethod
+
+from opentelemetry.launcher.serverless import ServerlessSpanProcessor
+from opentelemetry.sdk.metrics.export import (
+    MetricExporter,
+    PeriodicExportingMetricReader,
+)
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.sdk.trace.export import SpanExporter
+
+_logger = getLogger(__name__)
+
+_DEFAULT_SCHEDULE_DELAY_MILLIS = 5000
+_DEFAULT_EXPORT_TIMEOUT_MILLIS = 30000
+_DEFAULT_EXPORT_INTERVAL_MILLIS = 60000
+# Timers due this close to the earliest one run in the same wakeup.
+_COALESCE_SECONDS = 0.05
+
+
+class _Timer:
+    """
+    A periodic task of an `ExportScheduler`
+    """
+
+    def __init__(self, scheduler, function: Callable[[], None], interval):
+        self._scheduler = scheduler
+        self.function = function
+        self.interval = interval
+        self.deadline = monotonic() + interval
+        self.cancelled = False
+
+    def run_soon(self) -> None:
+        """
+        Runs the task as soon as possible instead of at its deadline
+        """
+        # pylint: disable=protected-access
+        self._scheduler._reschedule(self, monotonic())
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+class ExportScheduler:
+    """
+    Runs periodic tasks in a single daemon thread
+
+    The timers are kept in a heap ordered by deadline, the thread sleeps
+    until the earliest one is due and runs the due tasks one after the
+    other. Timers due within `_COALESCE_SECONDS` of each other run in the
+    same wakeup. A slow task delays the others, the exporters driven by the
+    scheduler are meant to be built without retries. The thread is started
+    with the first timer and restarted in forked processes. The number of
+    times the thread woke up is available in `wakeups`.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._sequence = count()
+        self._condition = Condition()
+        self._thread = None
+        self._done = False
+        self.wakeups = 0
+
+        weak_reinit = WeakMethod(self._at_fork_reinit)
+        register_at_fork(after_in_child=lambda: weak_reinit()())
+
+    def _at_fork_reinit(self):
+        self._condition = Condition()
+        self._thread = None
+
+        if self._heap and not self._done:
+            self._start()
+
+    def _start(self):
+        self._thread = Thread(
+            name="OtelExportScheduler", target=self._run, daemon=True
+        )
+        self._thread.start()
+
+    def schedule(self, function: Callable[[], None], interval: float):
+        """
+        Runs `function` every `interval` seconds, the first time after
+        `interval` seconds
+
+        Returns:
+            A timer with a `cancel` method and a `run_soon` method that runs
+            the task without waiting for its deadline.
+        """
+        timer = _Timer(self, function, interval)
+
+        with self._condition:
+            if self._done:
+                raise RuntimeError("The scheduler is shut down.")
+
+            heappush(self._heap, (timer.deadline, next(self._sequence), timer))
+
+            if self._thread is None:
+                self._start()
+
+            self._condition.notify()
+
+        return timer
+
+    def _reschedule(self, timer: _Timer, deadline: float):
+        with self._condition:
+            if deadline < timer.deadline:
+                # The previous heap entry is skipped when it is popped since
+                # its deadline no longer matches the timer one.
+                timer.deadline = deadline
+                heappush(self._heap, (deadline, next(self._sequence), timer))
+                self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._done:
+                    if self._heap:
+                        timeout = self._heap[0][0] - monotonic()
+
+                        if timeout <= _COALESCE_SECONDS:
+                            break
+                    else:
+                        timeout = None
+
+                    self._condition.wait(timeout)
+                    self.wakeups += 1
+
+                if self._done:
+                    return
+
+                deadline, _, timer = heappop(self._heap)
+
+            if timer.cancelled or deadline != timer.deadline:
+                continue
+
+            try:
+                timer.function()
+            # pylint: disable=broad-except
+            except Exception:
+                _logger.exception("Exception in scheduled export")
+
+            with self._condition:
+                if not timer.cancelled:
+                    timer.deadline = monotonic() + timer.interval
+                    heappush(
+                        self._heap,
+                        (timer.deadline, next(self._sequence), timer),
+                    )
+
+    def shutdown(self) -> None:
+        """
+        Stops the thread, after the task it may be running
+        """
+        with self._condition:
+            self._done = True
+            self._condition.notify()
+
+        if self._thread is not None:
+            self._thread.join()
+
+
+class ScheduledSpanProcessor(ServerlessSpanProcessor):
+    """
+    Span processor that exports from the thread of an `ExportScheduler`
+
+    Spans are buffered like `BatchSpanProcessor` does, they are exported
+    every `schedule_delay_millis` milliseconds and as soon as
+    `max_export_batch_size` spans are buffered.
+    """
+
+    def __init__(
+        self,
+        span_exporter: SpanExporter,
+        scheduler: ExportScheduler,
+        schedule_delay_millis: float = _DEFAULT_SCHEDULE_DELAY_MILLIS,
+        export_timeout_millis: float = _DEFAULT_EXPORT_TIMEOUT_MILLIS,
+        **kwargs,
+    ):
+        super().__init__(span_exporter, **kwargs)
+        self.export_timeout_millis = export_timeout_millis
+        self._timer = scheduler.schedule(
+            self._export, schedule_delay_millis / 1e3
+        )
+
+    def _export(self):
+        self.force_flush(self.export_timeout_millis)
+
+    def on_end(self, span: ReadableSpan) -> None:
+        super().on_end(span)
+
+        # Only a full batch wakes the scheduler up. The batch may have
+        # filled while an export was running, so the queue can be longer.
+        if len(self.queue) >= self.max_export_batch_size:
+            self._timer.run_soon()
+
+    def shutdown(self) -> None:
+        self._timer.cancel()
+        self.force_flush(self.export_timeout_millis)
+        self._done = True
+        self.span_exporter.shutdown()
+
+
+class ScheduledMetricReader(PeriodicExportingMetricReader):
+    """
+    Metric reader that collects and exports metrics from the thread of an
+    `ExportScheduler` every `export_interval_millis` milliseconds
+    """
+
+    def __init__(
+        self,
+        exporter: MetricExporter,
+        scheduler: ExportScheduler,
+        export_interval_millis: Optional[float] = None,
+        export_timeout_millis: Optional[float] = None,
+    ):
+        # An infinite interval keeps the reader from starting its own thread.
+        super().__init__(
+            exporter,
+            export_interval_millis=inf,
+            export_timeout_millis=export_timeout_millis,
+        )
+
+        if export_interval_millis is None:
+            export_interval_millis = _DEFAULT_EXPORT_INTERVAL_MILLIS
+
+        self._timer = scheduler.schedule(
+            self._collect_and_export, export_interval_millis / 1e3
+        )
+
+    def _collect_and_export(self):
+        # Exports without retries do not outlast the timeout, see
+        # `_LightstepExporterMixin`.
+        if hasattr(self._exporter, "deadline_ns"):
+            self._exporter.deadline_ns = (
+                time_ns() + self._export_timeout_millis * 10**6
+            )
+
+        self.collect(timeout_millis=self._export_timeout_millis)
+
+    def shutdown(self, timeout_millis: float = 30_000, **kwargs) -> None:
+        self._timer.cancel()
+
+        if not self._shutdown:
+            self._collect_and_export()
+
+        super().shutdown(timeout_millis=timeout_millis, **kwargs)
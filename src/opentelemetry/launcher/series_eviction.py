@@ -0,0 +1,265 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Eviction of the metric series that are no longer updated
+
+The SDK keeps the aggregation of every attribute set an instrument ever
+recorded until the process exits. Series of rotated ids or removed routes
+accumulate in long running processes, cumulative ones in particular. The
+series that were not updated for a while are removed here, a series updated
+again afterwards starts over with a new start time.
+"""
+
+# FIXME: Accessing private attributes of the SDK metric storage here since
+# it has no API to remove series.
+# pylint: disable=protected-access
+
+from logging import getLogger
+from threading import Lock, local
+from time import monotonic, time_ns
+from typing import Iterable, Optional
+
+from opentelemetry.metrics import CallbackOptions, Observation
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics._internal._view_instrument_match import (
+    _ViewInstrumentMatch,
+)
+from opentelemetry.sdk.metrics.view import DefaultAggregation
+
+from .memory_budget import _SERIES_BYTES, MemoryBudget
+from .version import __version__
+
+_logger = getLogger(__name__)
+
+
+class _Series(dict):
+    """
+    Aggregations of a view by attribute set that tracks their updates
+
+    Measurements look up their aggregation with `[]`, which records the
+    attribute set as updated. An aggregation evicted between the check the
+    SDK makes for its existence and its lookup is created again. New series
+    are only added if the memory budget of `series_eviction` admits them,
+    the measurements of the others are dropped.
+    """
+
+    def __init__(
+        self,
+        view_instrument_match: _ViewInstrumentMatch,
+        series_eviction: "SeriesEviction",
+    ):
+        super().__init__(view_instrument_match._attributes_aggregation)
+        self._view_instrument_match = view_instrument_match
+        self._series_eviction = series_eviction
+        # The attribute set the memory budget just rejected in this thread.
+        self._rejected = local()
+        self.updated = set(self)
+        # Attribute set to the monotonic time it was last seen updated.
+        self.last_update = {}
+
+    def __getitem__(self, key):
+        self.updated.add(key)
+        return super().__getitem__(key)
+
+    def __setitem__(self, key, aggregation):
+        # Called by the SDK for new series only.
+        memory_budget = self._series_eviction.memory_budget
+
+        if memory_budget is not None and not super().__contains__(key):
+            if not memory_budget.admit("metric_series", size=_SERIES_BYTES):
+                self._rejected.key = key
+                return
+
+            self._series_eviction.series += 1
+
+        super().__setitem__(key, aggregation)
+
+    def __missing__(self, key):
+        match = self._view_instrument_match
+
+        if isinstance(match._view._aggregation, DefaultAggregation):
+            aggregation = match._instrument_class_aggregation[
+                match._instrument.__class__
+            ]
+        else:
+            aggregation = match._view._aggregation
+
+        # A new start time tells backends that cumulative values started
+        # over.
+        aggregation = aggregation._create_aggregation(
+            match._instrument, dict(key), time_ns()
+        )
+
+        if getattr(self._rejected, "key", None) == key:
+            self._rejected.key = None
+            # Aggregates the measurement of the rejected series to discard
+            # it.
+            return aggregation
+
+        with match._lock:
+            if not super().__contains__(key):
+                self[key] = aggregation
+
+            return self.get(key, aggregation)
+
+
+class SeriesEviction:
+    """
+    Removes the metric series not updated for `max_idle_seconds`
+
+    Every series of every instrument of `meter_provider` is checked when
+    metrics are collected, by the callback of the observable counter
+    `metric_series.evicted` that reports how many series were evicted. The
+    `metric_series.active` observable up-down counter reports how many are
+    kept. Eviction only happens between `start` and `stop`, and not at all
+    if `max_idle_seconds` is `None`.
+
+    With a `memory_budget`, the series are accounted in it and new series
+    of the instruments seen by a collection are only added if it admits
+    them.
+    """
+
+    def __init__(
+        self,
+        meter_provider: MeterProvider,
+        max_idle_seconds: Optional[float],
+    ):
+        self.max_idle_seconds = max_idle_seconds
+        self.evicted = 0
+        # Approximate number of series, counted again at every collection.
+        self.series = 0
+        self._memory_budget = None
+        self._meter_provider = meter_provider
+        self._lock = Lock()
+        self._active = 0
+        self._started = False
+
+        meter = meter_provider.get_meter(__name__, __version__)
+        meter.create_observable_counter(
+            "metric_series.evicted",
+            callbacks=[self._observe_evicted],
+            unit="{series}",
+            description="Metric series evicted for not being updated",
+        )
+        meter.create_observable_up_down_counter(
+            "metric_series.active",
+            callbacks=[self._observe_active],
+            unit="{series}",
+            description="Metric series kept in memory",
+        )
+
+    @property
+    def memory_budget(self) -> Optional[MemoryBudget]:
+        return self._memory_budget
+
+    @memory_budget.setter
+    def memory_budget(self, memory_budget: Optional[MemoryBudget]) -> None:
+        if memory_budget is not None:
+            memory_budget.register(self, "metric_series")
+
+        self._memory_budget = memory_budget
+
+    def memory_usage(self) -> int:
+        return self.series * _SERIES_BYTES
+
+    def start(self) -> None:
+        self._started = True
+
+    def stop(self) -> None:
+        self._started = False
+
+    def _view_instrument_matches(self):
+        measurement_consumer = self._meter_provider._measurement_consumer
+
+        for storage in tuple(measurement_consumer._reader_storages.values()):
+            with storage._lock:
+                matches = [
+                    match
+                    for view_instrument_matches in (
+                        storage._instrument_view_instrument_matches.values()
+                    )
+                    for match in view_instrument_matches
+                ]
+
+            yield from matches
+
+    def evict(self) -> int:
+        """
+        Evicts the series not updated for `max_idle_seconds`, returns how
+        many
+        """
+        now = monotonic()
+        evicted = 0
+        active = 0
+
+        with self._lock:
+            for match in self._view_instrument_matches():
+                with match._lock:
+                    series = match._attributes_aggregation
+
+                    if not isinstance(series, _Series):
+                        series = _Series(match, self)
+                        match._attributes_aggregation = series
+
+                    updated = series.updated
+                    series.updated = set()
+
+                    for key in updated:
+                        # Not the series the memory budget rejected.
+                        if key in series:
+                            series.last_update[key] = now
+
+                    for key in [
+                        key
+                        for key, last_update in series.last_update.items()
+                        if self.max_idle_seconds is not None
+                        and now - last_update > self.max_idle_seconds
+                    ]:
+                        del series.last_update[key]
+                        series.pop(key, None)
+                        evicted += 1
+                        # Series created from now on start after the
+                        # eviction, evicted ones included.
+                        match._start_time_unix_nano = time_ns()
+
+                    active += len(series)
+
+            self.evicted += evicted
+            self._active = active
+            self.series = active
+
+        if evicted:
+            _logger.debug("Evicted %s idle metric series", evicted)
+
+        return evicted
+
+    def _observe_evicted(
+        self, options: CallbackOptions
+    ) -> Iterable[Observation]:
+        if not self._started:
+            return []
+
+        self.evict()
+
+        return [Observation(self.evicted)]
+
+    def _observe_active(
+        self, options: CallbackOptions
+    ) -> Iterable[Observation]:
+        if not self._started:
+            return []
+
+        # Counted by the eviction that just happened in the same collection.
+        return [Observation(self._active)]
@@ -0,0 +1,314 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import deque
+from contextlib import ContextDecorator
+from logging import getLogger
+from threading import Lock
+from time import time_ns
+from typing import Optional
+
+from opentelemetry._logs import get_logger_provider
+from opentelemetry.context import (
+    _SUPPRESS_INSTRUMENTATION_KEY,
+    attach,
+    detach,
+    set_value,
+)
+from opentelemetry.metrics import get_meter_provider
+from opentelemetry.sdk._logs import LogData, LogRecordProcessor
+from opentelemetry.sdk._logs.export import LogExporter, LogExportResult
+from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+from opentelemetry.trace import get_tracer_provider
+
+_logger = getLogger(__name__)
+
+_DEFAULT_FLUSH_TIMEOUT_MILLIS = 1000
+_DEFAULT_MAX_QUEUE_SIZE = 2048
+_DEFAULT_MAX_EXPORT_BATCH_SIZE = 512
+
+_flush_timeout_millis = _DEFAULT_FLUSH_TIMEOUT_MILLIS
+
+
+def _set_flush_timeout_millis(flush_timeout_millis: int):
+    # pylint: disable=global-statement
+    global _flush_timeout_millis
+    _flush_timeout_millis = flush_timeout_millis
+
+
+def _export_queue(
+    queue, exporter, max_export_batch_size, timeout_millis, failure, unit
+) -> bool:
+    """
+    Exports the items of `queue` in batches until it is empty or the deadline
+    is reached, returns if it was emptied
+
+    The deadline is also handed to `exporter` if it supports it, so that a
+    single export does not outlast it. Items not exported before the deadline
+    stay in the queue.
+    """
+    deadline_ns = time_ns() + timeout_millis * 10**6
+
+    if hasattr(exporter, "deadline_ns"):
+        exporter.deadline_ns = deadline_ns
+
+    while queue:
+        if time_ns() >= deadline_ns:
+            _logger.warning(
+                "Timeout was exceeded in force_flush(), %s %s remain "
+                "buffered.",
+                len(queue),
+                unit,
+            )
+            return False
+
+        batch = []
+
+        while queue and len(batch) < max_export_batch_size:
+            batch.append(queue.pop())
+
+        token = attach(set_value(_SUPPRESS_INSTRUMENTATION_KEY, True))
+        try:
+            result = exporter.export(batch)
+        # pylint: disable=broad-except
+        except Exception:
+            _logger.exception("Exception while exporting %s.", unit)
+            result = failure
+        finally:
+            detach(token)
+
+        if result is failure:
+            return False
+
+    return True
+
+
+class ServerlessSpanProcessor(SpanProcessor):
+    """
+    Span processor that buffers ended spans in memory without any background
+    thread
+
+    Spans are only exported when `force_flush` is called, which is meant to
+    happen at the end of every invocation of a serverless function, when the
+    process is still allowed to use the CPU. If the queue is full, the oldest
+    spans are dropped.
+    """
+
+    def __init__(
+        self,
+        span_exporter: SpanExporter,
+        max_queue_size: int = _DEFAULT_MAX_QUEUE_SIZE,
+        max_export_batch_size: int = _DEFAULT_MAX_EXPORT_BATCH_SIZE,
+    ):
+        if max_export_batch_size > max_queue_size:
+            raise ValueError(
+                "max_export_batch_size must be less than or equal to "
+                "max_queue_size."
+            )
+
+        self.span_exporter = span_exporter
+        self.max_queue_size = max_queue_size
+        self.max_export_batch_size = max_export_batch_size
+        self.queue = deque([], max_queue_size)
+        self._export_lock = Lock()
+        self._spans_dropped = False
+        self._done = False
+
+    def on_end(self, span: ReadableSpan) -> None:
+        if self._done:
+            _logger.warning("Already shutdown, dropping span.")
+            return
+        if not span.context.trace_flags.sampled:
+            return
+
+        if len(self.queue) == self.max_queue_size:
+            if not self._spans_dropped:
+                _logger.warning("Queue is full, likely spans will be dropped.")
+                self._spans_dropped = True
+
+        self.queue.appendleft(span)
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        """
+        Exports the buffered spans in batches until the queue is empty or the
+        deadline is reached
+
+        Spans not exported before the deadline stay in the queue to be
+        exported in the next flush.
+        """
+        with self._export_lock:
+            return _export_queue(
+                self.queue,
+                self.span_exporter,
+                self.max_export_batch_size,
+                timeout_millis,
+                SpanExportResult.FAILURE,
+                "spans",
+            )
+
+    def shutdown(self) -> None:
+        self.force_flush(_flush_timeout_millis)
+        self._done = True
+        self.span_exporter.shutdown()
+
+
+class ServerlessLogRecordProcessor(LogRecordProcessor):
+    """
+    Log record processor that buffers emitted records in memory without any
+    background thread
+
+    The log records counterpart of `ServerlessSpanProcessor`, records are only
+    exported when `force_flush` is called. If the queue is full, the oldest
+    records are dropped.
+    """
+
+    def __init__(
+        self,
+        exporter: LogExporter,
+        max_queue_size: int = _DEFAULT_MAX_QUEUE_SIZE,
+        max_export_batch_size: int = _DEFAULT_MAX_EXPORT_BATCH_SIZE,
+    ):
+        if max_export_batch_size > max_queue_size:
+            raise ValueError(
+                "max_export_batch_size must be less than or equal to "
+                "max_queue_size."
+            )
+
+        self._exporter = exporter
+        self._max_export_batch_size = max_export_batch_size
+        self._queue = deque([], max_queue_size)
+        self._export_lock = Lock()
+        self._shutdown = False
+
+    def emit(self, log_data: LogData) -> None:
+        if self._shutdown:
+            return
+
+        self._queue.appendleft(log_data)
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        with self._export_lock:
+            return _export_queue(
+                self._queue,
+                self._exporter,
+                self._max_export_batch_size,
+                timeout_millis,
+                LogExportResult.FAILURE,
+                "log records",
+            )
+
+    def shutdown(self) -> None:
+        self.force_flush(_flush_timeout_millis)
+        self._shutdown = True
+        self._exporter.shutdown()
+
+
+def flush(timeout_millis: Optional[int] = None) -> bool:
+    """
+    Synchronously exports all buffered spans, metrics and log records
+
+    Spans are flushed first, then metrics are collected and exported and log
+    records are flushed with the time that remains before the deadline.
+
+    Arguments:
+        timeout_millis (int): the deadline in milliseconds for the whole flush.
+            Defaults to the value of `serverless_flush_timeout` passed to
+            `configure_opentelemetry`.
+
+    Returns:
+        `True` if everything was exported before the deadline, `False`
+        otherwise.
+    """
+
+    if timeout_millis is None:
+        timeout_millis = _flush_timeout_millis
+
+    deadline_ns = time_ns() + timeout_millis * 10**6
+    flushed = True
+
+    tracer_provider = get_tracer_provider()
+
+    if hasattr(tracer_provider, "force_flush"):
+        flushed = tracer_provider.force_flush(timeout_millis)
+
+    meter_provider = get_meter_provider()
+
+    if hasattr(meter_provider, "force_flush"):
+        remaining_millis = (deadline_ns - time_ns()) / 10**6
+
+        if remaining_millis <= 0:
+            _logger.warning("No time left to flush metrics.")
+            return False
+
+        try:
+            meter_provider.force_flush(timeout_millis=remaining_millis)
+        # pylint: disable=broad-except
+        except Exception:
+            _logger.exception("Unable to flush metrics")
+            flushed = False
+
+    logger_provider = get_logger_provider()
+
+    if hasattr(logger_provider, "force_flush"):
+        remaining_millis = (deadline_ns - time_ns()) / 10**6
+
+        if remaining_millis <= 0:
+            _logger.warning("No time left to flush logs.")
+            return False
+
+        flushed = (
+            logger_provider.force_flush(timeout_millis=remaining_millis)
+            and flushed
+        )
+
+    return flushed
+
+
+class flush_on_exit(ContextDecorator):
+    # pylint: disable=invalid-name
+    """
+    Flushes spans and metrics when a serverless invocation ends
+
+    Can be used as a decorator for the function handler:
+
+    .. code-block:: python
+
+        @flush_on_exit()
+        def handler(event, context):
+            ...
+
+    or as a context manager:
+
+    .. code-block:: python
+
+        def handler(event, context):
+            with flush_on_exit(timeout_millis=200):
+                ...
+
+    Arguments:
+        timeout_millis (int): the deadline in milliseconds for the flush.
+            Defaults to the value of `serverless_flush_timeout` passed to
+            `configure_opentelemetry`.
+    """
+
+    def __init__(self, timeout_millis: Optional[int] = None):
+        self._timeout_millis = timeout_millis
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        flush(self._timeout_millis)
+        return False
@@ -0,0 +1,235 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Request rate, error and duration metrics computed from every span
+
+Metrics derived from exported spans undercount when traces are sampled. The
+span processor here sees every span that ends, sampled or not, see
+`RecordingSampler`, and aggregates them in the thread that ends them with
+little more than a dictionary lookup. The aggregates are reported by the
+instruments of a meter when metrics are collected.
+"""
+
+from itertools import count
+from threading import Lock, local
+from typing import Iterable
+
+from opentelemetry.launcher.profiler import _is_profile
+from opentelemetry.metrics import CallbackOptions, MeterProvider, Observation
+from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor
+from opentelemetry.trace import StatusCode
+
+from .version import __version__
+
+_DEFAULT_STRIPES = 16
+_DEFAULT_MAX_SERIES = 1000
+# Durations waiting in a stripe to be recorded in the histogram.
+_MAX_PENDING_DURATIONS = 512
+# The span name of the series of spans ending once `max_series` series
+# exist.
+_OVERFLOW_SPAN_NAME = "_other"
+
+
+class _Stripe:
+    def __init__(self):
+        self.lock = Lock()
+        # Series to the number of spans that ended.
+        self.calls = {}
+        # Series and duration in milliseconds of the spans not yet recorded
+        # in the histogram.
+        self.durations = []
+
+
+class SpanMetricsProcessor(SpanProcessor):
+    """
+    Span processor that counts spans and measures their duration
+
+    Every ended span is counted in the `span.calls` counter and the
+    `span.errors` counter if its status is an error, and its duration in
+    milliseconds is recorded in the `span.duration` histogram. The series
+    are keyed by the `service.name` of the span resource, the `span.name`,
+    `span.kind` and `status.code` of the span. Once `max_series` series exist,
+    spans of new series are counted in a series with the `_other` span
+    name.
+
+    Spans are aggregated in stripes, each with its own lock, handed to the
+    threads in turn the first time they end a span, so that threads ending
+    spans at the same time rarely wait for one another. The counters are
+    observed when metrics are collected, durations are recorded in the
+    histogram then or once a stripe holds `_MAX_PENDING_DURATIONS` of them.
+
+    The instruments are created once per processor, spans are only
+    aggregated and reported between `start` and `stop`.
+    """
+
+    def __init__(
+        self,
+        meter_provider: MeterProvider,
+        stripes: int = _DEFAULT_STRIPES,
+        max_series: int = _DEFAULT_MAX_SERIES,
+    ):
+        self._stripes = [_Stripe() for _ in range(stripes)]
+        # Thread identifiers are aligned addresses on most platforms, so the
+        # stripe of each thread is picked round-robin rather than from it.
+        self._next_stripe = count()
+        self._local = local()
+        self._max_series = max_series
+        self._series = set()
+        self._series_lock = Lock()
+        # The calls observed by the last collection.
+        self._calls = {}
+        self._started = False
+
+        meter = meter_provider.get_meter(__name__, __version__)
+        # Called first at every collection, the histogram then gets the
+        # pending durations before it is collected.
+        meter.create_observable_counter(
+            "span.calls",
+            callbacks=[self._observe_calls],
+            unit="{span}",
+            description="Ended spans",
+        )
+        meter.create_observable_counter(
+            "span.errors",
+            callbacks=[self._observe_errors],
+            unit="{span}",
+            description="Ended spans with an error status",
+        )
+        self._duration = meter.create_histogram(
+            "span.duration",
+            unit="ms",
+            description="Duration of the ended spans",
+        )
+
+    def _key(self, span: ReadableSpan) -> tuple:
+        key = (
+            span.resource.attributes.get("service.name"),
+            span.name,
+            span.kind.name,
+            span.status.status_code.name,
+        )
+
+        if key in self._series:
+            return key
+
+        with self._series_lock:
+            if len(self._series) < self._max_series:
+                self._series.add(key)
+                return key
+
+        return (key[0], _OVERFLOW_SPAN_NAME, key[2], key[3])
+
+    def start(self) -> None:
+        self._started = True
+
+    def stop(self) -> None:
+        self._started = False
+
+    def on_end(self, span: ReadableSpan) -> None:
+        if not self._started or _is_profile(span):
+            return
+
+        key = self._key(span)
+        duration = (span.end_time - span.start_time) / 1e6
+        stripe = getattr(self._local, "stripe", None)
+
+        if stripe is None:
+            stripe = self._stripes[
+                next(self._next_stripe) % len(self._stripes)
+            ]
+            self._local.stripe = stripe
+
+        with stripe.lock:
+            stripe.calls[key] = stripe.calls.get(key, 0) + 1
+            stripe.durations.append((key, duration))
+
+            if len(stripe.durations) < _MAX_PENDING_DURATIONS:
+                return
+
+            durations = stripe.durations
+            stripe.durations = []
+
+        self._record(durations)
+
+    @staticmethod
+    def _attributes(key: tuple) -> dict:
+        service_name, span_name, span_kind, status_code = key
+        attributes = {
+            "span.name": span_name,
+            "span.kind": span_kind,
+            "status.code": status_code,
+        }
+
+        if service_name is not None:
+            attributes["service.name"] = service_name
+
+        return attributes
+
+    def _record(self, durations) -> None:
+        attributes = {}
+
+        for key, duration in durations:
+            if key not in attributes:
+                attributes[key] = self._attributes(key)
+
+            self._duration.record(duration, attributes[key])
+
+    def _flush(self) -> dict:
+        # Records the pending durations and returns the number of calls of
+        # every series.
+        calls = {}
+
+        for stripe in self._stripes:
+            with stripe.lock:
+                durations = stripe.durations
+                stripe.durations = []
+
+                for key, count in stripe.calls.items():
+                    calls[key] = calls.get(key, 0) + count
+
+            self._record(durations)
+
+        return calls
+
+    def _observe_calls(
+        self, options: CallbackOptions
+    ) -> Iterable[Observation]:
+        if not self._started:
+            self._calls = {}
+            return []
+
+        self._calls = self._flush()
+
+        return [
+            Observation(count, self._attributes(key))
+            for key, count in self._calls.items()
+        ]
+
+    def _observe_errors(
+        self, options: CallbackOptions
+    ) -> Iterable[Observation]:
+        # Observed right after the calls, by the same collection.
+        return [
+            Observation(count, self._attributes(key))
+            for key, count in self._calls.items()
+            if key[3] == StatusCode.ERROR.name
+        ]
+
+    def shutdown(self) -> None:
+        self._flush()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        self._flush()
+        return True
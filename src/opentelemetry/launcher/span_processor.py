@@ -0,0 +1,322 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import OrderedDict
+from heapq import heappop, heappush, heapreplace
+from itertools import count
+from logging import getLogger
+from threading import Lock
+from typing import Iterable, Optional
+
+from opentelemetry.attributes import BoundedAttributes
+from opentelemetry.launcher._encoding import _EncodedSpan
+from opentelemetry.launcher.profiler import _is_profile
+from opentelemetry.sdk.trace import ReadableSpan, Span, SpanProcessor
+from opentelemetry.sdk.trace.export import BatchSpanProcessor
+from opentelemetry.trace import StatusCode
+
+_logger = getLogger(__name__)
+
+_ERROR = "error"
+_ROOT = "root"
+_OTHER = "other"
+
+# Higher ranks are more valuable and are evicted last.
+_RANKS = {_OTHER: 0, _ROOT: 1, _ERROR: 2}
+
+# Attributes whose values are taken from a small set, like methods, routes,
+# user agents and addresses, their values are interned along with the keys.
+_LOW_CARDINALITY_KEYS = frozenset(
+    (
+        "http.method",
+        "http.scheme",
+        "http.flavor",
+        "http.route",
+        "http.host",
+        "http.server_name",
+        "http.status_text",
+        "http.user_agent",
+        "net.host.name",
+        "net.peer.name",
+        "net.peer.ip",
+        "net.sock.peer.addr",
+        "net.transport",
+        "db.system",
+        "db.name",
+        "db.operation",
+        "db.sql.table",
+        "rpc.system",
+        "rpc.service",
+        "rpc.method",
+        "messaging.system",
+        "messaging.destination",
+        "messaging.operation",
+        "exception.type",
+    )
+)
+# Longer strings are unlikely to repeat and are never interned.
+_MAX_INTERNED_LENGTH = 256
+
+
+def _priority_class(span: ReadableSpan) -> str:
+    if span.status.status_code is StatusCode.ERROR:
+        return _ERROR
+    if span.parent is None or span.parent.is_remote:
+        return _ROOT
+    return _OTHER
+
+
+class _SpanPriorityQueue:
+    """
+    Bounded min-heap of spans ordered by value
+
+    Implements the subset of the `collections.deque` interface that
+    `BatchSpanProcessor` uses. When full, inserting a span evicts the least
+    valuable span, which may be the inserted one. Spans are ranked by class
+    (errors, then local roots, then everything else) and then by duration.
+    `pop` returns the least valuable span so that the most valuable ones stay
+    queued the longest when the exporter can't keep up.
+    """
+
+    def __init__(self, maxlen: int):
+        self.maxlen = maxlen
+        self.dropped = {_ERROR: 0, _ROOT: 0, _OTHER: 0}
+        self._heap = []
+        self._counter = count()
+        self._lock = Lock()
+
+    def appendleft(self, span: ReadableSpan):
+        priority_class = _priority_class(span)
+        # The counter makes the entries unique so that spans are never
+        # compared.
+        entry = (
+            _RANKS[priority_class],
+            span.end_time - span.start_time,
+            next(self._counter),
+            span,
+            priority_class,
+        )
+
+        with self._lock:
+            if len(self._heap) < self.maxlen:
+                heappush(self._heap, entry)
+                return
+
+            if entry < self._heap[0]:
+                self.dropped[priority_class] += 1
+                return
+
+            evicted = heapreplace(self._heap, entry)
+            self.dropped[evicted[4]] += 1
+
+    def pop(self) -> ReadableSpan:
+        with self._lock:
+            return heappop(self._heap)[3]
+
+    def clear(self):
+        with self._lock:
+            self._heap.clear()
+
+    def __len__(self):
+        return len(self._heap)
+
+
+class PrioritySpanProcessor(BatchSpanProcessor):
+    """
+    Batch span processor that evicts the least valuable spans first when its
+    queue is full
+
+    Error spans are kept over local root spans, which are kept over the rest.
+    Within each class, longer spans are kept over shorter ones. Inserting a
+    span is O(log n). The number of dropped spans by class is available in
+    `dropped_spans` and is logged when the processor is shut down.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The worker thread only looks up self.queue when it is notified or
+        # its timer expires, replacing the queue right after it was started
+        # is safe since no span has been queued yet.
+        # Kept apart since self.queue may be wrapped, see
+        # budget_span_processor.
+        self._priority_queue = _SpanPriorityQueue(self.max_queue_size)
+        self.queue = self._priority_queue
+
+    @property
+    def dropped_spans(self) -> dict:
+        return dict(self._priority_queue.dropped)
+
+    def _at_fork_reinit(self):
+        # The parent may have forked while a thread held the lock of the
+        # queue, which the base class clears.
+        # pylint: disable=protected-access
+        self._priority_queue._lock = Lock()
+        super()._at_fork_reinit()
+        self._priority_queue.dropped = dict.fromkeys(
+            self._priority_queue.dropped, 0
+        )
+
+    def shutdown(self) -> None:
+        super().shutdown()
+
+        dropped = self._priority_queue.dropped
+
+        if any(dropped.values()):
+            _logger.warning(
+                "Spans dropped because the queue was full: %s",
+                ", ".join(
+                    f"{priority_class}={count}"
+                    for priority_class, count in dropped.items()
+                ),
+            )
+
+
+class CompactSpanProcessor(BatchSpanProcessor):
+    """
+    Batch span processor that queues spans encoded as OTLP protobuf bytes
+
+    Every sampled span is encoded when it ends, so the queue holds a few
+    hundred bytes per span instead of the whole `ReadableSpan` object graph.
+    Encoding happens in the thread that ends the span. Must be used with
+    `LightstepOTLPSpanExporter`, which concatenates the encoded spans into
+    export requests.
+    """
+
+    def on_end(self, span: ReadableSpan) -> None:
+        if self.done or not span.context.trace_flags.sampled:
+            super().on_end(span)
+            return
+
+        super().on_end(_EncodedSpan(span))
+
+
+class _InternTable:
+    """
+    Bounded table of canonical strings with least recently used eviction
+
+    Unlike `sys.intern`, the table only keeps `maxsize` strings alive, so
+    strings that stop repeating are eventually released.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self.evictions = 0
+        self._strings = OrderedDict()
+
+    def intern(self, string: str) -> str:
+        """
+        Returns the string of the table equal to `string`, adding it if
+        there is none
+
+        Not thread safe, callers hold a lock.
+        """
+        interned = self._strings.get(string)
+
+        if interned is not None:
+            self._strings.move_to_end(string)
+            return interned
+
+        if len(string) > _MAX_INTERNED_LENGTH:
+            return string
+
+        self._strings[string] = string
+
+        if len(self._strings) > self.maxsize:
+            self._strings.popitem(last=False)
+            self.evictions += 1
+
+        return string
+
+    def __len__(self):
+        return len(self._strings)
+
+
+class InterningSpanProcessor(SpanProcessor):
+    """
+    Span processor that deduplicates the strings held by spans
+
+    Span names, attribute keys, event names and the values of low
+    cardinality attributes are replaced with equal strings from a bounded
+    intern table, so that the spans waiting in the queues of the processors
+    share one copy of each instead of a copy per span. Span names are
+    interned when spans start, everything else when they end. The values of
+    the attributes in `keys` are interned in addition to the values of the
+    semantic convention attributes listed in `_LOW_CARDINALITY_KEYS`.
+
+    The spans are changed in place, this processor is meant to be added
+    before the processors that queue or encode spans.
+    """
+
+    def __init__(
+        self, maxsize: int = 4096, keys: Optional[Iterable[str]] = None
+    ):
+        self._table = _InternTable(maxsize)
+        self._keys = _LOW_CARDINALITY_KEYS.union(keys or ())
+        self._lock = Lock()
+
+    @property
+    def evictions(self) -> int:
+        return self._table.evictions
+
+    def on_start(self, span: Span, parent_context=None) -> None:
+        # pylint: disable=protected-access
+        with self._lock:
+            span._name = self._table.intern(span._name)
+
+    def _intern_attributes(self, attributes):
+        # pylint: disable=protected-access
+        intern = self._table.intern
+        keys = self._keys
+        items = attributes._dict
+        rebuild = False
+
+        for key, value in tuple(items.items()):
+            if intern(key) is not key:
+                rebuild = True
+
+            if key in keys and value.__class__ is str:
+                items[key] = intern(value)
+
+        # The keys set by instrumentations are usually constants, already
+        # the interned strings. Dictionaries keep the first key object
+        # inserted for a key, the mapping has to be rebuilt to replace one.
+        if rebuild:
+            attributes._dict = OrderedDict(
+                (intern(key), value) for key, value in items.items()
+            )
+
+    def on_end(self, span: ReadableSpan) -> None:
+        # Profiles are neither numerous nor alike.
+        if _is_profile(span):
+            return
+
+        # pylint: disable=protected-access
+        with self._lock:
+            span._name = self._table.intern(span._name)
+
+            if isinstance(span._attributes, BoundedAttributes):
+                self._intern_attributes(span._attributes)
+
+            for event in span._events:
+                event._name = self._table.intern(event._name)
+
+                if isinstance(event._attributes, BoundedAttributes):
+                    self._intern_attributes(event._attributes)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._table = _InternTable(self._table.maxsize)
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
@@ -12,19 +12,24 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from logging import getLogger
-
 from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import (
     OTLPSpanExporter,
 )
+from opentelemetry.launcher._encoding import (
+    _encode_request,
+    _EncodedSpan,
+    _TraceServiceStub,
+)
+from opentelemetry.launcher._exporter import _LightstepExporterMixin
 
-_logger = getLogger(__name__)
 
+class LightstepOTLPSpanExporter(_LightstepExporterMixin, OTLPSpanExporter):
+    _stub_class = _TraceServiceStub
+    _unit = "spans"
 
-class LightstepOTLPSpanExporter(OTLPSpanExporter):
-    def export(self, *args, **kwargs):
-        try:
-            super().export(*args, **kwargs)
-        except Exception as error:
-            _logger.exception("Unable to export spans to satellite: %s", error)
-            raise
+    def _translate_data(self, data):
+        # Spans queued by CompactSpanProcessor are already encoded, they are
+        # only concatenated into a request.
+        if data and isinstance(data[0], _EncodedSpan):
+            return _encode_request(data)
+        return super()._translate_data(data)
@@ -0,0 +1,120 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import sleep
+
+from grpc import server
+
+from opentelemetry.proto.collector.logs.v1.logs_service_pb2 import (
+    ExportLogsServiceResponse,
+)
+from opentelemetry.proto.collector.logs.v1.logs_service_pb2_grpc import (
+    LogsServiceServicer,
+    add_LogsServiceServicer_to_server,
+)
+from opentelemetry.proto.collector.metrics.v1.metrics_service_pb2 import (
+    ExportMetricsServiceResponse,
+)
+from opentelemetry.proto.collector.metrics.v1.metrics_service_pb2_grpc import (
+    MetricsServiceServicer,
+    add_MetricsServiceServicer_to_server,
+)
+from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import (
+    ExportTraceServiceResponse,
+)
+from opentelemetry.proto.collector.trace.v1.trace_service_pb2_grpc import (
+    TraceServiceServicer,
+    add_TraceServiceServicer_to_server,
+)
+
+
+class Receiver(
+    TraceServiceServicer, MetricsServiceServicer, LogsServiceServicer
+):
+    """
+    Local stand-in for a Lightstep satellite
+
+    Stores every received export request and its metadata. A latency in seconds can be
+    injected to simulate a slow satellite, and a gRPC status code to fail
+    every request with.
+    """
+
+    def __init__(self, latency=0, status_code=None):
+        self.latency = latency
+        self.status_code = status_code
+        self.trace_requests = []
+        self.metrics_requests = []
+        self.logs_requests = []
+        self.metadata = []
+        self._lock = Lock()
+        self._server = server(ThreadPoolExecutor(max_workers=4))
+        add_TraceServiceServicer_to_server(self, self._server)
+        add_MetricsServiceServicer_to_server(self, self._server)
+        add_LogsServiceServicer_to_server(self, self._server)
+        self.port = self._server.add_insecure_port("localhost:0")
+
+    @property
+    def endpoint(self):
+        return f"http://localhost:{self.port}"
+
+    @property
+    def spans(self):
+        with self._lock:
+            return [
+                span
+                for request in self.trace_requests
+                for resource_spans in request.resource_spans
+                for scope_spans in resource_spans.scope_spans
+                for span in scope_spans.spans
+            ]
+
+    @property
+    def log_records(self):
+        with self._lock:
+            return [
+                log_record
+                for request in self.logs_requests
+                for resource_logs in request.resource_logs
+                for scope_logs in resource_logs.scope_logs
+                for log_record in scope_logs.log_records
+            ]
+
+    def Export(self, request, context):
+        sleep(self.latency)
+
+        if self.status_code is not None:
+            context.abort(self.status_code, "Rejected by the receiver")
+
+        with self._lock:
+            self.metadata.append(dict(context.invocation_metadata()))
+
+            if hasattr(request, "resource_spans"):
+                self.trace_requests.append(request)
+                return ExportTraceServiceResponse()
+
+            if hasattr(request, "resource_logs"):
+                self.logs_requests.append(request)
+                return ExportLogsServiceResponse()
+
+            self.metrics_requests.append(request)
+            return ExportMetricsServiceResponse()
+
+    def __enter__(self):
+        self._server.start()
+        return self
+
+    def __exit__(self, *args):
+        self._server.stop(None)
@@ -0,0 +1,230 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from glob import glob
+from os.path import join
+from tempfile import TemporaryDirectory
+from threading import Timer
+from unittest import TestCase
+from unittest.mock import patch
+
+from grpc import StatusCode
+from receiver import Receiver
+
+from opentelemetry import metrics, trace
+from opentelemetry.launcher.capture import (
+    METRICS,
+    TRACES,
+    CaptureSpanExporter,
+    SegmentWriter,
+    read_segments,
+)
+from opentelemetry.launcher.configuration import configure_opentelemetry
+from opentelemetry.launcher.replay import main, replay
+from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import (
+    ExportTraceServiceRequest,
+)
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.trace import Once
+
+
+class TestCapture(TestCase):
+    def setUp(self):
+        trace._TRACER_PROVIDER_SET_ONCE = Once()
+        trace._TRACER_PROVIDER = None
+        metrics._internal._METER_PROVIDER_SET_ONCE = Once()
+        metrics._internal._METER_PROVIDER = None
+
+        self.directory = TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _capture_spans(self, names, segment_max_bytes=1024):
+        writer = SegmentWriter(
+            self.directory.name, segment_max_bytes=segment_max_bytes
+        )
+        exporter = CaptureSpanExporter(writer)
+        provider = TracerProvider(shutdown_on_exit=False)
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+        tracer = provider.get_tracer(__name__)
+
+        for name in names:
+            with tracer.start_as_current_span(name):
+                pass
+
+        provider.shutdown()
+
+        return sorted(glob(join(self.directory.name, "*.otlp")))
+
+    def test_segments(self):
+        names = [f"span_{index}" for index in range(20)]
+        paths = self._capture_spans(names)
+
+        self.assertGreater(len(paths), 1)
+
+        records = list(read_segments(paths))
+
+        self.assertEqual({signal for signal, _ in records}, {TRACES})
+        self.assertEqual(
+            [
+                ExportTraceServiceRequest.FromString(request)
+                .resource_spans[0]
+                .scope_spans[0]
+                .spans[0]
+                .name
+                for _, request in records
+            ],
+            names,
+        )
+
+    def test_truncated_segment(self):
+        (path,) = self._capture_spans(["span_0", "span_1"], 1 << 20)
+
+        with open(path, "rb+") as segment:
+            segment.truncate(segment.seek(0, 2) - 1)
+
+        with self.assertLogs(level="WARNING"):
+            self.assertEqual(len(list(read_segments([path]))), 1)
+
+    def test_corrupt_segment(self):
+        (path,) = self._capture_spans(["span_0", "span_1"], 1 << 20)
+
+        size = len(next(read_segments([path]))[1])
+
+        with open(path, "rb+") as segment:
+            # The signal of the second record.
+            segment.seek(5 + size)
+            segment.write(b"X")
+
+        with self.assertLogs(level="WARNING") as logs:
+            self.assertEqual(len(list(read_segments([path]))), 1)
+
+        self.assertIn(
+            f"corrupt segment {path} from offset {5 + size}", logs.output[0]
+        )
+
+    def test_replay(self):
+        names = [f"span_{index}" for index in range(20)]
+        paths = self._capture_spans(names)
+
+        with Receiver() as receiver:
+            statistics = replay(
+                paths, receiver.endpoint, max_batch_bytes=1000, concurrency=2
+            )
+
+            # Spans are merged into fewer requests, in order
+            self.assertEqual(statistics["failed_requests"], 0)
+            self.assertEqual(
+                len(receiver.trace_requests), statistics["requests"]
+            )
+            self.assertLess(statistics["requests"], len(names))
+            self.assertEqual(
+                sorted(span.name for span in receiver.spans), sorted(names)
+            )
+
+    def test_replay_retry(self):
+        paths = self._capture_spans(["span_0"])
+
+        with Receiver(status_code=StatusCode.UNAVAILABLE) as receiver:
+            # The request is retried after a second.
+            recovery = Timer(0.5, setattr, (receiver, "status_code", None))
+            recovery.start()
+            statistics = replay(paths, receiver.endpoint, max_retries=1)
+            recovery.join()
+
+            self.assertEqual(statistics["failed_requests"], 0)
+            self.assertNotIn("resume_path", statistics)
+            self.assertEqual(
+                [span.name for span in receiver.spans], ["span_0"]
+            )
+
+    def test_replay_resume(self):
+        names = [f"span_{index}" for index in range(20)]
+        paths = self._capture_spans(names)
+
+        with Receiver(status_code=StatusCode.UNAUTHENTICATED) as receiver:
+            statistics = replay(paths[1:], receiver.endpoint, concurrency=1)
+
+        # Not retried, and no other request is sent.
+        self.assertEqual(statistics["requests"], 1)
+        self.assertEqual(statistics["failed_requests"], 1)
+        self.assertEqual(statistics["resume_path"], paths[1])
+        self.assertEqual(statistics["resume_offset"], 0)
+        self.assertEqual(statistics["resume_paths"], paths[1:])
+
+        with Receiver() as receiver:
+            main(
+                [
+                    "--endpoint",
+                    receiver.endpoint,
+                    "--offset",
+                    str(len(next(read_segments(paths[:1]))[1]) + 5),
+                    *paths,
+                ]
+            )
+
+            self.assertEqual(
+                sorted(span.name for span in receiver.spans),
+                sorted(names[1:]),
+            )
+
+    @patch("opentelemetry.launcher.replay.sleep")
+    def test_replay_rate_limit(self, mock_sleep):
+        paths = self._capture_spans(["span_0", "span_1", "span_2"])
+
+        with Receiver() as receiver:
+            main(
+                [
+                    "--endpoint",
+                    receiver.endpoint,
+                    "--max-batch-bytes",
+                    "1",
+                    "--requests-per-second",
+                    "0.5",
+                    *paths,
+                ]
+            )
+
+            self.assertEqual(len(receiver.trace_requests), 3)
+
+        # sleep is mocked, so the second request is late by 2 seconds
+        # when the third one is sent.
+        self.assertEqual(
+            [round(call[0][0]) for call in mock_sleep.call_args_list], [2, 4]
+        )
+
+    def test_configure_capture(self):
+        configure_opentelemetry(
+            service_name="service_name",
+            metrics_enabled=True,
+            capture_directory=self.directory.name,
+        )
+
+        with trace.get_tracer(__name__).start_as_current_span("span"):
+            pass
+
+        metrics.get_meter(__name__).create_counter("counter").add(1)
+
+        trace.get_tracer_provider().shutdown()
+        metrics.get_meter_provider().shutdown()
+
+        records = list(
+            read_segments(glob(join(self.directory.name, "*.otlp")))
+        )
+
+        self.assertEqual(
+            sorted(signal for signal, _ in records), [METRICS, TRACES]
+        )
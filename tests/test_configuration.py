@@ -74,7 +74,8 @@ class TestConfiguration(TestCase):
                 ObservableCounter: AggregationTemporality.CUMULATIVE,
                 ObservableUpDownCounter: AggregationTemporality.CUMULATIVE,
                 ObservableGauge: AggregationTemporality.CUMULATIVE,
-            }
+            },
+            retry=True,
         )
 
     @patch("opentelemetry.launcher.configuration.CompositePropagator")
@@ -184,6 +185,7 @@ class TestConfiguration(TestCase):
             endpoint="https://ingest.lightstep.com:443",
             credentials=ANY,
             headers=(("lightstep-access-token", "a" * 104),),
+            retry=True,
         )
 
     def test_log_level_good_debug(self):
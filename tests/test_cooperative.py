@@ -0,0 +1,223 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest.mock import patch
+
+from opentelemetry import metrics, trace
+from opentelemetry.launcher import configuration
+from opentelemetry.launcher.cooperative import (
+    CooperativeSpanExporter,
+    _http_endpoint,
+    monkey_patching,
+)
+from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import (
+    ExportTraceServiceRequest,
+)
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SpanExportResult
+from opentelemetry.trace import Once
+
+
+class _HTTPReceiver(ThreadingHTTPServer):
+    # Local stand-in for an OTLP/HTTP satellite.
+    def __init__(self, status=200):
+        self.requests = []
+
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                receiver.requests.append((self.path, self.headers, body))
+                self.send_response(status)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        super().__init__(("localhost", 0), Handler)
+        self.endpoint = f"http://localhost:{self.server_address[1]}"
+
+    def __enter__(self):
+        Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+
+def _patched(name):
+    # A module of a library that monkey patched the socket module.
+    if name == "gevent.monkey":
+        return SimpleNamespace(is_module_patched=lambda module: True)
+    return SimpleNamespace(is_monkey_patched=lambda module: True)
+
+
+class TestCooperative(TestCase):
+    def setUp(self):
+        trace._TRACER_PROVIDER_SET_ONCE = Once()
+        trace._TRACER_PROVIDER = None
+        metrics._internal._METER_PROVIDER_SET_ONCE = Once()
+        metrics._internal._METER_PROVIDER = None
+        configuration._installed_components.clear()
+
+    def tearDown(self):
+        for provider in [
+            configuration._installed_components.get(
+                "OTEL_PYTHON_TRACER_PROVIDER"
+            ),
+            configuration._installed_components.get("meter_provider"),
+        ]:
+            if provider is not None:
+                provider.shutdown()
+
+        if "scheduler" in configuration._installed_components:
+            configuration._installed_components["scheduler"].shutdown()
+
+        configuration._installed_components.clear()
+
+    def test_monkey_patching(self):
+        self.assertIsNone(monkey_patching())
+
+        for library, module in [
+            ("gevent", "gevent.monkey"),
+            ("eventlet", "eventlet.patcher"),
+        ]:
+            with patch.dict("sys.modules", {module: _patched(module)}):
+                self.assertEqual(monkey_patching(), library)
+
+    def test_http_endpoint(self):
+        self.assertEqual(
+            _http_endpoint("https://ingest.lightstep.com:443", "traces"),
+            "https://ingest.lightstep.com:443/traces/otlp/v0.9",
+        )
+        self.assertEqual(
+            _http_endpoint("http://localhost:4318", "metrics"),
+            "http://localhost:4318/v1/metrics",
+        )
+        self.assertEqual(
+            _http_endpoint("https://satellite/otlp/traces", "traces"),
+            "https://satellite/otlp/traces",
+        )
+        # Without a scheme.
+        self.assertEqual(
+            _http_endpoint("localhost:4318", "traces", insecure=True),
+            "http://localhost:4318/v1/traces",
+        )
+        self.assertEqual(
+            _http_endpoint("satellite:443", "metrics"),
+            "https://satellite:443/v1/metrics",
+        )
+
+        for endpoint in ["grpc://localhost:4317", "http://:4318", ""]:
+            with self.assertRaises(ValueError):
+                _http_endpoint(endpoint, "traces")
+
+    def test_export(self):
+        with _HTTPReceiver() as receiver:
+            configuration.configure_opentelemetry(
+                service_name="service_name",
+                access_token="a" * 32,
+                span_exporter_endpoint=receiver.endpoint,
+                metrics_exporter_endpoint=receiver.endpoint,
+                metrics_enabled=True,
+                cooperative=True,
+            )
+
+            with trace.get_tracer(__name__).start_as_current_span("span"):
+                pass
+
+            trace.get_tracer_provider().shutdown()
+
+            path, headers, body = receiver.requests[0]
+
+            self.assertEqual(path, "/v1/traces")
+            self.assertEqual(headers["lightstep-access-token"], "a" * 32)
+            self.assertEqual(
+                ExportTraceServiceRequest.FromString(body)
+                .resource_spans[0]
+                .scope_spans[0]
+                .spans[0]
+                .name,
+                "span",
+            )
+
+    def test_no_retry(self):
+        provider = TracerProvider(shutdown_on_exit=False)
+        span = provider.get_tracer(__name__).start_span("span")
+        span.end()
+
+        with _HTTPReceiver(status=503) as receiver:
+            exporter = CooperativeSpanExporter(receiver.endpoint, retry=False)
+
+            self.assertEqual(exporter.export([span]), SpanExportResult.FAILURE)
+            self.assertEqual(len(receiver.requests), 1)
+
+            exporter.shutdown()
+
+    def test_scheme_less_endpoint(self):
+        with _HTTPReceiver() as receiver:
+            configuration.configure_opentelemetry(
+                service_name="service_name",
+                access_token="a" * 32,
+                span_exporter_endpoint=receiver.endpoint[len("http://") :],
+                span_exporter_insecure=True,
+                cooperative=True,
+            )
+
+            with trace.get_tracer(__name__).start_as_current_span("span"):
+                pass
+
+            trace.get_tracer_provider().shutdown()
+
+            self.assertEqual(receiver.requests[0][0], "/v1/traces")
+
+    def test_detected(self):
+        # Only a warning, the endpoint may not accept OTLP over HTTP.
+        with patch.dict(
+            "sys.modules", {"gevent.monkey": _patched("gevent.monkey")}
+        ), self.assertLogs(configuration._logger, "WARNING") as logs:
+            configuration.configure_opentelemetry(
+                service_name="service_name",
+                access_token="a" * 32,
+            )
+
+        _, _, span_processor = configuration._installed_components[
+            "span_processor"
+        ]
+
+        self.assertNotIsInstance(
+            span_processor.span_exporter, CooperativeSpanExporter
+        )
+        self.assertNotIn("scheduler", configuration._installed_components)
+        self.assertIn("LS_COOPERATIVE=true", logs.output[0])
+
+    def test_invalid_configuration(self):
+        for kwargs in [
+            {"span_priority_queue": True},
+            {"span_exporter_endpoint": "grpc://localhost:4317"},
+            {"span_exporter_endpoint": "http://:4318"},
+        ]:
+            with self.assertRaises(configuration.InvalidConfigurationError):
+                configuration.configure_opentelemetry(
+                    service_name="service_name",
+                    access_token="a" * 32,
+                    cooperative=True,
+                    **kwargs,
+                )
@@ -0,0 +1,80 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from opentelemetry.launcher import configuration
+
+
+def _entry_point(name):
+    entry_point = Mock()
+    entry_point.name = name
+    return entry_point
+
+
+class TestLightstepLauncherDistro(TestCase):
+    def setUp(self):
+        # Looked up at runtime, test_configuration reloads the module.
+        self.distro = configuration.LightstepLauncherDistro()
+        self.distro.instrumentation_report = None
+
+    def _load(self, *names):
+        entry_points = [_entry_point(name) for name in names]
+
+        for entry_point in entry_points:
+            self.distro.load_instrumentor(entry_point, skip_dep_check=True)
+
+        return entry_points
+
+    @patch(
+        "opentelemetry.launcher.configuration._LS_INSTRUMENTATIONS_ENABLED",
+        ["flask", "requests"],
+    )
+    @patch(
+        "opentelemetry.launcher.configuration._LS_INSTRUMENTATIONS_DISABLED",
+        ["requests"],
+    )
+    def test_allow_and_deny_lists(self):
+        flask, requests, django = self._load("flask", "requests", "django")
+
+        flask.load.return_value.return_value.instrument.assert_called_once_with(
+            skip_dep_check=True
+        )
+        requests.load.assert_not_called()
+        django.load.assert_not_called()
+
+        self.assertEqual(
+            [
+                (entry["name"], entry["loaded"])
+                for entry in self.distro.instrumentation_report
+            ],
+            [("flask", True), ("requests", False), ("django", False)],
+        )
+
+    def test_report(self):
+        self._load("flask", "requests")
+
+        for entry in self.distro.instrumentation_report:
+            self.assertGreaterEqual(entry["import_ns"], 0)
+            self.assertGreaterEqual(entry["instrument_ns"], 0)
+
+        with self.assertLogs(logger=configuration._logger) as log:
+            # The default OTEL_LOG_LEVEL.
+            configuration._logger.setLevel("ERROR")
+            configuration._log_instrumentation_report()
+
+        self.assertEqual(log.records[0].levelname, "WARNING")
+        self.assertIn("Loaded 2 instrumentations", log.output[0])
+        self.assertIn("flask: import", log.output[0])
@@ -0,0 +1,192 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from logging import DEBUG, ERROR, WARNING, getLogger
+from time import sleep
+from unittest import TestCase
+from unittest.mock import patch
+
+from receiver import Receiver
+
+from opentelemetry import trace
+from opentelemetry.exporter.otlp.proto.grpc.exporter import OTLPExporterMixin
+from opentelemetry.launcher import configuration
+from opentelemetry.launcher._exporter import _logger
+from opentelemetry.launcher._failures import (
+    _FailureReport,
+    _RepeatedRecordFilter,
+)
+from opentelemetry.launcher._metrics_exporter import (
+    LightstepOTLPMetricExporter,
+)
+from opentelemetry.launcher.configuration import configure_opentelemetry
+from opentelemetry.launcher.tracer import LightstepOTLPSpanExporter
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SpanExportResult
+from opentelemetry.trace import Once
+
+
+class TestExporter(TestCase):
+    def setUp(self):
+        trace._TRACER_PROVIDER_SET_ONCE = Once()
+        trace._TRACER_PROVIDER = None
+
+    def test_prewarm(self):
+        with Receiver() as receiver:
+            span_exporter = LightstepOTLPSpanExporter(
+                endpoint=receiver.endpoint, insecure=True
+            )
+            metric_exporter = LightstepOTLPMetricExporter(
+                endpoint=receiver.endpoint, insecure=True
+            )
+
+            with self.assertLogs(logger=_logger, level=DEBUG) as log:
+                span_exporter.prewarm().result(timeout=5)
+                metric_exporter.prewarm().result(timeout=5)
+
+            self.assertIn("traces channel to localhost", log.output[0])
+            self.assertIn("metrics channel to localhost", log.output[1])
+
+            provider = TracerProvider(shutdown_on_exit=False)
+            span = provider.get_tracer(__name__).start_span("span")
+            span.end()
+
+            self.assertEqual(
+                span_exporter.export([span]), SpanExportResult.SUCCESS
+            )
+            self.assertEqual(len(receiver.spans), 1)
+
+            span_exporter.shutdown()
+            metric_exporter.shutdown()
+
+    @patch("opentelemetry.launcher.configuration.LightstepOTLPSpanExporter")
+    def test_configure_prewarm(self, mock_otlp_span_exporter):
+        configure_opentelemetry(
+            service_name="service_name",
+            span_exporter_endpoint="localhost:1234",
+        )
+
+        mock_otlp_span_exporter.return_value.prewarm.assert_not_called()
+
+        trace._TRACER_PROVIDER_SET_ONCE = Once()
+        trace._TRACER_PROVIDER = None
+
+        configure_opentelemetry(
+            service_name="service_name",
+            span_exporter_endpoint="localhost:1234",
+            exporter_prewarm=True,
+        )
+
+        mock_otlp_span_exporter.return_value.prewarm.assert_called_once()
+
+    @patch.object(
+        OTLPExporterMixin, "_export", return_value=SpanExportResult.FAILURE
+    )
+    def test_failure_report(self, mock_export):
+        exporter = LightstepOTLPSpanExporter(
+            endpoint="localhost:1234", insecure=True
+        )
+        provider = TracerProvider(shutdown_on_exit=False)
+        spans = [
+            provider.get_tracer(__name__).start_span("span") for _ in range(2)
+        ]
+
+        with self.assertLogs(logger=_logger, level=ERROR) as log:
+            for _ in range(100):
+                self.assertEqual(
+                    exporter.export(spans), SpanExportResult.FAILURE
+                )
+
+            mock_export.side_effect = ValueError("invalid")
+
+            for _ in range(10):
+                with self.assertRaises(ValueError):
+                    exporter.export(spans)
+
+        # Only the first failure of each error class is logged.
+        self.assertEqual(len(log.records), 2)
+        self.assertIsNone(log.records[0].exc_info)
+        self.assertIs(log.records[1].exc_info[0], ValueError)
+
+        with self.assertLogs(logger=_logger, level=ERROR) as log:
+            exporter.shutdown()
+
+        self.assertIn(
+            "Failed to export traces 110 times in the last 0s, 220 spans "
+            "lost: FAILURE 100 times from ",
+            log.output[0],
+        )
+        export_failures = log.records[0].export_failures
+        self.assertEqual(export_failures["lost"], 220)
+        self.assertEqual(export_failures["errors"]["ValueError"]["count"], 10)
+
+    def test_failure_report_window(self):
+        report = _FailureReport(_logger, "traces", "spans", interval=0.1)
+        sleep(0.2)
+
+        # The interval starts at the first failure, not at construction.
+        with self.assertLogs(logger=_logger, level=ERROR) as log:
+            report.record("UNAVAILABLE", 1)
+
+        self.assertEqual(len(log.records), 1)
+
+        sleep(0.2)
+
+        with self.assertLogs(logger=_logger, level=ERROR) as log:
+            report.record_success()
+
+        self.assertGreaterEqual(
+            log.records[0].export_failures["window_seconds"], 0.2
+        )
+
+    @patch("opentelemetry.launcher.configuration.LightstepOTLPSpanExporter")
+    def test_configure_repeated_record_filter(self, mock_otlp_span_exporter):
+        logger = getLogger("opentelemetry.exporter.otlp.proto.grpc.exporter")
+
+        configure_opentelemetry(
+            service_name="service_name",
+            span_exporter_endpoint="localhost:1234",
+        )
+
+        first = configuration._installed_components["repeated_record_filter"]
+
+        self.assertIn(first, logger.filters)
+
+        configure_opentelemetry(
+            service_name="service_name",
+            span_exporter_endpoint="localhost:1234",
+        )
+
+        second = configuration._installed_components["repeated_record_filter"]
+
+        self.assertIsNot(second, first)
+        self.assertNotIn(first, logger.filters)
+        self.assertIn(second, logger.filters)
+
+    def test_repeated_record_filter(self):
+        logger = getLogger("test_repeated_record_filter")
+        logger.addFilter(_RepeatedRecordFilter(compared_args=1))
+
+        with self.assertLogs(logger=logger, level=WARNING) as log:
+            for delay in [1, 2, 4]:
+                logger.warning("Error %s, retrying in %ss", "A", delay)
+                logger.warning("Error %s, retrying in %ss", "B", delay)
+
+        self.assertEqual(
+            log.output,
+            [
+                "WARNING:test_repeated_record_filter:Error A, retrying in 1s",
+                "WARNING:test_repeated_record_filter:Error B, retrying in 1s",
+            ],
+        )
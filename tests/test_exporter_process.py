@@ -0,0 +1,188 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from os import kill
+from signal import SIGKILL
+from socket import socketpair
+from sys import executable
+from unittest import TestCase
+from unittest.mock import patch
+
+from receiver import Receiver
+
+from opentelemetry import trace
+from opentelemetry.launcher.configuration import (
+    InvalidConfigurationError,
+    configure_opentelemetry,
+)
+from opentelemetry.launcher.exporter_process import (
+    _HEADER,
+    ExporterProcessSpanProcessor,
+    _python_executable,
+    _receive_frame,
+)
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.trace import Link, Once, Status, StatusCode
+
+
+class TestExporterProcessSpanProcessor(TestCase):
+    def setUp(self):
+        self.receiver = Receiver().__enter__()
+        self.processor = ExporterProcessSpanProcessor(
+            self.receiver.endpoint, insecure=True
+        )
+        self.provider = TracerProvider(
+            resource=Resource({"service.name": "service_name"}),
+            shutdown_on_exit=False,
+        )
+        self.provider.add_span_processor(self.processor)
+        self.tracer = self.provider.get_tracer("tracer", "1.0")
+
+    def tearDown(self):
+        self.processor.shutdown()
+        self.receiver.__exit__()
+
+    def test_export(self):
+        with self.tracer.start_as_current_span(
+            "parent", attributes={"http.method": "GET", "ids": (1, 2)}
+        ) as parent:
+            parent.add_event("event", {"key": "value"})
+
+            with self.tracer.start_as_current_span(
+                "child", links=[Link(parent.get_span_context(), {"a": 1})]
+            ) as child:
+                child.set_status(Status(StatusCode.ERROR, "failure"))
+
+        self.assertTrue(self.processor.force_flush())
+
+        child, parent = self.receiver.spans
+
+        self.assertEqual(parent.name, "parent")
+        self.assertEqual(parent.events[0].name, "event")
+        self.assertEqual(
+            [attribute.key for attribute in parent.attributes],
+            ["http.method", "ids"],
+        )
+        self.assertEqual(child.parent_span_id, parent.span_id)
+        self.assertEqual(child.links[0].span_id, parent.span_id)
+        self.assertEqual(child.status.message, "failure")
+
+        resource_spans = self.receiver.trace_requests[0].resource_spans[0]
+
+        self.assertEqual(
+            resource_spans.resource.attributes[0].value.string_value,
+            "service_name",
+        )
+        self.assertEqual(resource_spans.scope_spans[0].scope.name, "tracer")
+
+    def test_restart(self):
+        kill(self.processor.pid, SIGKILL)
+        # pylint: disable=protected-access
+        self.processor._process.wait()
+
+        with self.tracer.start_as_current_span("span"):
+            pass
+
+        self.assertTrue(self.processor.force_flush())
+        self.assertEqual(self.processor.restarts, 1)
+        self.assertEqual([span.name for span in self.receiver.spans], ["span"])
+
+    def test_give_up(self):
+        self.processor.max_restarts = 2
+        self.processor.python = "/nonexistent/python"
+        kill(self.processor.pid, SIGKILL)
+        # pylint: disable=protected-access
+        self.processor._process.wait()
+
+        with self.tracer.start_as_current_span("span"):
+            pass
+
+        with self.assertLogs(
+            "opentelemetry.launcher.exporter_process", "ERROR"
+        ) as logs:
+            self.assertFalse(self.processor.force_flush())
+
+        self.assertEqual(self.processor.restarts, 2)
+        self.assertIn("giving up", logs.output[-1])
+        self.assertIsNone(self.processor.pid)
+
+    def test_shutdown(self):
+        with self.tracer.start_as_current_span("span"):
+            pass
+
+        # pylint: disable=protected-access
+        process = self.processor._process
+        self.processor.shutdown()
+
+        self.assertIsNotNone(process.poll())
+        self.assertEqual([span.name for span in self.receiver.spans], ["span"])
+
+
+class TestExporterProcessHelpers(TestCase):
+    def test_receive_frame_closed(self):
+        connection, peer_connection = socketpair()
+
+        with connection, peer_connection:
+            # The header of a frame that never comes.
+            peer_connection.sendall(_HEADER.pack(10) + b"data")
+            peer_connection.close()
+
+            self.assertIsNone(_receive_frame(connection))
+
+    def test_python_executable(self):
+        self.assertEqual(_python_executable(), executable)
+
+        with patch(
+            "opentelemetry.launcher.exporter_process.executable",
+            "/usr/sbin/uwsgi",
+        ):
+            python = _python_executable()
+
+        self.assertNotEqual(python, "/usr/sbin/uwsgi")
+        self.assertIn("python", python)
+
+
+class TestConfigureExporterProcess(TestCase):
+    def setUp(self):
+        trace._TRACER_PROVIDER_SET_ONCE = Once()
+        trace._TRACER_PROVIDER = None
+
+    def test_configure(self):
+        with Receiver() as receiver:
+            configure_opentelemetry(
+                service_name="service_name",
+                span_exporter_endpoint=receiver.endpoint,
+                span_exporter_insecure=True,
+                exporter_process=True,
+            )
+
+            with trace.get_tracer(__name__).start_as_current_span("span"):
+                pass
+
+            tracer_provider = trace.get_tracer_provider()
+
+            self.assertTrue(tracer_provider.force_flush())
+            self.assertEqual([span.name for span in receiver.spans], ["span"])
+
+            tracer_provider.shutdown()
+
+    def test_configure_invalid(self):
+        with self.assertRaises(InvalidConfigurationError):
+            configure_opentelemetry(
+                service_name="service_name",
+                span_exporter_endpoint="localhost:1234",
+                exporter_process=True,
+                serverless=True,
+            )
@@ -0,0 +1,206 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from threading import Thread
+from time import monotonic, sleep
+from unittest import TestCase
+from unittest.mock import patch
+
+from grpc import StatusCode
+from receiver import Receiver
+
+from opentelemetry.launcher._failover import _Failover
+from opentelemetry.launcher._metrics_exporter import (
+    LightstepOTLPMetricExporter,
+)
+from opentelemetry.launcher.configuration import _parse_endpoints
+from opentelemetry.launcher.tracer import LightstepOTLPSpanExporter
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import (
+    SimpleSpanProcessor,
+    SpanExportResult,
+)
+
+
+class TestFailover(TestCase):
+    def setUp(self):
+        self.receivers = [
+            Receiver(latency=0.2).__enter__(),
+            Receiver(latency=0.05).__enter__(),
+            Receiver(latency=0.1).__enter__(),
+        ]
+        self.exporter = LightstepOTLPSpanExporter(
+            endpoint=[receiver.endpoint for receiver in self.receivers]
+        )
+        self.provider = TracerProvider(shutdown_on_exit=False)
+        self.provider.add_span_processor(SimpleSpanProcessor(self.exporter))
+        self.tracer = self.provider.get_tracer(__name__)
+
+    def tearDown(self):
+        self.provider.shutdown()
+
+        for receiver in self.receivers:
+            receiver.__exit__()
+
+    def _export(self, spans):
+        for _ in range(spans):
+            self.tracer.start_span("span").end()
+
+        return [len(receiver.spans) for receiver in self.receivers]
+
+    def test_lowest_latency(self):
+        # Every endpoint is tried once, then the fastest one gets the rest.
+        self.assertEqual(self._export(10), [1, 8, 1])
+
+        self.receivers[1].latency = 0.4
+
+        # The slow down raises the latency average above the one of the
+        # next fastest endpoint after a single export.
+        self.assertEqual(self._export(10), [1, 9, 10])
+
+    def test_failed_endpoint(self):
+        self._export(3)
+        self.receivers[1].__exit__()
+
+        # The failed batches go to the next fastest endpoint.
+        self.assertEqual(self._export(2), [1, 1, 3])
+
+        health = self.exporter._failover.health[1]
+        self.assertFalse(health.healthy)
+
+        self.assertEqual(self._export(2), [1, 1, 5])
+
+        port = int(health.endpoint.rsplit(":", 1)[1])
+        self.receivers[1] = Receiver(latency=0.05)
+        self.receivers[1]._server.add_insecure_port(f"localhost:{port}")
+        self.receivers[1].__enter__()
+        # Lets the channel get past its reconnection backoff.
+        sleep(3)
+
+        # The endpoint is probed once the probe interval elapsed and is used
+        # again once it succeeds.
+        health.last_attempt -= self.exporter._failover.probe_interval
+
+        self.assertEqual(self._export(3), [1, 3, 5])
+        self.assertTrue(health.healthy)
+
+    def test_every_endpoint_failed(self):
+        for receiver in self.receivers:
+            receiver.__exit__()
+
+        tracer = TracerProvider(shutdown_on_exit=False).get_tracer(__name__)
+        span = tracer.start_span("span")
+        span.end()
+
+        with patch("opentelemetry.launcher._failover._MAX_BACKOFF_SECONDS", 1):
+            self.assertEqual(
+                self.exporter.export([span]), SpanExportResult.FAILURE
+            )
+
+    def test_non_retryable_error(self):
+        for receiver in self.receivers:
+            receiver.status_code = StatusCode.UNAUTHENTICATED
+
+        tracer = TracerProvider(shutdown_on_exit=False).get_tracer(__name__)
+        span = tracer.start_span("span")
+        span.end()
+        start = monotonic()
+
+        self.assertEqual(
+            self.exporter.export([span]), SpanExportResult.FAILURE
+        )
+        # Neither retried nor sent to the other endpoints.
+        self.assertLess(monotonic() - start, 0.5)
+        self.assertEqual(self.exporter._failover.last_error, "UNAUTHENTICATED")
+        self.assertEqual(
+            len(
+                [
+                    health
+                    for health in self.exporter._failover.health
+                    if health.last_attempt is not None
+                ]
+            ),
+            1,
+        )
+
+    def test_shutdown_during_backoff(self):
+        for receiver in self.receivers:
+            receiver.__exit__()
+
+        tracer = TracerProvider(shutdown_on_exit=False).get_tracer(__name__)
+        span = tracer.start_span("span")
+        span.end()
+        results = []
+        thread = Thread(
+            target=lambda: results.append(self.exporter.export([span]))
+        )
+        thread.start()
+        # Every endpoint failed, the export waits for its first retry.
+        sleep(0.5)
+        self.exporter._failover.shutdown()
+        thread.join(0.5)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(results, [SpanExportResult.FAILURE])
+
+    def test_unmeasured_latency(self):
+        failover = _Failover([None] * 3, ["a", "b", "c"])
+
+        for health, latency in zip(failover.health, [0.2, None, 0.1]):
+            health.last_attempt = monotonic()
+            health.latency = latency
+
+        # An endpoint without a successful attempt ranks with the slowest.
+        self.assertEqual(failover._order(), [2, 0, 1])
+
+
+class TestFailoverConfiguration(TestCase):
+    def test_parse_endpoints(self):
+        self.assertEqual(
+            _parse_endpoints("https://a:443"),
+            "https://a:443",
+        )
+        self.assertEqual(
+            _parse_endpoints("https://a:443, https://b:443"),
+            ["https://a:443", "https://b:443"],
+        )
+        self.assertEqual(
+            _parse_endpoints(["https://a:443", "https://b:443"]),
+            ["https://a:443", "https://b:443"],
+        )
+
+    def test_metric_exporter(self):
+        with Receiver() as first, Receiver() as second:
+            exporter = LightstepOTLPMetricExporter(
+                endpoint=[first.endpoint, second.endpoint]
+            )
+            reader = PeriodicExportingMetricReader(
+                exporter, export_interval_millis=3_600_000
+            )
+            provider = MeterProvider(
+                metric_readers=[reader], shutdown_on_exit=False
+            )
+            provider.get_meter(__name__).create_counter("counter").add(1)
+
+            reader.collect()
+            reader.collect()
+
+            self.assertEqual(
+                [len(first.metrics_requests), len(second.metrics_requests)],
+                [1, 1],
+            )
+
+            provider.shutdown()
@@ -0,0 +1,219 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from base64 import b64encode
+from json import loads
+from os.path import exists, getsize, join
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from google.protobuf.json_format import ParseDict
+
+from opentelemetry import trace
+from opentelemetry.exporter.otlp.proto.common.trace_encoder import encode_spans
+from opentelemetry.launcher.configuration import (
+    InvalidConfigurationError,
+    configure_opentelemetry,
+)
+from opentelemetry.launcher.file_exporter import FileSpanExporter
+from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import (
+    ExportTraceServiceRequest,
+)
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+from opentelemetry.trace import Link, Once, SpanKind, Status, StatusCode
+
+
+def _hex_to_base64(otlp_object):
+    # The OTLP JSON encoding uses hex identifiers while the protobuf JSON
+    # mapping uses base64 for every bytes field.
+    if isinstance(otlp_object, list):
+        for item in otlp_object:
+            _hex_to_base64(item)
+
+    elif isinstance(otlp_object, dict):
+        for key, value in otlp_object.items():
+            if key in ("traceId", "spanId", "parentSpanId"):
+                otlp_object[key] = b64encode(bytes.fromhex(value)).decode()
+            else:
+                _hex_to_base64(value)
+
+    return otlp_object
+
+
+class TestFileSpanExporter(TestCase):
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.path = join(self.directory.name, "spans.jsonl")
+
+        self.memory_exporter = InMemorySpanExporter()
+        provider = TracerProvider(
+            resource=Resource({"service.name": "service_name"}),
+            shutdown_on_exit=False,
+        )
+        provider.add_span_processor(SimpleSpanProcessor(self.memory_exporter))
+        self.tracer = provider.get_tracer("tracer", "1.0")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _lines(self, path=None):
+        with open(path or self.path, encoding="utf-8") as file:
+            return [loads(line) for line in file]
+
+    def test_otlp_json(self):
+        with self.tracer.start_as_current_span(
+            "parent",
+            kind=SpanKind.SERVER,
+            attributes={
+                "string": "value",
+                "int": 1,
+                "float": 1.5,
+                "bool": True,
+                "sequence": ("a", "b"),
+            },
+        ) as parent:
+            parent.add_event("event", {"key": "value"})
+
+            with self.tracer.start_as_current_span(
+                "child", links=[Link(parent.get_span_context(), {"a": 1})]
+            ) as child:
+                child.set_status(Status(StatusCode.ERROR, "failure"))
+
+        spans = self.memory_exporter.get_finished_spans()
+
+        exporter = FileSpanExporter(self.path)
+        exporter.export(spans)
+        exporter.shutdown()
+
+        (line,) = self._lines()
+
+        self.assertEqual(
+            line["resourceSpans"][0]["scopeSpans"][0]["spans"][0]["traceId"],
+            format(spans[0].context.trace_id, "032x"),
+        )
+        self.assertEqual(
+            ParseDict(_hex_to_base64(line), ExportTraceServiceRequest()),
+            encode_spans(spans),
+        )
+
+    def test_buffered(self):
+        with self.tracer.start_as_current_span("span"):
+            pass
+
+        exporter = FileSpanExporter(self.path)
+        exporter.export(self.memory_exporter.get_finished_spans())
+
+        self.assertEqual(getsize(self.path), 0)
+
+        exporter.force_flush()
+
+        self.assertEqual(len(self._lines()), 1)
+
+        exporter.shutdown()
+
+    def test_rotation(self):
+        with self.tracer.start_as_current_span("span"):
+            pass
+
+        spans = self.memory_exporter.get_finished_spans()
+
+        exporter = FileSpanExporter(self.path, max_bytes=1)
+        exporter.export(spans)
+        exporter.shutdown()
+
+        self.assertFalse(exists(self.path) and getsize(self.path))
+
+        exporter = FileSpanExporter(self.path, max_bytes=1000)
+
+        for _ in range(5):
+            exporter.export(spans)
+
+        exporter.shutdown()
+
+        self.assertLessEqual(getsize(self.path), 1000)
+        self.assertLessEqual(getsize(f"{self.path}.1"), 1000)
+        self.assertFalse(exists(f"{self.path}.2"))
+        self.assertTrue(self._lines())
+
+    def test_sample_ratio(self):
+        for _ in range(100):
+            with self.tracer.start_as_current_span("span"):
+                pass
+
+        spans = self.memory_exporter.get_finished_spans()
+
+        exporter = FileSpanExporter(self.path, sample_ratio=0.5)
+        exporter.export(spans)
+        exporter.shutdown()
+
+        written = self._lines()[0]["resourceSpans"][0]["scopeSpans"][0][
+            "spans"
+        ]
+
+        self.assertLess(len(written), 100)
+        self.assertTrue(
+            all(
+                int(span["traceId"], 16) & ((1 << 64) - 1) < 1 << 63
+                for span in written
+            )
+        )
+
+
+class TestConfigureDebugSpanFile(TestCase):
+    def setUp(self):
+        trace._TRACER_PROVIDER_SET_ONCE = Once()
+        trace._TRACER_PROVIDER = None
+
+    def test_configure(self):
+        with TemporaryDirectory() as directory:
+            path = join(directory, "spans.jsonl")
+
+            configure_opentelemetry(
+                service_name="service_name",
+                span_exporter_endpoint="http://localhost:1234",
+                log_level="DEBUG",
+                debug_span_file=path,
+                serverless=True,
+            )
+
+            with trace.get_tracer(__name__).start_as_current_span("span"):
+                pass
+
+            # pylint: disable=protected-access
+            for (
+                span_processor
+            ) in (
+                trace.get_tracer_provider()._active_span_processor._span_processors
+            ):
+                if isinstance(span_processor.span_exporter, FileSpanExporter):
+                    span_processor.span_exporter.shutdown()
+
+            with open(path, encoding="utf-8") as file:
+                self.assertIn('"name":"span"', file.read())
+
+    def test_configure_unwritable(self):
+        with TemporaryDirectory() as directory:
+            with self.assertRaises(InvalidConfigurationError):
+                configure_opentelemetry(
+                    service_name="service_name",
+                    span_exporter_endpoint="http://localhost:1234",
+                    log_level="DEBUG",
+                    debug_span_file=join(directory, "missing", "spans.jsonl"),
+                    serverless=True,
+                )
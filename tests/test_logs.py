@@ -0,0 +1,122 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from logging import getLogger
+from threading import Event
+from unittest import TestCase
+from unittest.mock import Mock
+
+from receiver import Receiver
+
+from opentelemetry import _logs, trace
+from opentelemetry.launcher._logs_exporter import (
+    _DroppingBatchLogRecordProcessor,
+)
+from opentelemetry.launcher.configuration import configure_opentelemetry
+from opentelemetry.sdk._logs import LogData, LoggingHandler, LogRecord
+from opentelemetry.sdk._logs.export import LogExportResult
+from opentelemetry.trace import Once
+
+
+class TestLogs(TestCase):
+    def setUp(self):
+        trace._TRACER_PROVIDER_SET_ONCE = Once()
+        trace._TRACER_PROVIDER = None
+        _logs._internal._LOGGER_PROVIDER_SET_ONCE = Once()
+        _logs._internal._LOGGER_PROVIDER = None
+
+    def tearDown(self):
+        root_logger = getLogger()
+
+        for handler in list(root_logger.handlers):
+            if isinstance(handler, LoggingHandler):
+                root_logger.removeHandler(handler)
+
+    def test_logs_enabled(self):
+        with Receiver() as receiver:
+            configure_opentelemetry(
+                service_name="service_name",
+                span_exporter_endpoint=receiver.endpoint,
+                span_exporter_insecure=True,
+                logs_enabled=True,
+                logs_exporter_endpoint=receiver.endpoint,
+            )
+
+            with trace.get_tracer(__name__).start_as_current_span(
+                "span"
+            ) as span:
+                getLogger(__name__).error("message %s", "argument")
+
+            # Records of OpenTelemetry loggers are not exported
+            getLogger("opentelemetry.launcher").error("not exported")
+
+            self.assertTrue(_logs.get_logger_provider().force_flush())
+
+            [log_record] = receiver.log_records
+
+            self.assertEqual(log_record.body.string_value, "message argument")
+            self.assertEqual(
+                log_record.trace_id,
+                span.get_span_context().trace_id.to_bytes(16, "big"),
+            )
+            self.assertEqual(
+                log_record.span_id,
+                span.get_span_context().span_id.to_bytes(8, "big"),
+            )
+
+    def test_drop_when_full(self):
+        exporting = Event()
+        release = Event()
+
+        def export(batch):
+            exporting.set()
+            release.wait()
+            return LogExportResult.SUCCESS
+
+        exporter = Mock()
+        exporter.export.side_effect = export
+
+        processor = _DroppingBatchLogRecordProcessor(
+            exporter,
+            schedule_delay_millis=60000,
+            max_export_batch_size=4,
+            max_queue_size=4,
+        )
+
+        def log_data(body):
+            return LogData(
+                log_record=LogRecord(body=body), instrumentation_scope=None
+            )
+
+        for index in range(4):
+            processor.emit(log_data(str(index)))
+
+        # The worker thread is now blocked exporting the first batch
+        self.assertTrue(exporting.wait(5))
+
+        for index in range(4, 10):
+            processor.emit(log_data(str(index)))
+
+        self.assertEqual(processor.dropped, 2)
+
+        release.set()
+        processor.shutdown()
+
+        exported = [
+            log_data.log_record.body
+            for call in exporter.export.call_args_list
+            for log_data in call.args[0]
+        ]
+
+        self.assertEqual(exported, [str(index) for index in range(8)])
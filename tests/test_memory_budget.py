@@ -0,0 +1,275 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from os import _exit, fork, waitpid
+from unittest import TestCase
+
+from receiver import Receiver
+
+from opentelemetry import metrics, trace
+from opentelemetry.launcher import configuration
+from opentelemetry.launcher.exporter_process import (
+    ExporterProcessSpanProcessor,
+)
+from opentelemetry.launcher.memory_budget import (
+    _REFRESH_ADMISSIONS,
+    _SERIES_BYTES,
+    _SPAN_BYTES,
+    BudgetedQueue,
+    MemoryBudget,
+    MemoryBudgetMetrics,
+    budget_span_processor,
+)
+from opentelemetry.launcher.series_eviction import SeriesEviction
+from opentelemetry.launcher.serverless import ServerlessSpanProcessor
+from opentelemetry.launcher.span_processor import PrioritySpanProcessor
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+from opentelemetry.trace import Once, Status, StatusCode
+
+
+def _points(reader):
+    # The data points of every metric by metric name.
+    return {
+        metric.name: list(metric.data.data_points)
+        for resource_metrics in reader.get_metrics_data().resource_metrics
+        for scope_metrics in resource_metrics.scope_metrics
+        for metric in scope_metrics.metrics
+    }
+
+
+class _Account:
+    def __init__(self, usage):
+        self.usage = usage
+        self.calls = 0
+
+    def memory_usage(self):
+        self.calls += 1
+        return self.usage
+
+
+class TestMemoryBudget(TestCase):
+    def test_admit(self):
+        memory_budget = MemoryBudget(100)
+        account = _Account(0)
+        memory_budget.register(account, "queue")
+
+        self.assertTrue(memory_budget.admit("queue", size=50))
+        account.usage = 50
+        self.assertTrue(memory_budget.admit("queue", size=45))
+        account.usage = 95
+
+        self.assertFalse(memory_budget.admit("queue"))
+        self.assertTrue(memory_budget.admit("queue", valuable=True, size=5))
+
+        account.usage = 100
+
+        self.assertFalse(memory_budget.admit("queue", valuable=True))
+        self.assertEqual(
+            memory_budget.shed,
+            {("queue", "downsampled"): 1, ("queue", "over_budget"): 1},
+        )
+        self.assertEqual(memory_budget.usage(), {"queue": 100})
+
+        # Released items are noticed before anything is shed.
+        account.usage = 0
+
+        self.assertTrue(memory_budget.admit("queue"))
+
+    def test_admit_usage_computations(self):
+        memory_budget = MemoryBudget(100)
+        account = _Account(0)
+        memory_budget.register(account, "queue")
+
+        for _ in range(_REFRESH_ADMISSIONS):
+            self.assertTrue(memory_budget.admit("queue", size=1))
+
+        # Once at the first admission only.
+        self.assertEqual(account.calls, 1)
+
+        self.assertTrue(memory_budget.admit("queue", size=1))
+        self.assertEqual(account.calls, 2)
+
+    def test_spans(self):
+        memory_budget = MemoryBudget(10 * _SPAN_BYTES)
+        exporter = InMemorySpanExporter()
+        processor = budget_span_processor(
+            ServerlessSpanProcessor(exporter), memory_budget
+        )
+        tracer_provider = TracerProvider(shutdown_on_exit=False)
+        tracer_provider.add_span_processor(processor)
+        tracer = tracer_provider.get_tracer(__name__)
+
+        with tracer.start_as_current_span("parent"):
+            for _ in range(20):
+                tracer.start_span("child").end()
+
+            # Usage got to 90% of the budget after 9 spans.
+            self.assertEqual(len(processor.queue), 9)
+
+            for _ in range(2):
+                with tracer.start_as_current_span("error") as span:
+                    span.set_status(Status(StatusCode.ERROR))
+
+        self.assertEqual(len(processor.queue), 10)
+        self.assertEqual(
+            memory_budget.shed,
+            {
+                ("span_queue", "downsampled"): 11,
+                ("span_queue", "over_budget"): 2,
+            },
+        )
+
+        processor.force_flush()
+
+        self.assertEqual(len(exporter.get_finished_spans()), 10)
+        self.assertEqual(memory_budget.usage(), {"span_queue": 0})
+
+    def test_priority_span_processor(self):
+        memory_budget = MemoryBudget(_SPAN_BYTES)
+        processor = budget_span_processor(
+            PrioritySpanProcessor(InMemorySpanExporter()), memory_budget
+        )
+        tracer_provider = TracerProvider(shutdown_on_exit=False)
+        tracer_provider.add_span_processor(processor)
+
+        self.assertIsInstance(processor.queue, BudgetedQueue)
+        self.assertEqual(
+            processor.dropped_spans, {"error": 0, "root": 0, "other": 0}
+        )
+
+        tracer_provider.shutdown()
+
+    def test_exporter_process_fork(self):
+        with Receiver() as receiver:
+            processor = budget_span_processor(
+                ExporterProcessSpanProcessor(receiver.endpoint, insecure=True),
+                MemoryBudget(_SPAN_BYTES),
+            )
+            pid = fork()
+
+            if pid == 0:
+                # Exits with 0 if the queue is still budgeted after the fork.
+                try:
+                    budgeted = isinstance(processor._queue, BudgetedQueue)
+                    processor.shutdown()
+                    _exit(0 if budgeted else 1)
+                finally:
+                    _exit(2)
+
+            self.assertEqual(waitpid(pid, 0)[1], 0)
+            self.assertIsInstance(processor._queue, BudgetedQueue)
+
+            processor.shutdown()
+
+    def test_metric_series(self):
+        reader = InMemoryMetricReader()
+        meter_provider = MeterProvider(
+            metric_readers=[reader], shutdown_on_exit=False
+        )
+        memory_budget = MemoryBudget(int(2.5 * _SERIES_BYTES))
+        series_eviction = SeriesEviction(meter_provider, None)
+        series_eviction.memory_budget = memory_budget
+        series_eviction.start()
+        memory_budget_metrics = MemoryBudgetMetrics(meter_provider)
+        memory_budget_metrics.memory_budget = memory_budget
+        counter = meter_provider.get_meter(__name__).create_counter("counter")
+
+        counter.add(1, {"id": "a"})
+        # The series of the counter are admitted from the first collection
+        # on.
+        _points(reader)
+
+        for series_id in ["b", "c", "d", "d", "a"]:
+            counter.add(1, {"id": series_id})
+
+        points = _points(reader)
+
+        self.assertEqual(
+            sorted(
+                (point.attributes["id"], point.value)
+                for point in points["counter"]
+            ),
+            [("a", 2), ("b", 1), ("c", 1)],
+        )
+        self.assertEqual(
+            memory_budget.shed, {("metric_series", "over_budget"): 2}
+        )
+        self.assertEqual(
+            [
+                (point.attributes, point.value)
+                for point in points["telemetry.memory.shed"]
+            ],
+            [({"component": "metric_series", "reason": "over_budget"}, 2)],
+        )
+        self.assertEqual(
+            points["telemetry.memory.limit"][0].value, 2.5 * _SERIES_BYTES
+        )
+        self.assertEqual(
+            points["telemetry.memory.usage"][0].attributes,
+            {"component": "metric_series"},
+        )
+
+
+class TestMemoryBudgetConfiguration(TestCase):
+    def setUp(self):
+        trace._TRACER_PROVIDER_SET_ONCE = Once()
+        trace._TRACER_PROVIDER = None
+        metrics._internal._METER_PROVIDER_SET_ONCE = Once()
+        metrics._internal._METER_PROVIDER = None
+        configuration._installed_components.clear()
+
+    def tearDown(self):
+        configuration._installed_components.clear()
+
+    def test_configuration(self):
+        with Receiver() as receiver:
+            configuration.configure_opentelemetry(
+                service_name="service_name",
+                span_exporter_endpoint=receiver.endpoint,
+                span_exporter_insecure=True,
+                metrics_exporter_endpoint=receiver.endpoint,
+                metrics_enabled=True,
+                memory_budget_bytes=2**20,
+            )
+
+            memory_budget = configuration._installed_components[
+                "memory_budget"
+            ][2]
+            span_processor = configuration._installed_components[
+                "span_processor"
+            ][2]
+            series_eviction = configuration._installed_components[
+                "series_eviction"
+            ][2]
+
+            self.assertEqual(memory_budget.max_bytes, 2**20)
+            self.assertIsInstance(span_processor.queue, BudgetedQueue)
+            self.assertIs(series_eviction.memory_budget, memory_budget)
+            self.assertIsNone(series_eviction.max_idle_seconds)
+
+            trace.get_tracer_provider().shutdown()
+            metrics.get_meter_provider().shutdown()
+
+    def test_invalid_configuration(self):
+        with self.assertRaises(configuration.InvalidConfigurationError):
+            configuration.configure_opentelemetry(
+                service_name="service_name",
+                span_exporter_endpoint="localhost:1234",
+                memory_budget_bytes=0,
+            )
@@ -0,0 +1,276 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from os import _exit, fork, waitpid
+from socket import socket
+from threading import Thread
+from unittest import TestCase
+from unittest.mock import patch
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from receiver import Receiver
+
+from opentelemetry import metrics, trace
+from opentelemetry.launcher import configuration
+from opentelemetry.launcher.metrics_endpoint import MetricsEndpointReader
+from opentelemetry.proto.collector.metrics.v1.metrics_service_pb2 import (
+    ExportMetricsServiceRequest,
+)
+from opentelemetry.sdk.metrics import Counter, MeterProvider
+from opentelemetry.sdk.metrics.export import AggregationTemporality
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.trace import Once
+
+
+class TestMetricsEndpointReader(TestCase):
+    def setUp(self):
+        self.reader = MetricsEndpointReader(port=0, cache_seconds=0)
+        self.meter_provider = MeterProvider(
+            metric_readers=[self.reader],
+            resource=Resource({"service.name": "service_name"}),
+            shutdown_on_exit=False,
+        )
+        self.meter = self.meter_provider.get_meter(__name__)
+
+    def tearDown(self):
+        self.meter_provider.shutdown()
+
+    def _get(self, path="/metrics", accept=None):
+        headers = {"Accept": accept} if accept else {}
+
+        with urlopen(
+            Request(
+                f"http://localhost:{self.reader.port}{path}", headers=headers
+            )
+        ) as response:
+            return response.headers["Content-Type"], response.read()
+
+    def test_prometheus(self):
+        self.meter.create_counter(
+            "http.requests", description="HTTP requests"
+        ).add(3, {"http.route": '/users/"id"'})
+        self.meter.create_up_down_counter("queue.size").add(-2)
+        self.meter.create_histogram("duration").record(7, {"a": "b"})
+
+        content_type, body = self._get()
+        lines = body.decode().splitlines()
+
+        self.assertTrue(content_type.startswith("text/plain"))
+        self.assertIn('target_info{service_name="service_name"} 1', lines)
+        self.assertIn("# HELP http_requests_total HTTP requests", lines)
+        self.assertIn("# TYPE http_requests_total counter", lines)
+        self.assertIn(
+            'http_requests_total{http_route="/users/\\"id\\""} 3', lines
+        )
+        self.assertIn("# TYPE queue_size gauge", lines)
+        self.assertIn("queue_size -2", lines)
+        self.assertIn("# TYPE duration histogram", lines)
+        self.assertIn('duration_bucket{a="b",le="5.0"} 0', lines)
+        self.assertIn('duration_bucket{a="b",le="10.0"} 1', lines)
+        self.assertIn('duration_bucket{a="b",le="+Inf"} 1', lines)
+        self.assertIn('duration_sum{a="b"} 7', lines)
+        self.assertIn('duration_count{a="b"} 1', lines)
+
+    def test_otlp(self):
+        self.meter.create_counter("counter").add(3, {"a": "b"})
+
+        for path, accept in [
+            ("/metrics", "application/x-protobuf"),
+            ("/v1/metrics", None),
+        ]:
+            content_type, body = self._get(path, accept)
+            request = ExportMetricsServiceRequest.FromString(body)
+            (resource_metrics,) = request.resource_metrics
+            (scope_metrics,) = resource_metrics.scope_metrics
+            (metric,) = scope_metrics.metrics
+
+            self.assertEqual(content_type, "application/x-protobuf")
+            self.assertEqual(
+                resource_metrics.resource.attributes[0].value.string_value,
+                "service_name",
+            )
+            self.assertEqual(scope_metrics.scope.name, __name__)
+            self.assertEqual(metric.name, "counter")
+            self.assertEqual(metric.sum.data_points[0].as_int, 3)
+
+    def test_not_found(self):
+        with self.assertRaises(HTTPError) as error:
+            self._get("/")
+
+        self.assertEqual(error.exception.code, 404)
+
+    def test_cache(self):
+        counter = self.meter.create_counter("counter")
+        counter.add(1)
+        self.reader.cache_seconds = 60
+
+        with patch.object(
+            self.reader, "collect", wraps=self.reader.collect
+        ) as collect:
+            responses = []
+            threads = [
+                Thread(target=lambda: responses.append(self._get()))
+                for _ in range(4)
+            ]
+
+            for thread in threads:
+                thread.start()
+
+            for thread in threads:
+                thread.join()
+
+            counter.add(1)
+            responses.append(self._get())
+
+        self.assertEqual(collect.call_count, 1)
+        self.assertEqual(len(set(responses)), 1)
+        self.assertIn(b"counter_total 1", responses[0][1])
+
+
+class TestMetricsEndpointReaderPorts(TestCase):
+    def test_port_taken(self):
+        reader = MetricsEndpointReader(port=0)
+        port = reader.port
+
+        with self.assertLogs(
+            "opentelemetry.launcher.metrics_endpoint", "WARNING"
+        ):
+            other_reader = MetricsEndpointReader(port=port)
+
+        self.assertGreater(other_reader.port, port)
+
+        other_reader.shutdown()
+        reader.shutdown()
+
+        with socket() as taken_socket:
+            taken_socket.bind(("localhost", 0))
+            taken_socket.listen()
+
+            with self.assertRaises(OSError):
+                MetricsEndpointReader(
+                    port=taken_socket.getsockname()[1], max_port_offset=0
+                )
+
+    def test_fork(self):
+        reader = MetricsEndpointReader(port=0, cache_seconds=0)
+        meter_provider = MeterProvider(
+            metric_readers=[reader], shutdown_on_exit=False
+        )
+        meter_provider.get_meter(__name__).create_counter("counter").add(1)
+        port = reader.port
+        pid = fork()
+
+        if pid == 0:
+            # Exits with 0 if this process serves its own metrics.
+            try:
+                child_port = reader.port
+
+                with urlopen(
+                    f"http://localhost:{child_port}/metrics"
+                ) as response:
+                    served = b"counter" in response.read()
+
+                _exit(0 if served and child_port != port else 1)
+            finally:
+                _exit(2)
+
+        self.assertEqual(waitpid(pid, 0)[1], 0)
+
+        # The parent still serves its metrics.
+        with urlopen(f"http://localhost:{port}/metrics") as response:
+            self.assertIn(b"counter", response.read())
+
+        meter_provider.shutdown()
+
+
+class TestMetricsEndpointReaderTemporality(TestCase):
+    def test_delta(self):
+        reader = MetricsEndpointReader(
+            port=0,
+            preferred_temporality={Counter: AggregationTemporality.DELTA},
+            cache_seconds=0,
+        )
+        meter_provider = MeterProvider(
+            metric_readers=[reader], shutdown_on_exit=False
+        )
+        counter = meter_provider.get_meter(__name__).create_counter("counter")
+
+        for _ in range(2):
+            counter.add(2)
+            lines = reader.scrape(
+                "text/plain; version=0.0.4; charset=utf-8"
+            ).splitlines()
+
+            # Only the increment since the previous scrape.
+            self.assertIn(b"# TYPE counter untyped", lines)
+            self.assertIn(b"counter 2", lines)
+
+        meter_provider.shutdown()
+
+
+class TestMetricsEndpointConfiguration(TestCase):
+    def setUp(self):
+        trace._TRACER_PROVIDER_SET_ONCE = Once()
+        trace._TRACER_PROVIDER = None
+        metrics._internal._METER_PROVIDER_SET_ONCE = Once()
+        metrics._internal._METER_PROVIDER = None
+        configuration._installed_components.clear()
+
+    def tearDown(self):
+        configuration._installed_components.clear()
+
+    def test_configuration(self):
+        with socket() as free_socket:
+            free_socket.bind(("localhost", 0))
+            port = free_socket.getsockname()[1]
+
+        with Receiver() as receiver:
+            # Reconfiguring listens on the same address again.
+            for metrics_exporter_interval in [1000, 2000]:
+                configuration.configure_opentelemetry(
+                    service_name="service_name",
+                    span_exporter_endpoint=receiver.endpoint,
+                    span_exporter_insecure=True,
+                    metrics_enabled=True,
+                    metrics_exporter_interval=metrics_exporter_interval,
+                    metrics_scrape_endpoint=f"localhost:{port}",
+                )
+
+            reader = configuration._installed_components["metric_reader"][2]
+
+            self.assertIsInstance(reader, MetricsEndpointReader)
+            self.assertEqual(reader.port, port)
+
+            metrics.get_meter(__name__).create_counter("counter").add(1)
+
+            with urlopen(f"http://localhost:{port}/metrics") as response:
+                self.assertIn(b"counter", response.read())
+
+            trace.get_tracer_provider().shutdown()
+            metrics.get_meter_provider().shutdown()
+
+    def test_invalid_configuration(self):
+        for kwargs in [
+            {"metrics_scrape_endpoint": "localhost"},
+            {"metrics_scrape_endpoint": "localhost:9464", "serverless": True},
+        ]:
+            with self.assertRaises(configuration.InvalidConfigurationError):
+                configuration.configure_opentelemetry(
+                    service_name="service_name",
+                    span_exporter_endpoint="localhost:1234",
+                    metrics_exporter_endpoint="localhost:1234",
+                    metrics_enabled=True,
+                    **kwargs,
+                )
@@ -0,0 +1,279 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from threading import Thread
+from time import sleep, thread_time
+from unittest import TestCase
+
+from receiver import Receiver
+
+from opentelemetry import metrics, trace
+from opentelemetry.launcher import configuration
+from opentelemetry.launcher.memory_budget import (
+    MemoryBudget,
+    budget_span_processor,
+)
+from opentelemetry.launcher.profiler import (
+    PROFILE_SPAN_NAME,
+    ProfilerSpanProcessor,
+)
+from opentelemetry.launcher.span_metrics import SpanMetricsProcessor
+from opentelemetry.launcher.span_processor import InterningSpanProcessor
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    SimpleSpanProcessor,
+)
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+from opentelemetry.trace import Once
+
+
+def _busy(seconds):
+    started = thread_time()
+
+    while thread_time() - started < seconds:
+        pass
+
+
+class TestProfilerSpanProcessor(TestCase):
+    def setUp(self):
+        self.exporter = InMemorySpanExporter()
+        self.tracer_provider = TracerProvider(shutdown_on_exit=False)
+        self.tracer_provider.add_span_processor(
+            SimpleSpanProcessor(self.exporter)
+        )
+        self.profiler = ProfilerSpanProcessor(
+            self.tracer_provider, interval=0.001
+        )
+        self.tracer_provider.add_span_processor(self.profiler)
+        self.tracer = self.tracer_provider.get_tracer(__name__)
+
+    def tearDown(self):
+        self.tracer_provider.shutdown()
+
+    def _profiles(self):
+        return {
+            span.attributes["profile.span_name"]: span
+            for span in self.exporter.get_finished_spans()
+            if span.name == PROFILE_SPAN_NAME
+        }
+
+    def test_profile(self):
+        # The CPU time used since the previous sample goes to the span
+        # running when sampled, the interval is not lengthened on a busy
+        # machine so that little of "inner" goes to "idle".
+        self.profiler.max_overhead = 1
+
+        def work():
+            with self.tracer.start_as_current_span("work"):
+                with self.tracer.start_as_current_span("inner") as span:
+                    _busy(0.2)
+                    self.context = span.get_span_context()
+
+                # Hardly sampled, the thread is idle.
+                with self.tracer.start_as_current_span("idle"):
+                    sleep(0.05)
+
+        thread = Thread(target=work)
+        thread.start()
+        thread.join()
+
+        self.profiler.force_flush()
+        profiles = self._profiles()
+
+        def weight(span_name):
+            if span_name not in profiles:
+                return 0
+
+            return sum(
+                int(folded_stack.rsplit(" ", 1)[1])
+                for folded_stack in profiles[span_name].attributes[
+                    "profile.folded_stacks"
+                ]
+            )
+
+        self.assertGreater(weight("inner"), 10 * weight("idle"))
+        self.assertLessEqual(weight("inner"), 200000)
+
+        profile = profiles["inner"]
+        folded_stacks = profile.attributes["profile.folded_stacks"]
+        stack, weight = folded_stacks[0].rsplit(" ", 1)
+        frames = stack.split(";")
+
+        self.assertEqual(profile.attributes["profile.unit"], "cpu_us")
+        self.assertGreater(profile.attributes["profile.samples"], 0)
+        self.assertEqual(frames[-1], "test_profiler.py:_busy")
+        self.assertIn("test_profiler.py:TestProfilerSpanProcessor.", stack)
+        self.assertGreater(int(weight), 0)
+        self.assertEqual(
+            [link.context for link in profile.links], [self.context]
+        )
+        self.assertTrue(profile.context.trace_flags.sampled)
+        self.assertIs(profile.resource, self.tracer_provider.resource)
+
+        # Exported once.
+        self.profiler.force_flush()
+
+        self.assertEqual(len(self._profiles()), len(profiles))
+
+    def test_derived_telemetry(self):
+        reader = InMemoryMetricReader()
+        meter_provider = MeterProvider(
+            metric_readers=[reader], shutdown_on_exit=False
+        )
+        span_metrics = SpanMetricsProcessor(meter_provider)
+        span_metrics.start()
+        interning = InterningSpanProcessor()
+        self.tracer_provider.add_span_processor(span_metrics)
+        self.tracer_provider.add_span_processor(interning)
+
+        def work():
+            with self.tracer.start_as_current_span("work"):
+                _busy(0.05)
+
+        thread = Thread(target=work)
+        thread.start()
+        thread.join()
+
+        self.profiler.force_flush()
+
+        span_names = [
+            point.attributes["span.name"]
+            for resource_metrics in reader.get_metrics_data().resource_metrics
+            for scope_metrics in resource_metrics.scope_metrics
+            for metric in scope_metrics.metrics
+            if metric.name == "span.calls"
+            for point in metric.data.data_points
+        ]
+
+        self.assertEqual(span_names, ["work"])
+        self.assertEqual(list(self._profiles()), ["work"])
+        self.assertNotIn(PROFILE_SPAN_NAME, interning._table._strings)
+
+        meter_provider.shutdown()
+
+    def test_memory_budget(self):
+        exporter = InMemorySpanExporter()
+        processor = BatchSpanProcessor(exporter, schedule_delay_millis=60000)
+        budget_span_processor(processor, MemoryBudget(0))
+        self.tracer_provider.add_span_processor(processor)
+
+        def work():
+            with self.tracer.start_as_current_span("work"):
+                _busy(0.05)
+
+        thread = Thread(target=work)
+        thread.start()
+        thread.join()
+
+        self.profiler.force_flush()
+        processor.force_flush()
+
+        # The spans of the application are over the budget, not the profiles.
+        self.assertEqual(
+            [span.name for span in exporter.get_finished_spans()],
+            [PROFILE_SPAN_NAME],
+        )
+
+    def test_max_stacks(self):
+        self.profiler.max_stacks = 0
+
+        with self.tracer.start_as_current_span("work"):
+            thread = Thread(target=_busy, args=(0.05,))
+            thread.start()
+            thread.join()
+
+        with self.tracer.start_as_current_span("work"):
+            _busy(0)
+
+        def work():
+            with self.tracer.start_as_current_span("work"):
+                _busy(0.05)
+
+        thread = Thread(target=work)
+        thread.start()
+        thread.join()
+
+        self.profiler.force_flush()
+
+        self.assertEqual(self._profiles(), {})
+        self.assertGreater(self.profiler.dropped_samples, 0)
+        # The spans of exited threads are no longer tracked.
+        self.assertEqual(
+            [spans for spans in self.profiler._spans.values() if spans], []
+        )
+
+    def test_shutdown(self):
+        def work():
+            with self.tracer.start_as_current_span("work"):
+                _busy(0.05)
+
+        thread = Thread(target=work)
+        thread.start()
+        thread.join()
+
+        self.profiler.shutdown()
+
+        self.assertFalse(self.profiler._thread.is_alive())
+        self.assertEqual(list(self._profiles()), ["work"])
+
+
+class TestProfilerConfiguration(TestCase):
+    def setUp(self):
+        trace._TRACER_PROVIDER_SET_ONCE = Once()
+        trace._TRACER_PROVIDER = None
+        metrics._internal._METER_PROVIDER_SET_ONCE = Once()
+        metrics._internal._METER_PROVIDER = None
+        configuration._installed_components.clear()
+
+    def tearDown(self):
+        configuration._installed_components.clear()
+
+    def test_configuration(self):
+        with Receiver() as receiver:
+            configuration.configure_opentelemetry(
+                service_name="service_name",
+                span_exporter_endpoint=receiver.endpoint,
+                span_exporter_insecure=True,
+                profiler_enabled=True,
+            )
+
+            tracer_provider = trace.get_tracer_provider()
+            profiler = configuration._installed_components[
+                "profiler_span_processor"
+            ][2]
+
+            self.assertIsInstance(profiler, ProfilerSpanProcessor)
+            self.assertIs(
+                tracer_provider._active_span_processor._span_processors[0],
+                profiler,
+            )
+
+            configuration.configure_opentelemetry(
+                service_name="service_name",
+                span_exporter_endpoint=receiver.endpoint,
+                span_exporter_insecure=True,
+            )
+
+            self.assertNotIn(
+                profiler,
+                tracer_provider._active_span_processor._span_processors,
+            )
+            self.assertFalse(profiler._thread.is_alive())
+
+            tracer_provider.shutdown()
@@ -0,0 +1,304 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from logging import getLogger
+from unittest import TestCase
+
+from receiver import Receiver
+
+from opentelemetry import trace
+from opentelemetry._logs import _internal as logs_internal
+from opentelemetry.launcher import configuration, span_processor
+from opentelemetry.metrics import _internal as metrics_internal
+from opentelemetry.sdk._logs import LoggingHandler
+from opentelemetry.trace import Once
+
+
+class TestReconfiguration(TestCase):
+    # pylint: disable=protected-access
+
+    def setUp(self):
+        trace._TRACER_PROVIDER_SET_ONCE = Once()
+        trace._TRACER_PROVIDER = None
+        metrics_internal._METER_PROVIDER_SET_ONCE = Once()
+        metrics_internal._METER_PROVIDER = None
+        logs_internal._LOGGER_PROVIDER_SET_ONCE = Once()
+        logs_internal._LOGGER_PROVIDER = None
+        # Looked up at runtime, test_configuration reloads the module.
+        configuration._installed_components.clear()
+        self.receiver = Receiver().__enter__()
+
+    def tearDown(self):
+        for handler in getLogger().handlers[:]:
+            if isinstance(handler, LoggingHandler):
+                getLogger().removeHandler(handler)
+
+        for part in ["OTEL_PYTHON_TRACER_PROVIDER", "meter_provider"]:
+            if part in configuration._installed_components:
+                configuration._installed_components[part].shutdown()
+
+        if "logger_provider" in configuration._installed_components:
+            configuration._installed_components["logger_provider"][
+                0
+            ].shutdown()
+
+        self.receiver.__exit__()
+
+    def _configure(self, **kwargs):
+        kwargs.setdefault("span_exporter_endpoint", self.receiver.endpoint)
+        configuration.configure_opentelemetry(
+            service_name="service_123",
+            access_token="a" * 104,
+            span_exporter_insecure=True,
+            metrics_exporter_endpoint=self.receiver.endpoint,
+            logs_exporter_endpoint=self.receiver.endpoint,
+            **kwargs,
+        )
+
+    @staticmethod
+    def _span_processors():
+        return (
+            trace.get_tracer_provider()._active_span_processor._span_processors
+        )
+
+    def test_unchanged(self):
+        self._configure(metrics_enabled=True, logs_enabled=True)
+
+        tracer_provider = trace.get_tracer_provider()
+        span_processors = self._span_processors()
+        meter_provider = metrics_internal.get_meter_provider()
+        metric_readers = meter_provider._sdk_config.metric_readers
+
+        self._configure(metrics_enabled=True, logs_enabled=True)
+
+        self.assertIs(trace.get_tracer_provider(), tracer_provider)
+        self.assertEqual(self._span_processors(), span_processors)
+        self.assertEqual(len(span_processors), 1)
+        self.assertIs(metrics_internal.get_meter_provider(), meter_provider)
+        self.assertEqual(
+            meter_provider._sdk_config.metric_readers, metric_readers
+        )
+        self.assertEqual(
+            len(
+                [
+                    handler
+                    for handler in getLogger().handlers
+                    if isinstance(handler, LoggingHandler)
+                ]
+            ),
+            1,
+        )
+
+    def test_span_exporter_endpoint_changed(self):
+        self._configure()
+
+        (span_processor,) = self._span_processors()
+        tracer = trace.get_tracer(__name__)
+        tracer.start_span("first").end()
+
+        with Receiver() as receiver:
+            self._configure(span_exporter_endpoint=receiver.endpoint)
+
+            (new_span_processor,) = self._span_processors()
+
+            self.assertIsNot(new_span_processor, span_processor)
+            self.assertFalse(span_processor.worker_thread.is_alive())
+
+            tracer.start_span("second").end()
+            new_span_processor.force_flush()
+
+            self.assertEqual(
+                [span.name for span in receiver.spans], ["second"]
+            )
+
+        # The spans queued in the replaced processor are exported when it is
+        # shut down.
+        self.assertEqual(
+            [span.name for span in self.receiver.spans], ["first"]
+        )
+
+    def test_debug_span_processor_removed(self):
+        self._configure(log_level="DEBUG")
+
+        self.assertEqual(len(self._span_processors()), 2)
+
+        self._configure()
+
+        self.assertEqual(len(self._span_processors()), 1)
+
+    def test_interning_span_processor_first(self):
+        self._configure()
+        self._configure(intern_strings=True)
+
+        span_processors = self._span_processors()
+
+        self.assertIsInstance(
+            span_processors[0], span_processor.InterningSpanProcessor
+        )
+        self.assertEqual(len(span_processors), 2)
+
+        self._configure(intern_strings=True)
+
+        self.assertEqual(self._span_processors(), span_processors)
+
+    def test_metric_reader_replaced(self):
+        self._configure(metrics_enabled=True)
+
+        meter_provider = metrics_internal.get_meter_provider()
+        (metric_reader,) = meter_provider._sdk_config.metric_readers
+        counter = meter_provider.get_meter(__name__).create_counter("counter")
+
+        self._configure(
+            metrics_enabled=True,
+            metrics_exporter_temporality_preference="CUMULATIVE",
+        )
+
+        (new_metric_reader,) = meter_provider._sdk_config.metric_readers
+
+        self.assertIsNot(new_metric_reader, metric_reader)
+        self.assertTrue(metric_reader._shutdown)
+
+        counter.add(2)
+
+        (resource_metrics,) = new_metric_reader._collect(
+            new_metric_reader, 10_000
+        ).resource_metrics
+        (scope_metrics,) = resource_metrics.scope_metrics
+        (metric,) = scope_metrics.metrics
+
+        self.assertEqual(metric.data.data_points[0].value, 2)
+
+        self._configure(metrics_enabled=False)
+
+        self.assertEqual(meter_provider._sdk_config.metric_readers, ())
+        self.assertTrue(new_metric_reader._shutdown)
+
+    def test_slow_additional_endpoint(self):
+        with Receiver(latency=2) as slow_receiver:
+            self._configure(
+                metrics_enabled=True,
+                additional_span_exporter_endpoints=[slow_receiver.endpoint],
+                additional_metrics_exporter_endpoints=[slow_receiver.endpoint],
+            )
+
+            span_processor, slow_span_processor = self._span_processors()
+            tracer = trace.get_tracer(__name__)
+
+            tracer.start_span("span").end()
+            # Wakes the slow worker up, its export takes 2 seconds.
+            slow_span_processor.force_flush(timeout_millis=0)
+            tracer.start_span("other span").end()
+
+            span_processor.force_flush(timeout_millis=1000)
+
+            self.assertEqual(
+                [span.name for span in self.receiver.spans],
+                ["span", "other span"],
+            )
+            self.assertEqual(slow_receiver.spans, [])
+
+            meter_provider = metrics_internal.get_meter_provider()
+            metric_reader, slow_metric_reader = (
+                meter_provider._sdk_config.metric_readers
+            )
+
+            self.assertEqual(
+                metric_reader._exporter._endpoint,
+                self.receiver.endpoint[len("http://") :],
+            )
+            self.assertEqual(
+                slow_metric_reader._exporter._endpoint,
+                slow_receiver.endpoint[len("http://") :],
+            )
+
+            slow_span_processor.force_flush()
+
+            self.assertEqual(
+                [span.name for span in slow_receiver.spans],
+                ["span", "other span"],
+            )
+
+            # Removes the additional readers while their endpoint is up.
+            self._configure(metrics_enabled=True)
+
+    def test_additional_endpoint_connection(self):
+        with Receiver() as other_receiver:
+            # Without a scheme, insecure as span_exporter_insecure is set.
+            self._configure(
+                additional_span_exporter_endpoints=[
+                    other_receiver.endpoint[len("http://") :]
+                ],
+            )
+
+            trace.get_tracer(__name__).start_span("span").end()
+            trace.get_tracer_provider().force_flush()
+
+            self.assertEqual(
+                [span.name for span in other_receiver.spans], ["span"]
+            )
+            self.assertEqual(
+                self.receiver.metadata[0]["lightstep-access-token"], "a" * 104
+            )
+            # The access token is only sent to Lightstep.
+            self.assertNotIn(
+                "lightstep-access-token", other_receiver.metadata[0]
+            )
+
+            self._configure()
+
+    def test_additional_endpoints_changed(self):
+        with Receiver() as receiver, Receiver() as other_receiver:
+            self._configure(
+                additional_span_exporter_endpoints=[receiver.endpoint]
+            )
+
+            _, additional_span_processor = self._span_processors()
+
+            self._configure(
+                additional_span_exporter_endpoints=[
+                    receiver.endpoint,
+                    other_receiver.endpoint,
+                ]
+            )
+
+            self.assertIs(
+                self._span_processors()[1], additional_span_processor
+            )
+            self.assertEqual(len(self._span_processors()), 3)
+
+            self._configure(additional_span_exporter_endpoints=[])
+
+            self.assertEqual(len(self._span_processors()), 1)
+            self.assertFalse(
+                additional_span_processor.worker_thread.is_alive()
+            )
+
+    def test_runtime_metrics(self):
+        self._configure(metrics_enabled=True, runtime_metrics_enabled=True)
+
+        runtime_metrics = configuration._installed_components[
+            "runtime_metrics"
+        ][2]
+
+        self._configure(metrics_enabled=True, runtime_metrics_enabled=True)
+
+        self.assertIs(
+            configuration._installed_components["runtime_metrics"][2],
+            runtime_metrics,
+        )
+        self.assertTrue(runtime_metrics._started)
+
+        self._configure(metrics_enabled=True)
+
+        self.assertFalse(runtime_metrics._started)
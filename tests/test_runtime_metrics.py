@@ -0,0 +1,131 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from asyncio import new_event_loop, sleep
+from gc import callbacks, collect
+from os.path import exists
+from time import sleep as blocking_sleep
+from unittest import TestCase
+
+from opentelemetry.launcher.runtime_metrics import (
+    RuntimeMetrics,
+    monitor_event_loop,
+)
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+
+
+class TestRuntimeMetrics(TestCase):
+    def setUp(self):
+        self.reader = InMemoryMetricReader()
+        self.meter_provider = MeterProvider(
+            metric_readers=[self.reader], shutdown_on_exit=False
+        )
+        self.runtime_metrics = RuntimeMetrics(self.meter_provider)
+
+    def tearDown(self):
+        self.runtime_metrics.stop()
+        self.meter_provider.shutdown()
+
+    def _collect(self):
+        metrics_data = self.reader.get_metrics_data()
+
+        if metrics_data is None:
+            return {}
+
+        return {
+            metric.name: {
+                tuple(sorted(data_point.attributes.items())): data_point.value
+                for data_point in metric.data.data_points
+            }
+            for resource_metrics in metrics_data.resource_metrics
+            for scope_metrics in resource_metrics.scope_metrics
+            for metric in scope_metrics.metrics
+        }
+
+    def test_metrics(self):
+        self.runtime_metrics.start()
+        collect()
+
+        metrics = self._collect()
+
+        self.assertGreater(
+            metrics["process.runtime.cpython.gc_count"][(("generation", 2),)],
+            0,
+        )
+        self.assertGreater(
+            metrics["process.runtime.cpython.gc.pause_time"][
+                (("generation", 2),)
+            ],
+            0,
+        )
+        self.assertGreaterEqual(
+            metrics["process.runtime.cpython.thread_count"][()], 1
+        )
+        self.assertGreater(
+            metrics["process.runtime.cpython.cpu_time"][(("type", "user"),)],
+            0,
+        )
+        self.assertNotIn("process.runtime.cpython.asyncio.loop_lag", metrics)
+
+        if exists("/proc/self/statm"):
+            self.assertGreater(
+                metrics["process.runtime.cpython.memory"][(("type", "rss"),)],
+                0,
+            )
+            self.assertGreater(
+                metrics["process.open_file_descriptor.count"][()], 0
+            )
+
+    def test_stop(self):
+        self.runtime_metrics.start()
+        self.runtime_metrics.stop()
+
+        self.assertNotIn(
+            self.runtime_metrics._on_gc,  # pylint: disable=protected-access
+            callbacks,
+        )
+        self.assertEqual(self._collect(), {})
+
+        self.runtime_metrics.start()
+
+        self.assertIn("process.runtime.cpython.gc_count", self._collect())
+
+    def test_loop_lag(self):
+        self.runtime_metrics.start()
+
+        async def _block():
+            monitor_event_loop(interval=0.01)
+            await sleep(0.02)
+            # Blocks the loop, the probe runs late.
+            blocking_sleep(0.2)
+            await sleep(0.02)
+
+        loop = new_event_loop()
+
+        try:
+            loop.run_until_complete(_block())
+        finally:
+            loop.close()
+
+        metrics = self._collect()
+
+        self.assertGreaterEqual(
+            metrics["process.runtime.cpython.asyncio.loop_lag"][()], 0.15
+        )
+
+        # The lag is reset at every collection.
+        self.assertFalse(
+            self._collect().get("process.runtime.cpython.asyncio.loop_lag")
+        )
@@ -0,0 +1,281 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from unittest import TestCase
+from unittest.mock import patch
+
+from opentelemetry import trace
+from opentelemetry.launcher.configuration import (
+    InvalidConfigurationError,
+    configure_opentelemetry,
+)
+from opentelemetry.launcher.sampling import AdaptiveSampler, RuleBasedSampler
+from opentelemetry.sdk.trace.sampling import ALWAYS_OFF, Decision, ParentBased
+from opentelemetry.trace import (
+    NonRecordingSpan,
+    Once,
+    SpanContext,
+    SpanKind,
+    TraceFlags,
+    set_span_in_context,
+)
+
+
+class TestAdaptiveSampler(TestCase):
+    def setUp(self):
+        trace._TRACER_PROVIDER_SET_ONCE = Once()
+        trace._TRACER_PROVIDER = None
+
+    @patch("opentelemetry.launcher.sampling.monotonic")
+    def test_adjust_ratio(self, mock_monotonic):
+        mock_monotonic.return_value = 0
+        sampler = AdaptiveSampler(100, smoothing=1)
+
+        self.assertEqual(sampler.ratio, 1.0)
+
+        for trace_id in range(1000):
+            sampler.should_sample(None, trace_id, "span")
+
+        mock_monotonic.return_value = 1
+        sampler.should_sample(None, 0, "span")
+
+        self.assertAlmostEqual(sampler.ratio, 0.1, places=3)
+
+        mock_monotonic.return_value = 2
+        sampler.should_sample(None, 0, "span")
+
+        # The rate fell below the budget
+        self.assertEqual(sampler.ratio, 1.0)
+
+    @patch("opentelemetry.launcher.sampling.monotonic")
+    def test_ratio_decision(self, mock_monotonic):
+        mock_monotonic.return_value = 0
+        sampler = AdaptiveSampler(1, smoothing=1)
+
+        for trace_id in range(3):
+            sampler.should_sample(None, trace_id, "span")
+
+        mock_monotonic.return_value = 1
+        sampler.should_sample(None, 0, "span")
+
+        self.assertAlmostEqual(sampler.ratio, 0.25)
+
+        result = sampler.should_sample(None, 1, "span")
+
+        self.assertEqual(result.decision, Decision.RECORD_AND_SAMPLE)
+        self.assertEqual(result.attributes, {"sampling.ratio": 0.25})
+
+        result = sampler.should_sample(None, (1 << 64) - 1, "span")
+
+        self.assertEqual(result.decision, Decision.DROP)
+
+    @patch("opentelemetry.launcher.sampling.monotonic")
+    def test_parent_decision(self, mock_monotonic):
+        mock_monotonic.return_value = 0
+        sampler = AdaptiveSampler(1, smoothing=1)
+
+        for trace_id in range(100):
+            sampler.should_sample(None, trace_id, "span")
+
+        mock_monotonic.return_value = 1
+
+        for sampled, decision in (
+            (TraceFlags(TraceFlags.SAMPLED), Decision.RECORD_AND_SAMPLE),
+            (TraceFlags(TraceFlags.DEFAULT), Decision.DROP),
+        ):
+            parent_context = set_span_in_context(
+                NonRecordingSpan(
+                    SpanContext(
+                        (1 << 64) - 1, 1, is_remote=True, trace_flags=sampled
+                    )
+                )
+            )
+
+            result = sampler.should_sample(
+                parent_context, (1 << 64) - 1, "span"
+            )
+
+            self.assertEqual(result.decision, decision)
+            self.assertEqual(result.attributes, {})
+
+    def test_configure_sampler(self):
+        configure_opentelemetry(
+            service_name="service_name",
+            span_exporter_endpoint="localhost:1234",
+            sampler_spans_per_second=10,
+        )
+
+        self.assertIsInstance(
+            trace.get_tracer_provider().sampler, AdaptiveSampler
+        )
+
+        with trace.get_tracer(__name__).start_as_current_span("span") as span:
+            self.assertEqual(span.attributes["sampling.ratio"], 1.0)
+
+    def test_configure_sampler_removed(self):
+        configure_opentelemetry(
+            service_name="service_name",
+            span_exporter_endpoint="localhost:1234",
+            sampler_spans_per_second=10,
+        )
+        configure_opentelemetry(
+            service_name="service_name",
+            span_exporter_endpoint="localhost:1234",
+        )
+
+        # The default sampler is back.
+        self.assertIsInstance(trace.get_tracer_provider().sampler, ParentBased)
+
+    def test_configure_sampler_invalid(self):
+        with self.assertRaises(InvalidConfigurationError):
+            configure_opentelemetry(
+                service_name="service_name",
+                span_exporter_endpoint="localhost:1234",
+                sampler_spans_per_second=0,
+            )
+
+
+class TestRuleBasedSampler(TestCase):
+    def setUp(self):
+        trace._TRACER_PROVIDER_SET_ONCE = Once()
+        trace._TRACER_PROVIDER = None
+
+    def test_rules(self):
+        sampler = RuleBasedSampler(
+            [
+                {"attributes": {"http.target": "/health"}, "ratio": 0},
+                {"attributes": {"http.target": "/static/*"}, "ratio": 0},
+                {"name": "POST /checkout", "kind": "server", "ratio": 1},
+                {"name": "GET /users*", "ratio": 0.5},
+            ],
+            ALWAYS_OFF,
+        )
+
+        for name, kind, attributes, trace_id, decision in [
+            ("GET", SpanKind.SERVER, {"http.target": "/health"}, 1, False),
+            ("GET", None, {"http.target": "/static/app.js"}, 1, False),
+            ("GET", None, {"http.target": "/static"}, 1, False),
+            ("POST /checkout", SpanKind.SERVER, None, 1, True),
+            ("POST /checkout", SpanKind.CLIENT, None, 1, False),
+            ("GET /users/{id}", None, None, 1, True),
+            ("GET /users/{id}", None, None, (1 << 64) - 1, False),
+            # No rule matches, the fallback drops.
+            ("GET /health", None, {"http.target": "/healthz"}, 1, False),
+        ]:
+            result = sampler.should_sample(
+                None, trace_id, name, kind=kind, attributes=attributes
+            )
+
+            self.assertEqual(result.decision.is_sampled(), decision, name)
+
+        self.assertEqual(
+            sampler.should_sample(None, 1, "GET /users/{id}").attributes,
+            {"sampling.ratio": 0.5},
+        )
+
+    @patch("opentelemetry.launcher.sampling.monotonic")
+    def test_rate_limit(self, mock_monotonic):
+        mock_monotonic.return_value = 0
+        sampler = RuleBasedSampler([{"name": "*", "spans_per_second": 2}])
+
+        self.assertEqual(
+            [
+                sampler.should_sample(None, 1, "span").decision
+                for _ in range(3)
+            ],
+            [
+                Decision.RECORD_AND_SAMPLE,
+                Decision.RECORD_AND_SAMPLE,
+                Decision.DROP,
+            ],
+        )
+
+        mock_monotonic.return_value = 0.5
+
+        self.assertEqual(
+            sampler.should_sample(None, 1, "span").decision,
+            Decision.RECORD_AND_SAMPLE,
+        )
+
+    def test_parent(self):
+        following_sampler = RuleBasedSampler([{"name": "*", "ratio": 0}])
+        overriding_sampler = RuleBasedSampler(
+            [{"name": "*", "ratio": 0}], override_remote_parent=True
+        )
+
+        for sampler, is_remote, sampled, decision in [
+            (following_sampler, False, True, Decision.RECORD_AND_SAMPLE),
+            (following_sampler, True, True, Decision.RECORD_AND_SAMPLE),
+            (following_sampler, True, False, Decision.DROP),
+            (overriding_sampler, False, True, Decision.RECORD_AND_SAMPLE),
+            (overriding_sampler, True, True, Decision.DROP),
+        ]:
+            parent_context = set_span_in_context(
+                NonRecordingSpan(
+                    SpanContext(
+                        1,
+                        1,
+                        is_remote=is_remote,
+                        trace_flags=TraceFlags(
+                            TraceFlags.SAMPLED
+                            if sampled
+                            else TraceFlags.DEFAULT
+                        ),
+                    )
+                )
+            )
+
+            self.assertEqual(
+                sampler.should_sample(parent_context, 1, "span").decision,
+                decision,
+            )
+
+    def test_invalid_rules(self):
+        for rule in [
+            {"name": "span"},
+            {"name": "span", "ratio": 1, "spans_per_second": 1},
+            {"name": "span", "ratio": 2},
+            {"kind": "other", "ratio": 1},
+            {"route": "/", "ratio": 1},
+        ]:
+            with self.assertRaises(ValueError):
+                RuleBasedSampler([rule])
+
+    def test_configure_rules(self):
+        configure_opentelemetry(
+            service_name="service_name",
+            span_exporter_endpoint="localhost:1234",
+            sampling_rules='[{"name": "dropped", "ratio": 0}]',
+        )
+
+        self.assertIsInstance(
+            trace.get_tracer_provider().sampler, RuleBasedSampler
+        )
+
+        tracer = trace.get_tracer(__name__)
+
+        self.assertFalse(tracer.start_span("dropped").is_recording())
+        self.assertTrue(tracer.start_span("kept").is_recording())
+        self.assertFalse(
+            trace.get_tracer_provider().sampler.override_remote_parent
+        )
+
+    def test_configure_rules_invalid(self):
+        for sampling_rules in ["[{", [{"name": "span"}], ["span"]]:
+            with self.assertRaises(InvalidConfigurationError):
+                configure_opentelemetry(
+                    service_name="service_name",
+                    span_exporter_endpoint="localhost:1234",
+                    sampling_rules=sampling_rules,
+                )
@@ -0,0 +1,261 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from threading import Event
+from threading import enumerate as enumerate_threads
+from time import sleep
+from unittest import TestCase
+from unittest.mock import Mock
+
+from receiver import Receiver
+
+from opentelemetry import metrics, trace
+from opentelemetry.launcher import configuration
+from opentelemetry.launcher.configuration import (
+    InvalidConfigurationError,
+    configure_opentelemetry,
+)
+from opentelemetry.launcher.scheduler import (
+    ExportScheduler,
+    ScheduledMetricReader,
+    ScheduledSpanProcessor,
+)
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+from opentelemetry.trace import Once
+
+
+class _MetricExporter:
+    # A push exporter that keeps the exported metrics.
+    def __init__(self):
+        self.deadline_ns = None
+        self.exported = Event()
+        self.metrics_data = []
+        self._preferred_temporality = {}
+        self._preferred_aggregation = {}
+
+    def export(self, metrics_data, timeout_millis=None, **kwargs):
+        self.metrics_data.append(metrics_data)
+        self.exported.set()
+
+    def force_flush(self, timeout_millis=None):
+        return True
+
+    def shutdown(self, timeout_millis=None, **kwargs):
+        pass
+
+
+class TestExportScheduler(TestCase):
+    def setUp(self):
+        self.scheduler = ExportScheduler()
+
+    def tearDown(self):
+        self.scheduler.shutdown()
+
+    def test_timers(self):
+        calls = []
+        done = Event()
+
+        def slow():
+            calls.append("slow")
+
+        def fast():
+            calls.append("fast")
+
+            if calls.count("fast") == 3:
+                done.set()
+
+        self.scheduler.schedule(slow, 10)
+        self.scheduler.schedule(fast, 0.01)
+
+        self.assertTrue(done.wait(5))
+        self.assertEqual(calls[:3], ["fast", "fast", "fast"])
+        self.assertEqual(
+            [
+                thread.name
+                for thread in enumerate_threads()
+                if thread.name == "OtelExportScheduler"
+            ],
+            ["OtelExportScheduler"],
+        )
+
+    def test_run_soon_and_cancel(self):
+        ran = Event()
+        timer = self.scheduler.schedule(ran.set, 3600)
+
+        timer.run_soon()
+        self.assertTrue(ran.wait(5))
+
+        ran.clear()
+        timer.cancel()
+        timer.run_soon()
+        self.assertFalse(ran.wait(0.1))
+
+    def test_idle_wakeups(self):
+        self.scheduler.schedule(lambda: None, 3600)
+
+        sleep(0.2)
+
+        self.assertLessEqual(self.scheduler.wakeups, 1)
+
+    def test_shutdown(self):
+        self.scheduler.schedule(lambda: None, 3600)
+        self.scheduler.shutdown()
+
+        self.assertFalse(self.scheduler._thread.is_alive())
+
+        with self.assertRaises(RuntimeError):
+            self.scheduler.schedule(lambda: None, 1)
+
+
+class TestScheduledPipelines(TestCase):
+    def setUp(self):
+        trace._TRACER_PROVIDER_SET_ONCE = Once()
+        trace._TRACER_PROVIDER = None
+        metrics._internal._METER_PROVIDER_SET_ONCE = Once()
+        metrics._internal._METER_PROVIDER = None
+
+        self.scheduler = ExportScheduler()
+
+    def tearDown(self):
+        self.scheduler.shutdown()
+
+    def test_span_processor(self):
+        exporter = InMemorySpanExporter()
+        processor = ScheduledSpanProcessor(
+            exporter,
+            self.scheduler,
+            schedule_delay_millis=3_600_000,
+            max_export_batch_size=2,
+        )
+        provider = TracerProvider(shutdown_on_exit=False)
+        provider.add_span_processor(processor)
+        tracer = provider.get_tracer(__name__)
+
+        tracer.start_span("first").end()
+        sleep(0.1)
+        self.assertFalse(exporter.get_finished_spans())
+
+        # A full batch is exported without waiting for the delay.
+        tracer.start_span("second").end()
+
+        for _ in range(50):
+            if len(exporter.get_finished_spans()) == 2:
+                break
+            sleep(0.1)
+
+        tracer.start_span("third").end()
+        processor.shutdown()
+
+        self.assertEqual(
+            [span.name for span in exporter.get_finished_spans()],
+            ["first", "second", "third"],
+        )
+
+    def test_span_processor_full_queue(self):
+        processor = ScheduledSpanProcessor(
+            InMemorySpanExporter(),
+            self.scheduler,
+            schedule_delay_millis=3_600_000,
+            max_export_batch_size=2,
+        )
+        processor._timer = Mock()
+        provider = TracerProvider(shutdown_on_exit=False)
+        provider.add_span_processor(processor)
+        tracer = provider.get_tracer(__name__)
+
+        # The batch filled while an export was running, every span ended
+        # afterwards wakes the scheduler up.
+        for name in ["first", "second", "third"]:
+            tracer.start_span(name).end()
+
+        self.assertEqual(processor._timer.run_soon.call_count, 2)
+
+    def test_metric_reader(self):
+        exporter = _MetricExporter()
+        reader = ScheduledMetricReader(
+            exporter, self.scheduler, export_interval_millis=10
+        )
+        other_reader = InMemoryMetricReader()
+        provider = MeterProvider(
+            metric_readers=[reader, other_reader], shutdown_on_exit=False
+        )
+
+        provider.get_meter(__name__).create_counter("counter").add(1)
+
+        self.assertTrue(exporter.exported.wait(5))
+        self.assertIsNotNone(exporter.deadline_ns)
+
+        provider.shutdown()
+
+        self.assertTrue(reader._shutdown)
+        self.assertEqual(
+            exporter.metrics_data[-1]
+            .resource_metrics[0]
+            .scope_metrics[0]
+            .metrics[0]
+            .name,
+            "counter",
+        )
+
+    def test_configuration(self):
+        threads = set(enumerate_threads())
+
+        with Receiver() as receiver:
+            configure_opentelemetry(
+                service_name="service_name",
+                span_exporter_endpoint=receiver.endpoint,
+                span_exporter_insecure=True,
+                metrics_exporter_endpoint=receiver.endpoint,
+                metrics_enabled=True,
+                shared_scheduler=True,
+            )
+
+            self.assertEqual(
+                [
+                    thread.name
+                    for thread in set(enumerate_threads()) - threads
+                    if thread.name.startswith("Otel")
+                ],
+                ["OtelExportScheduler"],
+            )
+
+            # An export from the scheduler is a single attempt.
+            installed_components = configuration._installed_components
+            self.assertFalse(
+                installed_components["span_processor"][2].span_exporter._retry
+            )
+            self.assertFalse(
+                installed_components["metric_reader"][2]._exporter._retry
+            )
+
+            with trace.get_tracer(__name__).start_as_current_span("span"):
+                pass
+
+            trace.get_tracer_provider().shutdown()
+            metrics.get_meter_provider().shutdown()
+
+            self.assertEqual([span.name for span in receiver.spans], ["span"])
+
+    def test_invalid_configuration(self):
+        with self.assertRaises(InvalidConfigurationError):
+            configure_opentelemetry(
+                service_name="service_name",
+                shared_scheduler=True,
+                serverless=True,
+            )
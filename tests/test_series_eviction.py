@@ -0,0 +1,192 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from receiver import Receiver
+
+from opentelemetry import metrics, trace
+from opentelemetry.launcher import configuration
+from opentelemetry.launcher.series_eviction import SeriesEviction, _Series
+from opentelemetry.metrics import Observation
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+from opentelemetry.trace import Once
+
+
+def _points(reader):
+    # The data points of every metric by metric name.
+    return {
+        metric.name: list(metric.data.data_points)
+        for resource_metrics in reader.get_metrics_data().resource_metrics
+        for scope_metrics in resource_metrics.scope_metrics
+        for metric in scope_metrics.metrics
+    }
+
+
+@patch("opentelemetry.launcher.series_eviction.monotonic")
+class TestSeriesEviction(TestCase):
+    def setUp(self):
+        self.reader = InMemoryMetricReader()
+        self.meter_provider = MeterProvider(
+            metric_readers=[self.reader], shutdown_on_exit=False
+        )
+        self.eviction = SeriesEviction(self.meter_provider, 1.5)
+        self.eviction.start()
+        self.meter = self.meter_provider.get_meter(__name__)
+
+    def test_counter(self, mock_monotonic):
+        counter = self.meter.create_counter("counter")
+
+        mock_monotonic.return_value = 0
+        counter.add(1, {"id": "a"})
+        counter.add(1, {"id": "b"})
+        _points(self.reader)
+
+        for now in [1, 2]:
+            mock_monotonic.return_value = now
+            counter.add(1, {"id": "b"})
+            points = _points(self.reader)
+
+        self.assertEqual(
+            [
+                (point.attributes["id"], point.value)
+                for point in points["counter"]
+            ],
+            [("b", 3)],
+        )
+        self.assertEqual(points["metric_series.evicted"][0].value, 1)
+        self.assertEqual(self.eviction.evicted, 1)
+
+        start_time = points["counter"][0].start_time_unix_nano
+
+        # An evicted series starts over.
+        mock_monotonic.return_value = 3
+        counter.add(1, {"id": "a"})
+        (point,) = [
+            point
+            for point in _points(self.reader)["counter"]
+            if point.attributes["id"] == "a"
+        ]
+
+        self.assertEqual(point.value, 1)
+        self.assertGreater(point.start_time_unix_nano, start_time)
+
+    def test_observable_gauge(self, mock_monotonic):
+        observations = [Observation(1, {"id": "a"})]
+
+        self.meter.create_observable_gauge(
+            "gauge", callbacks=[lambda options: observations]
+        )
+
+        mock_monotonic.return_value = 0
+        _points(self.reader)
+
+        observations = [Observation(1, {"id": "b"})]
+
+        # The gauge series are only tracked once they exist, after the
+        # first collection.
+        for now in [1, 2, 3]:
+            mock_monotonic.return_value = now
+            _points(self.reader)
+
+        self.assertEqual(self.eviction.evicted, 1)
+        self.assertEqual(
+            _points(self.reader)["metric_series.active"][0].value,
+            # The gauge and the two eviction metrics.
+            3,
+        )
+
+    def test_evicted_during_lookup(self, mock_monotonic):
+        mock_monotonic.return_value = 0
+        counter = self.meter.create_counter("counter")
+        counter.add(1, {"id": "a"})
+        _points(self.reader)
+
+        (series,) = [
+            match._attributes_aggregation
+            for storage in (
+                self.meter_provider._measurement_consumer._reader_storages
+            ).values()
+            for instrument, matches in (
+                storage._instrument_view_instrument_matches.items()
+            )
+            if instrument.name == "counter"
+            for match in matches
+        ]
+        key = frozenset({"id": "a"}.items())
+
+        self.assertIsInstance(series, _Series)
+
+        # Evicted after the SDK found it and before it looked it up.
+        series.pop(key)
+        series[key].aggregate(Mock(value=1))
+
+        self.assertEqual(_points(self.reader)["counter"][0].value, 1)
+
+    def test_stop(self, mock_monotonic):
+        mock_monotonic.return_value = 0
+        counter = self.meter.create_counter("counter")
+        counter.add(1, {"id": "a"})
+        _points(self.reader)
+
+        self.eviction.stop()
+        mock_monotonic.return_value = 10
+
+        self.assertIn("counter", _points(self.reader))
+        self.assertEqual(self.eviction.evicted, 0)
+
+
+class TestSeriesEvictionConfiguration(TestCase):
+    def setUp(self):
+        trace._TRACER_PROVIDER_SET_ONCE = Once()
+        trace._TRACER_PROVIDER = None
+        metrics._internal._METER_PROVIDER_SET_ONCE = Once()
+        metrics._internal._METER_PROVIDER = None
+        configuration._installed_components.clear()
+
+    def tearDown(self):
+        configuration._installed_components.clear()
+
+    def test_configuration(self):
+        with Receiver() as receiver:
+            configuration.configure_opentelemetry(
+                service_name="service_name",
+                span_exporter_endpoint=receiver.endpoint,
+                span_exporter_insecure=True,
+                metrics_exporter_endpoint=receiver.endpoint,
+                metrics_enabled=True,
+                metrics_exporter_interval=1000,
+                metrics_series_max_idle_intervals=5,
+            )
+
+            series_eviction = configuration._installed_components[
+                "series_eviction"
+            ][2]
+
+            self.assertEqual(series_eviction.max_idle_seconds, 5)
+            self.assertTrue(series_eviction._started)
+
+            trace.get_tracer_provider().shutdown()
+            metrics.get_meter_provider().shutdown()
+
+    def test_invalid_configuration(self):
+        with self.assertRaises(configuration.InvalidConfigurationError):
+            configuration.configure_opentelemetry(
+                service_name="service_name",
+                span_exporter_endpoint="localhost:1234",
+                metrics_enabled=True,
+                metrics_series_max_idle_intervals=0,
+            )
@@ -0,0 +1,179 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from logging import getLogger
+from threading import enumerate as enumerate_threads
+from time import monotonic
+from unittest import TestCase
+from unittest.mock import Mock
+
+from receiver import Receiver
+
+from opentelemetry import _logs, metrics, trace
+from opentelemetry.launcher import configuration
+from opentelemetry.launcher.configuration import configure_opentelemetry
+from opentelemetry.launcher.serverless import (
+    ServerlessLogRecordProcessor,
+    ServerlessSpanProcessor,
+    flush,
+    flush_on_exit,
+)
+from opentelemetry.sdk._logs import LoggingHandler
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SpanExportResult
+from opentelemetry.trace import Once
+
+
+class TestServerless(TestCase):
+    def setUp(self):
+        trace._TRACER_PROVIDER_SET_ONCE = Once()
+        trace._TRACER_PROVIDER = None
+        metrics._internal._METER_PROVIDER_SET_ONCE = Once()
+        metrics._internal._METER_PROVIDER = None
+        _logs._internal._LOGGER_PROVIDER_SET_ONCE = Once()
+        _logs._internal._LOGGER_PROVIDER = None
+        configuration._installed_components.clear()
+
+    def tearDown(self):
+        root_logger = getLogger()
+
+        for handler in list(root_logger.handlers):
+            if isinstance(handler, LoggingHandler):
+                root_logger.removeHandler(handler)
+
+        configuration._installed_components.clear()
+
+    def test_no_background_threads(self):
+        threads = set(enumerate_threads())
+
+        configure_opentelemetry(
+            service_name="service_name",
+            span_exporter_endpoint="http://localhost:4317",
+            metrics_exporter_endpoint="http://localhost:4317",
+            metrics_enabled=True,
+            logs_exporter_endpoint="http://localhost:4317",
+            logs_enabled=True,
+            serverless=True,
+        )
+
+        self.assertIsInstance(
+            configuration._installed_components["log_record_processor"][2],
+            ServerlessLogRecordProcessor,
+        )
+
+        self.assertFalse(
+            [
+                thread.name
+                for thread in set(enumerate_threads()) - threads
+                if thread.name.startswith("Otel")
+            ]
+        )
+
+    def test_flush_on_exit(self):
+        with Receiver() as receiver:
+            configure_opentelemetry(
+                service_name="service_name",
+                span_exporter_endpoint=receiver.endpoint,
+                span_exporter_insecure=True,
+                metrics_exporter_endpoint=receiver.endpoint,
+                metrics_enabled=True,
+                serverless=True,
+            )
+
+            counter = metrics.get_meter(__name__).create_counter("counter")
+
+            @flush_on_exit(timeout_millis=5000)
+            def handler():
+                with trace.get_tracer(__name__).start_as_current_span(
+                    "invocation"
+                ):
+                    counter.add(1)
+
+                self.assertFalse(receiver.spans)
+
+            handler()
+
+            self.assertEqual(
+                [span.name for span in receiver.spans], ["invocation"]
+            )
+            self.assertTrue(receiver.metrics_requests)
+
+            with flush_on_exit(timeout_millis=5000):
+                with trace.get_tracer(__name__).start_as_current_span(
+                    "second_invocation"
+                ):
+                    pass
+
+            self.assertEqual(
+                [span.name for span in receiver.spans],
+                ["invocation", "second_invocation"],
+            )
+
+    def test_deadline(self):
+        exporter = Mock()
+        exporter.export.return_value = SpanExportResult.SUCCESS
+
+        processor = ServerlessSpanProcessor(
+            exporter, max_queue_size=4, max_export_batch_size=2
+        )
+        provider = TracerProvider(shutdown_on_exit=False)
+        provider.add_span_processor(processor)
+
+        for _ in range(3):
+            provider.get_tracer(__name__).start_span("span").end()
+
+        self.assertFalse(processor.force_flush(timeout_millis=0))
+        exporter.export.assert_not_called()
+        self.assertEqual(len(processor.queue), 3)
+
+        self.assertTrue(processor.force_flush(timeout_millis=1000))
+        self.assertEqual(exporter.export.call_count, 2)
+        self.assertEqual(len(processor.queue), 0)
+
+    def _flush_within_deadline(self, endpoint):
+        configure_opentelemetry(
+            service_name="service_name",
+            span_exporter_endpoint=endpoint,
+            span_exporter_insecure=True,
+            metrics_exporter_endpoint=endpoint,
+            metrics_enabled=True,
+            logs_exporter_endpoint=endpoint,
+            logs_enabled=True,
+            serverless=True,
+            serverless_flush_timeout=500,
+        )
+
+        with trace.get_tracer(__name__).start_as_current_span("invocation"):
+            metrics.get_meter(__name__).create_counter("counter").add(1)
+            getLogger(__name__).error("message")
+
+        start = monotonic()
+        flushed = flush()
+
+        self.assertFalse(flushed)
+        # The deadline and the time to give up the attempt that reached it.
+        self.assertLess(monotonic() - start, 0.55)
+
+        trace.get_tracer_provider().shutdown()
+        metrics.get_meter_provider().shutdown()
+        _logs.get_logger_provider().shutdown()
+
+    def test_dead_endpoint(self):
+        # Failed attempts are not retried after a backoff.
+        self._flush_within_deadline("http://localhost:1")
+
+    def test_slow_endpoint(self):
+        # Every attempt is bounded by the time left before the deadline.
+        with Receiver(latency=2) as receiver:
+            self._flush_within_deadline(receiver.endpoint)
@@ -0,0 +1,191 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from threading import Thread
+from unittest import TestCase
+
+from receiver import Receiver
+
+from opentelemetry import metrics, trace
+from opentelemetry.launcher import configuration
+from opentelemetry.launcher.sampling import RecordingSampler
+from opentelemetry.launcher.span_metrics import SpanMetricsProcessor
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+from opentelemetry.sdk.trace.sampling import ALWAYS_OFF
+from opentelemetry.trace import Once, SpanKind, Status, StatusCode
+
+
+def _points(reader):
+    # The data points of every metric by metric name.
+    return {
+        metric.name: list(metric.data.data_points)
+        for resource_metrics in reader.get_metrics_data().resource_metrics
+        for scope_metrics in resource_metrics.scope_metrics
+        for metric in scope_metrics.metrics
+    }
+
+
+class TestSpanMetricsProcessor(TestCase):
+    def setUp(self):
+        self.reader = InMemoryMetricReader()
+        self.meter_provider = MeterProvider(
+            metric_readers=[self.reader], shutdown_on_exit=False
+        )
+        self.processor = SpanMetricsProcessor(
+            self.meter_provider, max_series=3
+        )
+        self.processor.start()
+        self.exporter = InMemorySpanExporter()
+        self.tracer_provider = TracerProvider(
+            sampler=RecordingSampler(ALWAYS_OFF),
+            resource=Resource({"service.name": "service_name"}),
+            shutdown_on_exit=False,
+        )
+        self.tracer_provider.add_span_processor(self.processor)
+        self.tracer_provider.add_span_processor(
+            SimpleSpanProcessor(self.exporter)
+        )
+        self.tracer = self.tracer_provider.get_tracer(__name__)
+
+    def test_unsampled_spans(self):
+        for _ in range(3):
+            with self.tracer.start_as_current_span(
+                "GET /users", kind=SpanKind.SERVER
+            ):
+                pass
+
+        with self.tracer.start_as_current_span(
+            "GET /users", kind=SpanKind.SERVER
+        ) as span:
+            span.set_status(Status(StatusCode.ERROR))
+
+        points = _points(self.reader)
+        attributes = {
+            "service.name": "service_name",
+            "span.name": "GET /users",
+            "span.kind": "SERVER",
+        }
+
+        self.assertEqual(
+            sorted(
+                (point.attributes["status.code"], point.value)
+                for point in points["span.calls"]
+            ),
+            [("ERROR", 1), ("UNSET", 3)],
+        )
+        self.assertEqual(
+            [
+                (point.attributes, point.value)
+                for point in points["span.errors"]
+            ],
+            [({**attributes, "status.code": "ERROR"}, 1)],
+        )
+        self.assertEqual(
+            sum(point.count for point in points["span.duration"]), 4
+        )
+        self.assertFalse(self.exporter.get_finished_spans())
+
+    def test_threads(self):
+        def end_spans():
+            for _ in range(1000):
+                self.tracer.start_span("span").end()
+
+        threads = [Thread(target=end_spans) for _ in range(4)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        points = _points(self.reader)
+
+        self.assertEqual(points["span.calls"][0].value, 4000)
+        self.assertEqual(points["span.duration"][0].count, 4000)
+        self.assertEqual(
+            len(
+                [stripe for stripe in self.processor._stripes if stripe.calls]
+            ),
+            4,
+        )
+
+    def test_max_series(self):
+        for name in ["a", "b", "c", "d", "e"]:
+            self.tracer.start_span(name).end()
+
+        self.assertEqual(
+            sorted(
+                (point.attributes["span.name"], point.value)
+                for point in _points(self.reader)["span.calls"]
+            ),
+            [("_other", 2), ("a", 1), ("b", 1), ("c", 1)],
+        )
+
+    def test_stop(self):
+        self.tracer.start_span("span").end()
+        self.processor.stop()
+        self.tracer.start_span("span").end()
+
+        self.assertNotIn("span.calls", _points(self.reader))
+
+
+class TestSpanMetricsConfiguration(TestCase):
+    def setUp(self):
+        trace._TRACER_PROVIDER_SET_ONCE = Once()
+        trace._TRACER_PROVIDER = None
+        metrics._internal._METER_PROVIDER_SET_ONCE = Once()
+        metrics._internal._METER_PROVIDER = None
+        configuration._installed_components.clear()
+
+    def tearDown(self):
+        configuration._installed_components.clear()
+
+    def test_configuration(self):
+        with Receiver() as receiver:
+            for span_metrics_enabled in [True, False]:
+                configuration.configure_opentelemetry(
+                    service_name="service_name",
+                    span_exporter_endpoint=receiver.endpoint,
+                    span_exporter_insecure=True,
+                    metrics_exporter_endpoint=receiver.endpoint,
+                    metrics_enabled=True,
+                    span_metrics_enabled=span_metrics_enabled,
+                )
+
+                tracer_provider = trace.get_tracer_provider()
+
+                self.assertEqual(
+                    isinstance(tracer_provider.sampler, RecordingSampler),
+                    span_metrics_enabled,
+                )
+
+            processor = configuration._installed_components[
+                "span_metrics_processor"
+            ][2]
+
+            self.assertIn(
+                processor,
+                tracer_provider._active_span_processor._span_processors,
+            )
+            self.assertFalse(processor._started)
+
+            tracer_provider.shutdown()
+            metrics.get_meter_provider().shutdown()
@@ -0,0 +1,267 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from os import _exit, fork, waitpid
+from threading import Event
+from unittest import TestCase
+from unittest.mock import Mock
+
+from receiver import Receiver
+
+from opentelemetry.exporter.otlp.proto.common.trace_encoder import encode_spans
+from opentelemetry.launcher._encoding import _encode_request, _EncodedSpan
+from opentelemetry.launcher.span_processor import (
+    CompactSpanProcessor,
+    InterningSpanProcessor,
+    PrioritySpanProcessor,
+    _InternTable,
+    _SpanPriorityQueue,
+)
+from opentelemetry.launcher.tracer import LightstepOTLPSpanExporter
+from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import (
+    ExportTraceServiceRequest,
+)
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import (
+    SimpleSpanProcessor,
+    SpanExportResult,
+)
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+from opentelemetry.trace import SpanContext, Status, StatusCode, TraceFlags
+
+_PARENT = SpanContext(1, 1, is_remote=False)
+
+
+def _span(name, duration=1, parent=_PARENT, status_code=StatusCode.UNSET):
+    return ReadableSpan(
+        name=name,
+        context=SpanContext(
+            1, 2, is_remote=False, trace_flags=TraceFlags(TraceFlags.SAMPLED)
+        ),
+        parent=parent,
+        status=Status(status_code),
+        start_time=0,
+        end_time=duration,
+    )
+
+
+class TestSpanPriorityQueue(TestCase):
+    def test_eviction_order(self):
+        queue = _SpanPriorityQueue(3)
+
+        queue.appendleft(_span("error", status_code=StatusCode.ERROR))
+        queue.appendleft(_span("root", parent=None))
+        queue.appendleft(_span("short"))
+
+        queue.appendleft(_span("long", duration=10))
+        self.assertEqual(queue.dropped, {"error": 0, "root": 0, "other": 1})
+
+        queue.appendleft(_span("shorter", duration=0))
+        self.assertEqual(queue.dropped, {"error": 0, "root": 0, "other": 2})
+
+        queue.appendleft(
+            _span("remote_root", parent=SpanContext(1, 1, is_remote=True))
+        )
+        self.assertEqual(queue.dropped, {"error": 0, "root": 0, "other": 3})
+
+        queue.appendleft(_span("other_error", status_code=StatusCode.ERROR))
+        self.assertEqual(queue.dropped, {"error": 0, "root": 1, "other": 3})
+
+        self.assertEqual(len(queue), 3)
+        self.assertEqual(
+            [queue.pop().name for _ in range(len(queue))],
+            ["remote_root", "error", "other_error"],
+        )
+        self.assertFalse(queue)
+
+
+class TestPrioritySpanProcessor(TestCase):
+    def test_drop_when_full(self):
+        exporting = Event()
+        release = Event()
+        exported = []
+
+        def export(spans):
+            exported.extend(span.name for span in spans)
+            exporting.set()
+            release.wait()
+            return SpanExportResult.SUCCESS
+
+        exporter = Mock()
+        exporter.export.side_effect = export
+
+        processor = PrioritySpanProcessor(
+            exporter,
+            max_queue_size=2,
+            max_export_batch_size=2,
+            schedule_delay_millis=60000,
+        )
+
+        processor.on_end(_span("first"))
+        processor.on_end(_span("second"))
+
+        # The worker thread is now blocked exporting the first batch
+        self.assertTrue(exporting.wait(5))
+
+        processor.on_end(_span("short"))
+        processor.on_end(_span("root", parent=None))
+        processor.on_end(_span("error", status_code=StatusCode.ERROR))
+
+        self.assertEqual(
+            processor.dropped_spans, {"error": 0, "root": 0, "other": 1}
+        )
+
+        release.set()
+
+        with self.assertLogs(level="WARNING") as log:
+            processor.shutdown()
+
+        self.assertIn("other=1", log.output[0])
+        self.assertEqual(exported, ["first", "second", "root", "error"])
+
+    def test_fork(self):
+        processor = PrioritySpanProcessor(Mock(), schedule_delay_millis=60000)
+
+        # As if a thread was queuing a span when the process forked.
+        with processor._priority_queue._lock:
+            pid = fork()
+
+            if pid == 0:
+                # Exits with 0 if the queue is usable in the child.
+                try:
+                    processor.on_end(_span("span"))
+                    _exit(0 if len(processor.queue) == 1 else 1)
+                finally:
+                    _exit(2)
+
+        self.assertEqual(waitpid(pid, 0)[1], 0)
+
+        processor.shutdown()
+
+
+class TestCompactSpanProcessor(TestCase):
+    def _end_spans(self, provider):
+        for name in ("tracer_0", "tracer_1"):
+            tracer = provider.get_tracer(name, "1.0")
+
+            with tracer.start_as_current_span(
+                "parent", attributes={"http.method": "GET"}
+            ) as span:
+                span.add_event("event", {"key": "value"})
+
+                with tracer.start_as_current_span("child"):
+                    pass
+
+    def test_encode_request(self):
+        exporter = InMemorySpanExporter()
+        provider = TracerProvider(
+            resource=Resource({"service.name": "service_name"}),
+            shutdown_on_exit=False,
+        )
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+
+        self._end_spans(provider)
+
+        spans = exporter.get_finished_spans()
+
+        self.assertEqual(
+            ExportTraceServiceRequest.FromString(
+                _encode_request([_EncodedSpan(span) for span in spans])
+            ),
+            encode_spans(spans),
+        )
+
+    def test_export(self):
+        with Receiver() as receiver:
+            processor = CompactSpanProcessor(
+                LightstepOTLPSpanExporter(
+                    endpoint=receiver.endpoint, insecure=True
+                )
+            )
+            provider = TracerProvider(shutdown_on_exit=False)
+            provider.add_span_processor(processor)
+
+            self._end_spans(provider)
+
+            self.assertIsInstance(processor.queue[0], _EncodedSpan)
+
+            processor.force_flush()
+
+            self.assertEqual(
+                [span.name for span in receiver.spans],
+                ["child", "parent", "child", "parent"],
+            )
+            self.assertEqual(
+                [
+                    scope_spans.scope.name
+                    for scope_spans in receiver.trace_requests[0]
+                    .resource_spans[0]
+                    .scope_spans
+                ],
+                ["tracer_0", "tracer_1"],
+            )
+
+            processor.shutdown()
+
+
+class TestInterningSpanProcessor(TestCase):
+    def test_intern_table(self):
+        table = _InternTable(2)
+
+        first = table.intern("".join(["GE", "T"]))
+        self.assertIs(table.intern("".join(["GE", "T"])), first)
+
+        table.intern("POST")
+        # GET was used more recently than POST.
+        table.intern("GET")
+        table.intern("PUT")
+
+        self.assertEqual(len(table), 2)
+        self.assertEqual(table.evictions, 1)
+        self.assertIs(table.intern("GET"), first)
+        self.assertIsNot(table.intern("".join(["PO", "ST"])), "POST")
+
+    def test_shared_strings(self):
+        exporter = InMemorySpanExporter()
+        provider = TracerProvider(shutdown_on_exit=False)
+        provider.add_span_processor(InterningSpanProcessor())
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+        tracer = provider.get_tracer(__name__)
+
+        for target in ("/users/1", "/users/2"):
+            # Strings built at runtime, like the ones read from requests.
+            with tracer.start_as_current_span(
+                "".join(["GET /users/", "<id>"]),
+                attributes={
+                    "".join(["http.", "method"]): "".join(["GE", "T"]),
+                    "http.target": "".join([target, "?a=b"]),
+                },
+            ) as span:
+                span.add_event("".join(["ev", "ent"]))
+
+        first, second = exporter.get_finished_spans()
+        (first_key, first_method), (_, first_target) = first.attributes.items()
+        (second_key, second_method), (_, second_target) = (
+            second.attributes.items()
+        )
+
+        self.assertIs(first.name, second.name)
+        self.assertIs(first_key, second_key)
+        self.assertIs(first_method, second_method)
+        self.assertIs(first.events[0].name, second.events[0].name)
+        self.assertEqual(first_target, "/users/1?a=b")
+        self.assertEqual(second_target, "/users/2?a=b")
@@ -0,0 +1,128 @@
+# Copyright Lightstep Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from logging import ERROR, INFO, getLogger
+from unittest import TestCase
+
+from opentelemetry import trace
+from opentelemetry.launcher import configuration
+from opentelemetry.launcher._startup import _StartupProfile
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+from opentelemetry.trace import Once
+
+
+class TestStartupProfile(TestCase):
+    def test_phases(self):
+        profile = _StartupProfile()
+        profile.mark("a")
+        profile.mark("b")
+
+        (name_a, offset_a, duration_a), (name_b, offset_b, duration_b) = (
+            profile.phases
+        )
+
+        self.assertEqual((name_a, name_b), ("a", "b"))
+        self.assertEqual(offset_a, 0)
+        self.assertEqual(offset_b, duration_a)
+        self.assertEqual(profile.total_ns, duration_a + duration_b)
+
+    def test_log(self):
+        logger = getLogger("test_startup")
+        profile = _StartupProfile()
+        profile.mark("validation")
+
+        with self.assertLogs(logger=logger, level=INFO) as logs:
+            # The default OTEL_LOG_LEVEL.
+            logger.setLevel(ERROR)
+            profile.log(logger, auto_instrumented=True)
+
+        self.assertEqual(logs.records[0].levelname, "WARNING")
+
+        startup_profile = logs.records[0].startup_profile
+
+        self.assertEqual(
+            list(startup_profile["phases_ms"].keys()), ["validation"]
+        )
+        self.assertTrue(startup_profile["auto_instrumented"])
+        self.assertEqual(
+            startup_profile["total_ms"],
+            startup_profile["phases_ms"]["validation"],
+        )
+        self.assertIn("validation=", logs.output[0])
+
+    def test_record_span(self):
+        span_exporter = InMemorySpanExporter()
+        tracer_provider = TracerProvider()
+        tracer_provider.add_span_processor(SimpleSpanProcessor(span_exporter))
+
+        profile = _StartupProfile()
+        profile.mark("a")
+        profile.mark("b")
+        profile.record_span(tracer_provider.get_tracer(__name__), key="value")
+
+        phase_a, phase_b, startup = span_exporter.get_finished_spans()
+
+        self.assertEqual(startup.name, "launcher.startup")
+        self.assertEqual(startup.attributes["key"], "value")
+        self.assertEqual(startup.start_time, profile.start_time_ns)
+        self.assertEqual(
+            startup.end_time - startup.start_time, profile.total_ns
+        )
+        self.assertEqual(phase_a.name, "launcher.startup.a")
+        self.assertEqual(phase_b.name, "launcher.startup.b")
+        self.assertEqual(phase_a.parent.span_id, startup.context.span_id)
+        self.assertEqual(phase_a.end_time, phase_b.start_time)
+        self.assertEqual(phase_b.end_time, startup.end_time)
+
+
+class TestConfigureStartupProfile(TestCase):
+    def setUp(self):
+        trace._TRACER_PROVIDER_SET_ONCE = Once()
+        trace._TRACER_PROVIDER = None
+
+    def test_configure_opentelemetry(self):
+        # Looked up at runtime, test_configuration reloads the module.
+        with self.assertLogs(logger=configuration._logger, level=INFO) as logs:
+            configuration.configure_opentelemetry(
+                service_name="service_123",
+                access_token="a" * 104,
+                metrics_enabled=False,
+                launcher_profile_startup=True,
+            )
+
+        (record,) = [
+            record
+            for record in logs.records
+            if hasattr(record, "startup_profile")
+        ]
+
+        self.assertEqual(
+            list(record.startup_profile["phases_ms"].keys()),
+            [
+                "validation",
+                "propagators",
+                "tracer_provider",
+                "credentials",
+                "sampler",
+                "span_exporter",
+                "span_processor",
+                "hostname",
+                "resource",
+            ],
+        )
+        self.assertFalse(record.startup_profile["auto_instrumented"])